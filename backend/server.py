@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Form, BackgroundTasks
 from fastapi.responses import FileResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -6,19 +6,69 @@ import os
 import logging
 import json
 import asyncio
+import collections
+import contextlib
+import errno
+import gzip
+import hashlib
+import heapq
+import io
+import lzma
+import math
+import mmap
+import multiprocessing
 import subprocess
 import signal
 import shutil
+import sqlite3
+import socket
+import tarfile
 import zipfile
 import aiohttp
 import aiofiles
+import numpy as np
 import psutil
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from urllib.parse import urlsplit
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable
 from datetime import datetime, timezone
 import uuid
+import zlib
+
+try:
+    import lz4.block
+except ImportError:  # lz4 chunk compression (Minecraft 1.20.5+) is optional
+    lz4 = None
+try:
+    import xxhash  # checksums for writing lz4 chunks
+except ImportError:
+    xxhash = None
+try:
+    import fcntl  # reflink copies (Linux)
+except ImportError:
+    fcntl = None
+try:
+    import zstandard  # tar.zst exports
+except ImportError:
+    zstandard = None
+try:
+    import resource  # RLIMIT_NICE probe for dynamic renicing (Unix)
+except ImportError:
+    resource = None
+try:
+    import tomllib  # Forge mods.toml dependency checks (Python 3.11+)
+except ImportError:
+    tomllib = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,12 +77,16 @@ load_dotenv(ROOT_DIR / '.env')
 DATA_DIR = ROOT_DIR / 'data'
 SERVERS_DIR = DATA_DIR / 'servers'
 DOWNLOADS_DIR = DATA_DIR / 'downloads'
+SNAPSHOTS_DIR = DATA_DIR / 'snapshots'
+UPLOADS_DIR = DATA_DIR / 'uploads'
+PROJECT_INDEX_FILE = DATA_DIR / 'modrinth-index.db'
 SETTINGS_FILE = DATA_DIR / 'settings.json'
 
 # Ensure directories exist
 DATA_DIR.mkdir(exist_ok=True)
 SERVERS_DIR.mkdir(exist_ok=True)
 DOWNLOADS_DIR.mkdir(exist_ok=True)
+UPLOADS_DIR.mkdir(exist_ok=True)
 
 app = FastAPI(title="MineHost Local")
 api_router = APIRouter(prefix="/api")
@@ -42,6 +96,48 @@ running_servers: Dict[str, subprocess.Popen] = {}
 server_logs: Dict[str, List[str]] = {}
 websocket_connections: Dict[str, List[WebSocket]] = {}
 
+# Watchdog state (monotonic timestamps)
+server_ready_at: Dict[str, float] = {}
+server_last_output: Dict[str, float] = {}
+server_status: Dict[str, dict] = {}
+watchdog_tasks: Dict[str, asyncio.Task] = {}
+incident_last_capture: Dict[str, float] = {}
+incident_capture_lock = asyncio.Lock()
+server_ready_events: Dict[str, asyncio.Event] = {}
+server_boot_times: Dict[str, float] = {}  # seconds reported by "Done (x s)!"
+
+# Background jobs and console waiters
+jobs: Dict[str, dict] = {}
+JOBS_KEEP = 50
+log_waiters: Dict[str, List[tuple]] = {}
+
+# Start scheduler state
+servers_starting: Dict[str, float] = {}
+start_slots = asyncio.Condition()
+bulk_batches: Dict[str, dict] = {}
+BULK_BATCHES_KEEP = 20
+
+# Hibernation state
+server_idle_since: Dict[str, float] = {}
+sleep_listeners: Dict[str, asyncio.AbstractServer] = {}
+HIBERNATION_CHECK_INTERVAL = 30
+
+# Resource policy state
+server_resource_state: Dict[str, dict] = {}
+RESOURCE_POLICY_INTERVAL = 30
+IONICE_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+CGROUP_ROOT_ENV = 'MINEHOST_CGROUP_ROOT'
+
+# Watchdog tuning
+WATCHDOG_INTERVAL = 15  # seconds between health checks
+WATCHDOG_STALL_SECONDS = 90  # console silence that turns a single failed ping into an incident
+WATCHDOG_PING_TIMEOUT = 5
+WATCHDOG_PING_FAILURES = 2  # consecutive failed pings before capturing
+INCIDENT_COOLDOWN = 600  # minimum seconds between automatic captures per server
+INCIDENT_DUMP_COUNT = 3
+INCIDENT_DUMP_SPACING = 5
+INCIDENT_MAX_KEEP = 20
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -88,6 +184,92 @@ class EulaAccept(BaseModel):
 class CommandInput(BaseModel):
     command: str
 
+class BulkAction(BaseModel):
+    action: str  # start, stop, restart
+    server_ids: List[str]
+
+class AutostartSettings(BaseModel):
+    server_ids: List[str]
+    max_concurrent_starts: int = 2
+    start_timeout: int = 600
+
+class HibernationSettings(BaseModel):
+    enabled: bool = False
+    idle_minutes: int = 15
+    motd: str = "§7Sleeping — join to wake"
+
+class ProtectedArea(BaseModel):
+    name: str
+    dimension: str = "minecraft:overworld"
+    x1: int  # block coordinates, inclusive
+    z1: int
+    x2: int
+    z2: int
+
+class WorldTrim(BaseModel):
+    min_inhabited_ticks: int = 1200  # chunks players spent less time in are removed (20 ticks = 1s)
+    spawn_radius: int = 512  # blocks around spawn that are never trimmed
+    protected_areas: List[ProtectedArea] = []  # in addition to the server's saved areas
+    dimensions: Optional[List[str]] = None  # defaults to every dimension
+    dry_run: bool = False
+
+class WorldCompact(BaseModel):
+    recompress: bool = False  # convert chunks to server.properties region-file-compression
+    drop_corrupt: bool = False  # remove chunks that fail to decode or whose header entry is invalid
+    dimensions: Optional[List[str]] = None
+    dry_run: bool = False
+
+class ModpackImport(BaseModel):
+    version_id: Optional[str] = None  # Modrinth modpack version; not needed for uploaded .mrpack files
+    name: Optional[str] = None  # defaults to the pack name
+    port: Optional[int] = None  # defaults to the next free port
+    ram_min: int = 1024
+    ram_max: int = 4096
+
+class UploadSessionCreate(BaseModel):
+    kind: str  # world, server or mrpack
+    filename: str
+    size: int
+    server_id: Optional[str] = None  # target server for world uploads
+    chunk_size: int = 8 * 1024 * 1024
+    sha256: Optional[str] = None  # of the whole file, checked on finalize
+    modpack: Optional[ModpackImport] = None  # name, port and RAM for mrpack uploads
+
+class PathImport(BaseModel):
+    path: str  # absolute folder (or .zip) on the machine running MineHost
+    mode: str = "auto"  # auto, reflink, hardlink, copy or move
+    name: Optional[str] = None  # world name; defaults to the folder name
+
+class ServerClone(BaseModel):
+    name: Optional[str] = None  # defaults to "<name> (copy)"
+    port: Optional[int] = None  # defaults to the next free port
+    mode: str = "auto"  # auto (reflink, else copy) or copy for worlds and configs
+
+class JarUpdateApply(BaseModel):
+    filenames: Optional[List[str]] = None  # jars to update; defaults to every jar with an update
+
+class SnapshotCreate(BaseModel):
+    worlds: Optional[List[str]] = None  # defaults to every world of the server
+
+class SnapshotPolicy(BaseModel):
+    interval_minutes: int = 0  # 0 disables scheduled snapshots
+    hourly: int = 24
+    daily: int = 7
+    weekly: int = 4
+
+class ResourcePolicy(BaseModel):
+    cpu_affinity: Optional[List[int]] = None  # CPU ids the JVM may run on
+    nice: int = 0
+    ionice_class: Optional[str] = None  # realtime, best-effort, idle
+    ionice_level: int = 4
+    dynamic_priority: bool = True  # deprioritize while no players are online (via cgroup cpu.weight)
+    idle_nice: Optional[int] = None  # also renice while idle; only used if we can lower nice again
+    cpu_weight: int = 100  # cgroup v2 cpu.weight while players are online
+    idle_cpu_weight: int = 20
+    cpu_max: Optional[str] = None  # cgroup v2 cpu.max, e.g. "200000 100000" for two cores
+    memory_max: Optional[str] = None  # cgroup v2 memory.max, e.g. "6G"
+    io_weight: Optional[int] = None  # cgroup v2 io.weight (1-10000)
+
 # ============== Helper Functions ==============
 
 def get_servers_list() -> List[dict]:
@@ -101,12 +283,16 @@ def get_servers_list() -> List[dict]:
                     server_data = json.load(f)
                     server_id = server_data['id']
                     server_data['status'] = 'running' if server_id in running_servers else 'stopped'
+                    if server_id in sleep_listeners:
+                        server_data['status'] = 'sleeping'
                     
                     # Adiciona campos faltantes com valores padrão
                     if 'players_online' not in server_data:
                         server_data['players_online'] = 0
                     if 'max_players' not in server_data:
                         server_data['max_players'] = 20
+                    if server_id in server_status:
+                        server_data['players_online'] = server_status[server_id]['players_online']
                     
                     # Adiciona informações do e4mc se disponível
                     server_data['e4mc_enabled'] = check_e4mc_installed(server_id)
@@ -132,6 +318,38 @@ def save_server_config(server_id: str, config: dict):
     with open(config_file, 'w') as f:
         json.dump(config, f, indent=2)
 
+async def replace_file(path: Path, data: bytes):
+    """Write to a temp file and rename it over path, so hardlinked copies in clones keep their contents"""
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        async with aiofiles.open(tmp, 'wb') as f:
+            await f.write(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+DEFAULT_SETTINGS = {
+    "autostart": [],
+    "max_concurrent_starts": 2,
+    "start_timeout": 600
+}
+
+def load_settings() -> dict:
+    """Load global settings"""
+    settings = dict(DEFAULT_SETTINGS)
+    if SETTINGS_FILE.exists():
+        try:
+            with open(SETTINGS_FILE) as f:
+                settings.update(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Failed to read settings: {e}")
+    return settings
+
+def save_settings(settings: dict):
+    """Save global settings"""
+    with open(SETTINGS_FILE, 'w') as f:
+        json.dump(settings, f, indent=2)
+
 def get_server_properties(server_id: str) -> Dict[str, str]:
     """Parse server.properties file"""
     props_file = SERVERS_DIR / server_id / 'server.properties'
@@ -198,45 +416,124 @@ def check_e4mc_installed(server_id: str) -> bool:
     
     return False
 
+def get_server_address(server_id: str) -> tuple:
+    """Host/port the server listens on, suitable for connecting from this machine"""
+    config = get_server_config(server_id) or {}
+    props = get_server_properties(server_id)
+    host = props.get('server-ip') or '127.0.0.1'
+    try:
+        port = int(props.get('server-port') or config.get('port', 25565))
+    except ValueError:
+        port = config.get('port', 25565)
+    return host, port
+
+# ============== Server List Ping ==============
+
+def pack_varint(value: int) -> bytes:
+    """Encode a Minecraft protocol VarInt"""
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def pack_mc_string(text: str) -> bytes:
+    data = text.encode('utf-8')
+    return pack_varint(len(data)) + data
+
+def pack_packet(packet_id: int, payload: bytes = b'') -> bytes:
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    """Read a VarInt from a stream"""
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            if result & 0x80000000:
+                result -= 1 << 32
+            return result
+    raise ValueError("VarInt too long")
+
+def unpack_varint(data: bytes, offset: int = 0) -> tuple:
+    """Decode a VarInt from a buffer, returning (value, new_offset)"""
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            if result & 0x80000000:
+                result -= 1 << 32
+            return result, offset
+    raise ValueError("VarInt too long")
+
+async def ping_minecraft_server(host: str, port: int, timeout: float = WATCHDOG_PING_TIMEOUT) -> Optional[dict]:
+    """Query a server with the Server List Ping protocol. Returns None if it does not answer in time."""
+    writer = None
+    try:
+        started = time.monotonic()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        handshake = pack_varint(-1) + pack_mc_string(host) + struct.pack('>H', port) + pack_varint(1)
+        writer.write(pack_packet(0x00, handshake) + pack_packet(0x00))
+        await writer.drain()
+
+        async def read_status():
+            await read_varint(reader)  # packet length
+            if await read_varint(reader) != 0x00:
+                raise ValueError("Unexpected packet")
+            length = await read_varint(reader)
+            return json.loads(await reader.readexactly(length))
+
+        status = await asyncio.wait_for(read_status(), timeout)
+        players = status.get('players', {})
+        return {
+            "players_online": players.get('online', 0),
+            "max_players": players.get('max', 0),
+            "version": status.get('version', {}).get('name'),
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "checked_at": datetime.now(timezone.utc).isoformat()
+        }
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        logger.debug(f"Status ping to {host}:{port} failed: {e}")
+        return None
+    finally:
+        if writer:
+            writer.close()
+
 # ============== Mod Dependencies Helper ==============
 
-def extract_mod_dependencies(jar_path: Path) -> List[Dict[str, Any]]:
-    """Extract mod dependencies from fabric.mod.json or mcmod.info"""
+def extract_mod_dependencies(jar_path: Path, loader: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Extract mod dependencies from fabric.mod.json, mods.toml or mcmod.info (the one loader reads)"""
     dependencies = []
     
     try:
         with zipfile.ZipFile(jar_path, 'r') as jar:
-            # Try fabric.mod.json first
-            if 'fabric.mod.json' in jar.namelist():
-                fabric_data = json.loads(jar.read('fabric.mod.json'))
-                for dep in fabric_data.get('depends', {}).keys():
-                    if dep not in ['fabricloader', 'java', 'minecraft']:
-                        dependencies.append({
-                            'name': dep,
-                            'type': 'fabric',
-                            'required': True
-                        })
-            
-            # Try forge mcmod.info
-            if 'mcmod.info' in jar.namelist():
-                try:
-                    forge_data = json.loads(jar.read('mcmod.info'))
-                    mod_info = forge_data[0] if isinstance(forge_data, list) else forge_data
-                    for dep in mod_info.get('dependencies', []):
-                        if isinstance(dep, dict) and dep.get('modid'):
+            for mod in read_mod_manifests(jar, loader):
+                if mod.get('nested'):
+                    continue  # jar-in-jar mods ship with their parent
+                for kind in ('depends', 'optional'):
+                    for dep, versions in mod[kind].items():
+                        if dep not in PLATFORM_MOD_IDS:
                             dependencies.append({
-                                'name': dep['modid'],
-                                'type': 'forge',
-                                'required': dep.get('mandatory', True)
+                                'name': dep,
+                                'type': mod['loader'],
+                                'required': kind == 'depends',
+                                'versions': versions
                             })
-                except (json.JSONDecodeError, IndexError):
-                    pass
     except Exception as e:
         logger.warning(f"Failed to extract dependencies from {jar_path}: {e}")
     
     return dependencies
 
-def get_mod_metadata(jar_path: Path) -> Dict[str, Any]:
+def get_mod_metadata(jar_path: Path, loader: Optional[str] = None) -> Dict[str, Any]:
     """Extract metadata from mod JAR file"""
     metadata = {
         'filename': jar_path.name,
@@ -253,7 +550,7 @@ def get_mod_metadata(jar_path: Path) -> Dict[str, Any]:
                 fabric_data = json.loads(jar.read('fabric.mod.json'))
                 metadata['mod_name'] = fabric_data.get('name', jar_path.stem)
                 metadata['mod_version'] = fabric_data.get('version', 'unknown')
-                metadata['dependencies'] = extract_mod_dependencies(jar_path)
+                metadata['dependencies'] = extract_mod_dependencies(jar_path, loader)
             
             # Forge mod
             elif 'mcmod.info' in jar.namelist():
@@ -262,7 +559,7 @@ def get_mod_metadata(jar_path: Path) -> Dict[str, Any]:
                     mod_info = forge_data[0] if isinstance(forge_data, list) else forge_data
                     metadata['mod_name'] = mod_info.get('name', jar_path.stem)
                     metadata['mod_version'] = mod_info.get('version', 'unknown')
-                    metadata['dependencies'] = extract_mod_dependencies(jar_path)
+                    metadata['dependencies'] = extract_mod_dependencies(jar_path, loader)
                 except:
                     metadata['mod_name'] = jar_path.stem
             else:
@@ -273,11 +570,194 @@ def get_mod_metadata(jar_path: Path) -> Dict[str, Any]:
     
     return metadata
 
+# ============== Upstream HTTP ==============
+
+# Every call to Modrinth, Mojang, PaperMC, Fabric and Forge goes through one shared session.
+# Each host gets a request budget (a token bucket where configured, tightened by the
+# X-Ratelimit-* headers it advertises); requests over budget queue with interactive ones
+# first, and 429/5xx/connection errors are retried with jittered exponential backoff.
+
+UPSTREAM_INTERACTIVE = 0
+UPSTREAM_BACKGROUND = 1
+UPSTREAM_RETRIES = 3
+UPSTREAM_RETRY_STATUSES = {429, 500, 502, 503, 504}
+UPSTREAM_BACKOFF = 0.5  # seconds, doubled per attempt
+UPSTREAM_RATES = {'api.modrinth.com': (5.0, 20)}  # (requests per second, burst); Modrinth allows 300/min
+UPSTREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+
+class UpstreamHost:
+    """Request budget, priority wait queue and counters for one upstream host"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.rate, self.burst = UPSTREAM_RATES.get(host, (None, None))
+        self.tokens = self.burst or 0
+        self.refilled = time.monotonic()
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0  # from Retry-After
+        self.waiters = []  # heap of (priority, sequence, future)
+        self.sequence = 0
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.stats = {"requests": 0, "errors": 0, "retries": 0, "queued": 0, "latency_ms_total": 0.0,
+                      "latency_ms_max": 0.0, "statuses": {}}
+
+    def wait_time(self) -> float:
+        """Seconds until the next request fits the budget"""
+        now = time.monotonic()
+        wait = max(self.blocked_until - now, 0.0)
+        if self.reset_at <= now:
+            self.remaining = None
+        elif self.remaining is not None and self.remaining <= 0:
+            wait = max(wait, self.reset_at - now)
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+            self.refilled = now
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        if self.rate:
+            self.tokens -= 1
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    async def acquire(self, priority: int):
+        if not self.waiters and self.wait_time() == 0:
+            self.take()
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.sequence += 1
+        heapq.heappush(self.waiters, (priority, self.sequence, future))
+        self.stats['queued'] += 1
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self.dispatch())
+        await future
+
+    async def dispatch(self):
+        while self.waiters:
+            wait = self.wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():  # cancelled waiters are dropped
+                self.take()
+                future.set_result(None)
+
+    def observe(self, resp: aiohttp.ClientResponse, latency_ms: float):
+        statuses = self.stats['statuses']
+        statuses[resp.status] = statuses.get(resp.status, 0) + 1
+        self.stats['latency_ms_total'] += latency_ms
+        self.stats['latency_ms_max'] = max(self.stats['latency_ms_max'], latency_ms)
+        if resp.status in UPSTREAM_RETRY_STATUSES:
+            self.stats['errors'] += 1
+        now = time.monotonic()
+        try:
+            if 'X-Ratelimit-Limit' in resp.headers:
+                self.limit = int(resp.headers['X-Ratelimit-Limit'])
+            if 'X-Ratelimit-Remaining' in resp.headers:
+                self.remaining = int(resp.headers['X-Ratelimit-Remaining'])
+                self.reset_at = now + float(resp.headers.get('X-Ratelimit-Reset', 60))
+            if 'Retry-After' in resp.headers:
+                self.blocked_until = now + float(resp.headers['Retry-After'])
+        except ValueError:
+            pass
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "latency_ms_avg": round(self.stats['latency_ms_total'] / max(sum(self.stats['statuses'].values()), 1), 1),
+            "latency_ms_total": round(self.stats['latency_ms_total'], 1),
+            "latency_ms_max": round(self.stats['latency_ms_max'], 1),
+            "waiting": sum(1 for _, _, future in self.waiters if not future.done()),
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": round(self.reset_at - now, 1) if self.reset_at > now else None,
+        }
+
+class UpstreamClient:
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.hosts: Dict[str, UpstreamHost] = {}
+
+    def host_state(self, url: str) -> UpstreamHost:
+        host = urlsplit(url).hostname or ''
+        if host not in self.hosts:
+            self.hosts[host] = UpstreamHost(host)
+        return self.hosts[host]
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=UPSTREAM_TIMEOUT,
+                                                 connector=aiohttp.TCPConnector(limit=100, limit_per_host=16))
+        return self.session
+
+    @contextlib.asynccontextmanager
+    async def request(self, method: str, url: str, priority: int = UPSTREAM_INTERACTIVE, **kwargs):
+        """
+        Send a request within the host's budget and yield the response. Retryable failures are
+        retried; the last response is yielded as-is once retries run out.
+        """
+        state = self.host_state(url)
+        for attempt in range(UPSTREAM_RETRIES + 1):
+            await state.acquire(priority)
+            state.stats['requests'] += 1
+            started = time.monotonic()
+            try:
+                resp = await self.get_session().request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                state.stats['errors'] += 1
+                if attempt == UPSTREAM_RETRIES:
+                    raise
+                logger.debug(f"{method} {url} failed ({e}), retrying")
+            else:
+                state.observe(resp, (time.monotonic() - started) * 1000)
+                if resp.status not in UPSTREAM_RETRY_STATUSES or attempt == UPSTREAM_RETRIES:
+                    try:
+                        yield resp
+                    finally:
+                        resp.release()
+                    return
+                resp.release()
+            state.stats['retries'] += 1
+            await asyncio.sleep(UPSTREAM_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+class UpstreamSession:
+    """aiohttp-style facade over the shared client for one priority class"""
+
+    def __init__(self, client: UpstreamClient, priority: int):
+        self.client = client
+        self.priority = priority
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.client.request(method, url, self.priority, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+upstream = UpstreamClient()
+
+@contextlib.asynccontextmanager
+async def upstream_session(priority: int = UPSTREAM_INTERACTIVE):
+    """Drop-in for aiohttp.ClientSession() that shares connections and per-host budgets"""
+    yield UpstreamSession(upstream, priority)
+
 # ============== Version APIs ==============
 
 async def fetch_vanilla_versions() -> List[dict]:
     """Fetch vanilla Minecraft versions from Mojang API"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session() as session:
         async with session.get('https://launchermeta.mojang.com/mc/game/version_manifest_v2.json') as resp:
             if resp.status == 200:
                 data = await resp.json()
@@ -295,7 +775,7 @@ async def fetch_vanilla_versions() -> List[dict]:
 
 async def fetch_paper_versions() -> List[dict]:
     """Fetch Paper versions from PaperMC API"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session() as session:
         async with session.get('https://api.papermc.io/v2/projects/paper') as resp:
             if resp.status == 200:
                 data = await resp.json()
@@ -310,7 +790,7 @@ async def fetch_paper_versions() -> List[dict]:
 
 async def fetch_fabric_versions() -> List[dict]:
     """Fetch Fabric versions"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session() as session:
         async with session.get('https://meta.fabricmc.net/v2/versions/game') as resp:
             if resp.status == 200:
                 data = await resp.json()
@@ -325,7 +805,7 @@ async def fetch_fabric_versions() -> List[dict]:
 
 async def fetch_forge_versions() -> List[dict]:
     """Fetch Forge versions from Forge files API"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session() as session:
         async with session.get('https://files.minecraftforge.net/net/minecraftforge/forge/promotions_slim.json') as resp:
             if resp.status == 200:
                 data = await resp.json()
@@ -348,7 +828,7 @@ async def fetch_forge_versions() -> List[dict]:
 
 async def download_vanilla_jar(version: str, dest_path: Path) -> bool:
     """Download vanilla server JAR"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session(UPSTREAM_BACKGROUND) as session:
         # Get version manifest
         async with session.get('https://launchermeta.mojang.com/mc/game/version_manifest_v2.json') as resp:
             if resp.status != 200:
@@ -385,7 +865,7 @@ async def download_vanilla_jar(version: str, dest_path: Path) -> bool:
 
 async def download_paper_jar(version: str, dest_path: Path) -> bool:
     """Download Paper server JAR"""
-    async with aiohttp.ClientSession() as session:
+    async with upstream_session(UPSTREAM_BACKGROUND) as session:
         # Get latest build
         async with session.get(f'https://api.papermc.io/v2/projects/paper/versions/{version}') as resp:
             if resp.status != 200:
@@ -417,19 +897,20 @@ async def download_paper_jar(version: str, dest_path: Path) -> bool:
                 return True
     return False
 
-async def download_fabric_jar(version: str, dest_path: Path) -> bool:
-    """Download Fabric server JAR"""
-    async with aiohttp.ClientSession() as session:
-        # Get latest loader version
-        async with session.get('https://meta.fabricmc.net/v2/versions/loader') as resp:
-            if resp.status != 200:
+async def download_fabric_jar(version: str, dest_path: Path, loader_version: Optional[str] = None) -> bool:
+    """Download Fabric server JAR (latest loader unless one is given)"""
+    async with upstream_session(UPSTREAM_BACKGROUND) as session:
+        if not loader_version:
+            # Get latest loader version
+            async with session.get('https://meta.fabricmc.net/v2/versions/loader') as resp:
+                if resp.status != 200:
+                    return False
+                loaders = await resp.json()
+            
+            if not loaders:
                 return False
-            loaders = await resp.json()
-        
-        if not loaders:
-            return False
-        
-        loader_version = loaders[0]['version']
+            
+            loader_version = loaders[0]['version']
         
         # Get latest installer version
         async with session.get('https://meta.fabricmc.net/v2/versions/installer') as resp:
@@ -452,20 +933,21 @@ async def download_fabric_jar(version: str, dest_path: Path) -> bool:
                 return True
     return False
 
-async def download_forge_jar(version: str, dest_path: Path) -> bool:
-    """Download Forge server JAR - Returns installer"""
-    async with aiohttp.ClientSession() as session:
-        # Get promotion data
-        async with session.get('https://files.minecraftforge.net/net/minecraftforge/forge/promotions_slim.json') as resp:
-            if resp.status != 200:
-                return False
-            data = await resp.json()
-        
-        promos = data.get('promos', {})
-        forge_version = promos.get(f'{version}-recommended') or promos.get(f'{version}-latest')
-        
+async def download_forge_jar(version: str, dest_path: Path, forge_version: Optional[str] = None) -> bool:
+    """Download Forge server JAR - Returns installer (recommended build unless one is given)"""
+    async with upstream_session(UPSTREAM_BACKGROUND) as session:
         if not forge_version:
-            return False
+            # Get promotion data
+            async with session.get('https://files.minecraftforge.net/net/minecraftforge/forge/promotions_slim.json') as resp:
+                if resp.status != 200:
+                    return False
+                data = await resp.json()
+            
+            promos = data.get('promos', {})
+            forge_version = promos.get(f'{version}-recommended') or promos.get(f'{version}-latest')
+            
+            if not forge_version:
+                return False
         
         # Download installer
         full_version = f'{version}-{forge_version}'
@@ -507,15 +989,8 @@ async def list_servers():
     servers = get_servers_list()
     return servers
 
-@api_router.post("/servers", response_model=ServerResponse)
-async def create_server(server: ServerCreate, background_tasks: BackgroundTasks):
-    """Create a new server"""
-    server_id = str(uuid.uuid4())[:8]
-    server_path = SERVERS_DIR / server_id
-    server_path.mkdir(exist_ok=True)
-    
-    # Create config
-    config = {
+def new_server_config(server_id: str, server: ServerCreate) -> dict:
+    return {
         "id": server_id,
         "name": server.name,
         "server_type": server.server_type,
@@ -530,63 +1005,76 @@ async def create_server(server: ServerCreate, background_tasks: BackgroundTasks)
         "max_players": 20,
         "eula_accepted": False
     }
+
+async def install_server_jar(server_id: str, server: ServerCreate, loader_version: Optional[str] = None) -> bool:
+    """Download the server JAR and write default server.properties and start scripts"""
+    server_path = SERVERS_DIR / server_id
+    jar_path = server_path / 'server.jar'
+    success = False
+    
+    if server.server_type == 'vanilla':
+        success = await download_vanilla_jar(server.version, jar_path)
+    elif server.server_type == 'paper':
+        success = await download_paper_jar(server.version, jar_path)
+    elif server.server_type == 'fabric':
+        success = await download_fabric_jar(server.version, jar_path, loader_version)
+    elif server.server_type == 'forge':
+        success = await download_forge_jar(server.version, jar_path, loader_version)
+    
+    if not success:
+        return False
+    
+    # Create default server.properties
+    default_props = {
+        "server-port": str(server.port),
+        "motd": f"A {server.name} Server",
+        "max-players": "20",
+        "difficulty": "normal",
+        "gamemode": "survival",
+        "level-name": "world",
+        "enable-command-block": "false",
+        "spawn-protection": "16",
+        "view-distance": "10",
+        "simulation-distance": "10",
+        "online-mode": "false",
+        "white-list": "false",
+        "pvp": "true",
+        "spawn-animals": "true",
+        "spawn-monsters": "true",
+        "spawn-npcs": "true",
+        "allow-flight": "false",
+        "level-type": "minecraft:normal",
+        "enforce-secure-profile": "false"
+    }
+    save_server_properties(server_id, default_props)
+    
+    # Create start scripts
+    start_sh = server_path / 'start.sh'
+    start_bat = server_path / 'start.bat'
+    
+    with open(start_sh, 'w') as f:
+        f.write(f'#!/bin/bash\njava -Xms{server.ram_min}M -Xmx{server.ram_max}M -jar server.jar nogui\n')
+    os.chmod(start_sh, 0o755)
+    
+    with open(start_bat, 'w') as f:
+        f.write(f'@echo off\njava -Xms{server.ram_min}M -Xmx{server.ram_max}M -jar server.jar nogui\npause\n')
+    return True
+
+@api_router.post("/servers", response_model=ServerResponse)
+async def create_server(server: ServerCreate, background_tasks: BackgroundTasks):
+    """Create a new server"""
+    server_id = str(uuid.uuid4())[:8]
+    server_path = SERVERS_DIR / server_id
+    server_path.mkdir(exist_ok=True)
+    
+    # Create config
+    config = new_server_config(server_id, server)
     save_server_config(server_id, config)
     
     # Download server JAR in background
     async def download_and_setup():
-        jar_path = server_path / 'server.jar'
-        success = False
-        
         try:
-            if server.server_type == 'vanilla':
-                success = await download_vanilla_jar(server.version, jar_path)
-            elif server.server_type == 'paper':
-                success = await download_paper_jar(server.version, jar_path)
-            elif server.server_type == 'fabric':
-                success = await download_fabric_jar(server.version, jar_path)
-            elif server.server_type == 'forge':
-                success = await download_forge_jar(server.version, jar_path)
-            
-            if success:
-                # Create default server.properties
-                default_props = {
-                    "server-port": str(server.port),
-                    "motd": f"A {server.name} Server",
-                    "max-players": "20",
-                    "difficulty": "normal",
-                    "gamemode": "survival",
-                    "level-name": "world",
-                    "enable-command-block": "false",
-                    "spawn-protection": "16",
-                    "view-distance": "10",
-                    "simulation-distance": "10",
-                    "online-mode": "false",
-                    "white-list": "false",
-                    "pvp": "true",
-                    "spawn-animals": "true",
-                    "spawn-monsters": "true",
-                    "spawn-npcs": "true",
-                    "allow-flight": "false",
-                    "level-type": "minecraft:normal",
-                    "enforce-secure-profile": "false"
-                }
-                save_server_properties(server_id, default_props)
-                
-                # Create start scripts
-                start_sh = server_path / 'start.sh'
-                start_bat = server_path / 'start.bat'
-                
-                with open(start_sh, 'w') as f:
-                    f.write(f'#!/bin/bash\njava -Xms{server.ram_min}M -Xmx{server.ram_max}M -jar server.jar nogui\n')
-                os.chmod(start_sh, 0o755)
-                
-                with open(start_bat, 'w') as f:
-                    f.write(f'@echo off\njava -Xms{server.ram_min}M -Xmx{server.ram_max}M -jar server.jar nogui\npause\n')
-                
-                config['status'] = 'stopped'
-            else:
-                config['status'] = 'error'
-            
+            config['status'] = 'stopped' if await install_server_jar(server_id, server) else 'error'
             save_server_config(server_id, config)
         except Exception as e:
             logger.error(f"Error setting up server: {e}")
@@ -605,6 +1093,10 @@ async def get_server(server_id: str):
         raise HTTPException(status_code=404, detail="Server not found")
     
     config['status'] = 'running' if server_id in running_servers else config.get('status', 'stopped')
+    if server_id in sleep_listeners:
+        config['status'] = 'sleeping'
+    if server_id in server_status:
+        config['players_online'] = server_status[server_id]['players_online']
     
     # Adiciona informações do e4mc
     config['e4mc_enabled'] = check_e4mc_installed(server_id)
@@ -652,6 +1144,7 @@ async def delete_server(server_id: str):
     # Stop if running
     if server_id in running_servers:
         await stop_server(server_id)
+    await close_sleep_listener(server_id)
     
     # Delete directory
     server_path = SERVERS_DIR / server_id
@@ -717,6 +1210,9 @@ async def start_server(server_id: str):
     if server_id in running_servers:
         raise HTTPException(status_code=400, detail="Server already running")
     
+    if get_world_lock(server_id).locked():
+        raise HTTPException(status_code=400, detail="World maintenance in progress")
+    
     if not config.get('eula_accepted'):
         raise HTTPException(status_code=400, detail="EULA must be accepted first")
     
@@ -766,6 +1262,10 @@ async def start_server(server_id: str):
         'nogui'
     ]
     
+    # A hibernating server's port is held by the wake listener
+    await close_sleep_listener(server_id)
+    config.pop('hibernating', None)
+    
     # Start process
     try:
         process = subprocess.Popen(
@@ -780,9 +1280,15 @@ async def start_server(server_id: str):
         
         running_servers[server_id] = process
         server_logs[server_id] = []
+        server_ready_events[server_id] = asyncio.Event()
         
-        # Start log reader task
+        if 'resources' in config:
+            await asyncio.to_thread(apply_resource_policy, server_id, process.pid, get_resource_policy(config))
+        
+        # Start log reader and watchdog tasks
         asyncio.create_task(read_server_logs(server_id, process))
+        server_last_output[server_id] = time.monotonic()
+        watchdog_tasks[server_id] = asyncio.create_task(run_watchdog(server_id, process))
         
         config['status'] = 'running'
         config['last_started'] = datetime.now(timezone.utc).isoformat()
@@ -811,6 +1317,8 @@ async def read_server_logs(server_id: str, process: subprocess.Popen):
                     server_logs[server_id] = []
                 
                 server_logs[server_id].append(log_entry)
+                watchdog_observe_line(server_id, process, log_entry['message'])
+                notify_log_waiters(server_id, log_entry['message'])
                 
                 # Keep only last 1000 lines
                 if len(server_logs[server_id]) > 1000:
@@ -829,6 +1337,8 @@ async def read_server_logs(server_id: str, process: subprocess.Popen):
         # Cleanup when process ends
         if server_id in running_servers:
             del running_servers[server_id]
+        clear_watchdog_state(server_id)
+        release_resource_state(server_id)
         
         config = get_server_config(server_id)
         if config:
@@ -848,18 +1358,20 @@ async def stop_server(server_id: str):
         process.stdin.write("stop\n")
         process.stdin.flush()
         
-        # Wait for graceful shutdown
+        # Wait for graceful shutdown without blocking the event loop
         try:
-            process.wait(timeout=30)
+            await asyncio.to_thread(process.wait, timeout=30)
         except subprocess.TimeoutExpired:
             process.terminate()
-            process.wait(timeout=10)
+            await asyncio.to_thread(process.wait, timeout=10)
     except Exception as e:
         logger.error(f"Error stopping server: {e}")
         process.kill()
     
     if server_id in running_servers:
         del running_servers[server_id]
+    clear_watchdog_state(server_id)
+    release_resource_state(server_id)
     
     config = get_server_config(server_id)
     if config:
@@ -927,87 +1439,1304 @@ async def websocket_logs(websocket: WebSocket, server_id: str):
         if server_id in websocket_connections:
             websocket_connections[server_id].remove(websocket)
 
-# ============== Mods/Plugins API (Modrinth) ==============
+# ============== Background Jobs ==============
 
-@api_router.get("/mods/search")
-async def search_mods(query: str, loader: str = "fabric", version: str = "", limit: int = 20):
-    """Search mods on Modrinth"""
-    facets = [
-        [f'project_type:mod'],
-        [f'categories:{loader}']
-    ]
-    
-    if version:
-        facets.append([f'versions:{version}'])
-    
-    params = {
-        'query': query,
-        'limit': limit,
-        'facets': json.dumps(facets)
+def create_job(kind: str, server_id: Optional[str], work: Callable[[dict], Awaitable[Any]]) -> dict:
+    """Register a long-running job and run it in the background. work(job) returns the result."""
+    job = {
+        "id": str(uuid.uuid4())[:8],
+        "kind": kind,
+        "server_id": server_id,
+        "status": "running",
+        "progress": 0.0,
+        "message": "",
+        "result": None,
+        "error": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None
     }
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get('https://api.modrinth.com/v2/search', params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                return {"mods": data.get('hits', [])}
-    
-    return {"mods": []}
+    jobs[job['id']] = job
+    for old_id in list(jobs)[:-JOBS_KEEP]:
+        if jobs[old_id]['status'] != 'running':
+            del jobs[old_id]
 
-@api_router.get("/mods/{mod_id}")
-async def get_mod_details(mod_id: str):
-    """Get mod details from Modrinth"""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f'https://api.modrinth.com/v2/project/{mod_id}') as resp:
-            if resp.status == 200:
-                return await resp.json()
-    
-    raise HTTPException(status_code=404, detail="Mod not found")
+    async def run():
+        try:
+            job['result'] = await work(job)
+            job['status'] = 'completed'
+            job['progress'] = 1.0
+        except HTTPException as e:
+            job['status'] = 'failed'
+            job['error'] = e.detail
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({kind}) failed: {e}")
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        finally:
+            job['finished_at'] = datetime.now(timezone.utc).isoformat()
 
-@api_router.get("/mods/{mod_id}/versions")
-async def get_mod_versions(mod_id: str, loader: str = "", game_version: str = ""):
-    """Get mod versions from Modrinth"""
-    params = {}
-    if loader:
-        params['loaders'] = json.dumps([loader])
-    if game_version:
-        params['game_versions'] = json.dumps([game_version])
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f'https://api.modrinth.com/v2/project/{mod_id}/version', params=params) as resp:
-            if resp.status == 200:
-                return {"versions": await resp.json()}
-    
-    return {"versions": []}
+    asyncio.create_task(run())
+    return job
 
-@api_router.post("/servers/{server_id}/mods")
-async def install_mod(server_id: str, mod_id: str, version_id: str):
-    """Install a mod to the server with automatic dependency installation"""
+def update_job(job: dict, progress: Optional[float] = None, message: Optional[str] = None):
+    """Report job progress; safe to call from worker threads"""
+    if progress is not None:
+        job['progress'] = round(min(max(progress, 0.0), 1.0), 4)
+    if message is not None:
+        job['message'] = message
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get background job status"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs[job_id]
+
+@api_router.get("/servers/{server_id}/jobs")
+async def list_server_jobs(server_id: str):
+    """List recent background jobs for a server"""
+    return {"jobs": [job for job in reversed(jobs.values()) if job['server_id'] == server_id]}
+
+# ============== Console Coordination ==============
+
+def send_server_command(server_id: str, command: str):
+    """Write a command to a running server's console"""
+    process = running_servers[server_id]
+    process.stdin.write(f"{command}\n")
+    process.stdin.flush()
+
+def expect_log(server_id: str, pattern: str) -> asyncio.Future:
+    """Future resolved with the next console line matching pattern. Register before sending the command."""
+    future = asyncio.get_running_loop().create_future()
+    log_waiters.setdefault(server_id, []).append((re.compile(pattern), future))
+    return future
+
+def notify_log_waiters(server_id: str, message: str):
+    waiters = log_waiters.get(server_id)
+    if not waiters:
+        return
+    remaining = []
+    for pattern, future in waiters:
+        if future.done():
+            continue
+        if pattern.search(message):
+            future.set_result(message)
+        else:
+            remaining.append((pattern, future))
+    log_waiters[server_id] = remaining
+
+async def run_and_wait(server_id: str, command: str, pattern: str, timeout: float) -> Optional[str]:
+    """Send a command and wait for a matching console line; None on timeout"""
+    future = expect_log(server_id, pattern)
+    try:
+        send_server_command(server_id, command)
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        future.cancel()
+
+@contextlib.asynccontextmanager
+async def world_saves_paused(server_id: str):
+    """Flush the world to disk and keep the server from writing it until the block exits"""
+    if server_id not in running_servers:
+        yield
+        return
+
+    await run_and_wait(server_id, 'save-off', r'(?i)saving is now disabled|saving is already turned off', 15)
+    try:
+        if await run_and_wait(server_id, 'save-all flush', r'(?i)saved the game', 300) is None:
+            raise HTTPException(status_code=500, detail="Server did not confirm the world save")
+        yield
+    finally:
+        if server_id in running_servers:
+            try:
+                send_server_command(server_id, 'save-on')
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to re-enable saving on {server_id}: {e}")
+
+# ============== Watchdog / Incidents ==============
+
+def watchdog_observe_line(server_id: str, process: subprocess.Popen, message: str):
+    """Feed a console line to the watchdog"""
+    server_last_output[server_id] = time.monotonic()
+
+    if server_id not in server_ready_at and 'Done (' in message:
+        server_ready_at[server_id] = time.monotonic()
+        match = re.search(r'Done \(([\d.]+)s\)!', message)
+        if match:
+            server_boot_times[server_id] = float(match.group(1))
+        if server_id in server_ready_events:
+            server_ready_events[server_id].set()
+    elif "Can't keep up!" in message:
+        trigger_incident(server_id, process, 'lag', message)
+
+def clear_watchdog_state(server_id: str):
+    """Forget watchdog state for a server that is no longer running"""
+    server_ready_at.pop(server_id, None)
+    server_last_output.pop(server_id, None)
+    server_status.pop(server_id, None)
+    server_boot_times.pop(server_id, None)
+    server_idle_since.pop(server_id, None)
+    for _, future in log_waiters.pop(server_id, []):
+        if not future.done():
+            future.set_exception(HTTPException(status_code=400, detail="Server stopped"))
+    # Wake anyone waiting for this server to become ready
+    event = server_ready_events.pop(server_id, None)
+    if event:
+        event.set()
+    task = watchdog_tasks.pop(server_id, None)
+    if task and task is not asyncio.current_task():
+        task.cancel()
+
+def trigger_incident(server_id: str, process: subprocess.Popen, reason: str, detail: str, force: bool = False) -> bool:
+    """Schedule an incident capture unless one is running or the server is in cooldown"""
+    if incident_capture_lock.locked():
+        return False
+
+    last = incident_last_capture.get(server_id)
+    if not force and last is not None and time.monotonic() - last < INCIDENT_COOLDOWN:
+        return False
+
+    incident_last_capture[server_id] = time.monotonic()
+    asyncio.create_task(capture_incident(server_id, process.pid, reason, detail))
+    return True
+
+async def run_watchdog(server_id: str, process: subprocess.Popen):
+    """Periodically ping a running server and capture an incident when it stops answering"""
+    failures = 0
+    try:
+        while running_servers.get(server_id) is process and process.poll() is None:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+
+            # Nothing to check until the world has finished loading
+            if server_id not in server_ready_at:
+                continue
+
+            host, port = get_server_address(server_id)
+            status = await ping_minecraft_server(host, port)
+            if status:
+                failures = 0
+                server_status[server_id] = status
+                continue
+
+            failures += 1
+            silent_for = time.monotonic() - server_last_output.get(server_id, 0)
+            if silent_for >= WATCHDOG_STALL_SECONDS:
+                trigger_incident(server_id, process, 'stall', f"No console output for {int(silent_for)}s and status ping failed")
+            elif failures >= WATCHDOG_PING_FAILURES:
+                trigger_incident(server_id, process, 'ping', f"{failures} consecutive status pings failed")
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"Watchdog for {server_id} failed: {e}")
+
+def find_jcmd() -> Optional[str]:
+    """Locate jcmd, preferring the JDK that provides the java binary"""
+    java_home = os.environ.get('JAVA_HOME')
+    if java_home:
+        candidate = Path(java_home) / 'bin' / 'jcmd'
+        if candidate.exists():
+            return str(candidate)
+
+    jcmd = shutil.which('jcmd')
+    if jcmd:
+        return jcmd
+
+    java = shutil.which('java')
+    if java:
+        candidate = Path(java).resolve().parent / 'jcmd'
+        if candidate.exists():
+            return str(candidate)
+    return None
+
+async def run_capture_command(cmd: List[str], output_file: Path, timeout: int = 30) -> Optional[int]:
+    """Run a diagnostic command at low priority, writing its output straight to a file"""
+    with open(output_file, 'wb') as out:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=out, stderr=subprocess.STDOUT)
+        try:
+            psutil.Process(proc.pid).nice(10)
+        except (psutil.Error, OSError):
+            pass
+        try:
+            return await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None
+
+async def capture_incident(server_id: str, pid: int, reason: str, detail: str):
+    """Capture spaced thread dumps and a heap summary into a timestamped incident folder"""
+    async with incident_capture_lock:
+        now = datetime.now(timezone.utc)
+        incident_id = f"{now.strftime('%Y%m%d-%H%M%S')}-{reason}"
+        incident_dir = SERVERS_DIR / server_id / 'incidents' / incident_id
+        incident_dir.mkdir(parents=True, exist_ok=True)
+
+        meta = {
+            "id": incident_id,
+            "reason": reason,
+            "detail": detail,
+            "pid": pid,
+            "created_at": now.isoformat(),
+            "files": [],
+            "errors": []
+        }
+
+        # Console tail is already in memory, so it costs nothing to keep
+        with open(incident_dir / 'console.log', 'w') as f:
+            for entry in server_logs.get(server_id, [])[-300:]:
+                f.write(f"{entry['time']} {entry['message']}\n")
+        meta['files'].append('console.log')
+
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                cpu = proc.cpu_times()
+                meta['process'] = {
+                    "rss": proc.memory_info().rss,
+                    "threads": proc.num_threads(),
+                    "cpu_user": cpu.user,
+                    "cpu_system": cpu.system
+                }
+        except psutil.Error as e:
+            meta['errors'].append(f"Process info unavailable: {e}")
+
+        jcmd = find_jcmd()
+        if not jcmd:
+            meta['errors'].append("jcmd not found; install a full JDK to capture thread dumps")
+        else:
+            for i in range(INCIDENT_DUMP_COUNT):
+                if i:
+                    await asyncio.sleep(INCIDENT_DUMP_SPACING)
+                filename = f'threads-{i + 1}.txt'
+                code = await run_capture_command([jcmd, str(pid), 'Thread.print', '-l'], incident_dir / filename)
+                meta['files'].append(filename)
+                if code != 0:
+                    meta['errors'].append(f"{filename}: jcmd exited with {code}")
+
+            for command, filename in [('GC.heap_info', 'gc-heap.txt'), ('VM.info', 'vm-info.txt')]:
+                code = await run_capture_command([jcmd, str(pid), command], incident_dir / filename)
+                meta['files'].append(filename)
+                if code != 0:
+                    meta['errors'].append(f"{filename}: jcmd exited with {code}")
+
+        meta['completed_at'] = datetime.now(timezone.utc).isoformat()
+        with open(incident_dir / 'incident.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        logger.warning(f"Captured incident {incident_id} for server {server_id}: {detail}")
+        prune_incidents(server_id)
+
+def prune_incidents(server_id: str):
+    """Keep only the most recent incidents"""
+    incidents_dir = SERVERS_DIR / server_id / 'incidents'
+    if not incidents_dir.exists():
+        return
+    for old in sorted(d for d in incidents_dir.iterdir() if d.is_dir())[:-INCIDENT_MAX_KEEP]:
+        shutil.rmtree(old, ignore_errors=True)
+
+def get_incident_dir(server_id: str, incident_id: str) -> Path:
+    incident_dir = SERVERS_DIR / server_id / 'incidents' / incident_id
+    if '/' in incident_id or '..' in incident_id or not (incident_dir / 'incident.json').exists():
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return incident_dir
+
+@api_router.get("/servers/{server_id}/incidents")
+async def list_incidents(server_id: str):
+    """List captured lag/hang incidents"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    server_path = SERVERS_DIR / server_id
-    mods_path = server_path / 'mods'
-    mods_path.mkdir(exist_ok=True)
-    
-    installed_mods = []
-    
-    async def download_and_install_mod(mid: str, vid: str, is_dependency: bool = False) -> Optional[str]:
-        """Download and install a single mod"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'https://api.modrinth.com/v2/version/{vid}') as resp:
-                if resp.status != 200:
-                    return None
-                version_data = await resp.json()
-            
-            # Download primary file
-            files = version_data.get('files', [])
-            primary_file = next((f for f in files if f.get('primary')), files[0] if files else None)
-            
-            if not primary_file:
-                return None
-            
+
+    incidents = []
+    incidents_dir = SERVERS_DIR / server_id / 'incidents'
+    if incidents_dir.exists():
+        for meta_file in sorted(incidents_dir.glob('*/incident.json'), reverse=True):
+            try:
+                with open(meta_file) as f:
+                    incidents.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+
+    return {"incidents": incidents, "capturing": incident_capture_lock.locked()}
+
+@api_router.post("/servers/{server_id}/incidents")
+async def create_incident(server_id: str):
+    """Capture an incident now"""
+    if server_id not in running_servers:
+        raise HTTPException(status_code=400, detail="Server not running")
+
+    if not trigger_incident(server_id, running_servers[server_id], 'manual', "Requested via API", force=True):
+        raise HTTPException(status_code=409, detail="An incident capture is already in progress")
+
+    return {"message": "Incident capture started"}
+
+@api_router.get("/servers/{server_id}/incidents/{incident_id}")
+async def get_incident(server_id: str, incident_id: str):
+    """Get incident details"""
+    incident_dir = get_incident_dir(server_id, incident_id)
+    with open(incident_dir / 'incident.json') as f:
+        return json.load(f)
+
+@api_router.get("/servers/{server_id}/incidents/{incident_id}/files/{filename}")
+async def get_incident_file(server_id: str, incident_id: str, filename: str):
+    """Download a file captured for an incident"""
+    file_path = get_incident_dir(server_id, incident_id) / filename
+    if '/' in filename or '..' in filename or not file_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return FileResponse(file_path, media_type='text/plain', filename=filename)
+
+# ============== Resource Policies ==============
+
+_cgroup_root: Optional[Path] = None
+_cgroup_checked = False
+
+def get_resource_policy(config: dict) -> dict:
+    """Resource policy from config.json with defaults filled in"""
+    return ResourcePolicy(**config.get('resources', {})).model_dump()
+
+def get_cgroup_root() -> Optional[Path]:
+    """
+    Cgroup v2 directory we may create per-server groups in.
+    Uses MINEHOST_CGROUP_ROOT if set, otherwise the backend's own cgroup when it is
+    delegated to us (e.g. systemd-run --user -p Delegate=yes).
+    """
+    global _cgroup_root, _cgroup_checked
+    if _cgroup_checked:
+        return _cgroup_root
+    _cgroup_checked = True
+
+    if not sys.platform.startswith('linux'):
+        return None
+
+    configured = os.environ.get(CGROUP_ROOT_ENV)
+    own_group = False
+    if configured:
+        root = Path(configured)
+    else:
+        try:
+            with open('/proc/self/cgroup') as f:
+                relative = next((line.strip()[3:] for line in f if line.startswith('0::')), None)
+        except OSError:
+            relative = None
+        if relative is None:
+            return None
+        root = Path('/sys/fs/cgroup') / relative.lstrip('/')
+        own_group = True
+
+    if not (root / 'cgroup.controllers').exists() or not os.access(root / 'cgroup.subtree_control', os.W_OK):
+        return None
+
+    wanted = {'cpu', 'memory', 'io'} & set((root / 'cgroup.controllers').read_text().split())
+    enable = ' '.join(f'+{c}' for c in sorted(wanted))
+    try:
+        (root / 'cgroup.subtree_control').write_text(enable)
+    except OSError:
+        if not own_group:
+            logger.warning(f"Cannot enable cgroup controllers in {root}")
+            return None
+        # A cgroup with member processes cannot delegate controllers, so move ourselves into a leaf first
+        try:
+            leaf = root / 'minehost-backend'
+            leaf.mkdir(exist_ok=True)
+            (leaf / 'cgroup.procs').write_text(str(os.getpid()))
+            (root / 'cgroup.subtree_control').write_text(enable)
+        except OSError as e:
+            logger.info(f"cgroup v2 limits unavailable: {e}")
+            return None
+
+    _cgroup_root = root
+    return root
+
+def write_cgroup_value(cgroup: Path, name: str, value: str, errors: List[str]):
+    control = cgroup / name
+    if not control.exists():
+        errors.append(f"{name} not supported by this cgroup")
+        return
+    try:
+        control.write_text(value)
+    except OSError as e:
+        errors.append(f"{name}: {e}")
+
+def can_lower_nice(nice: int) -> bool:
+    """Whether this process may set a nice value of nice, i.e. undo an earlier renice"""
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        return True
+    if resource is None or not hasattr(resource, 'RLIMIT_NICE'):
+        return False
+    return nice >= 20 - resource.getrlimit(resource.RLIMIT_NICE)[0]
+
+def apply_resource_policy(server_id: str, pid: int, policy: dict) -> dict:
+    """Apply affinity, nice/ionice and cgroup limits to every thread of a server JVM"""
+    status = server_status.get(server_id)
+    idle = policy['dynamic_priority'] and status is not None and status['players_online'] == 0
+    # Idle/active switching goes through cpu.weight; renicing is only safe when we can
+    # restore the active nice value afterwards (CAP_SYS_NICE or a sufficient RLIMIT_NICE)
+    renice_idle = idle and policy['idle_nice'] is not None and can_lower_nice(policy['nice'])
+    nice_value = policy['idle_nice'] if renice_idle else policy['nice']
+    state = {
+        "pid": pid,
+        "idle": idle,
+        "nice": nice_value,
+        "cpu_affinity": policy['cpu_affinity'],
+        "cgroup": None,
+        "errors": [],
+        "applied_at": datetime.now(timezone.utc).isoformat()
+    }
+    errors = state['errors']
+
+    try:
+        proc = psutil.Process(pid)
+        # Linux schedules threads individually, so apply to each one; threads created later
+        # inherit from their parent and are picked up by the next periodic pass.
+        if sys.platform.startswith('linux'):
+            targets = [psutil.Process(t.id) for t in proc.threads()]
+        else:
+            targets = [proc]
+    except psutil.Error as e:
+        errors.append(f"Process unavailable: {e}")
+        server_resource_state[server_id] = state
+        return state
+
+    for target in targets:
+        try:
+            if policy['cpu_affinity'] and hasattr(target, 'cpu_affinity'):
+                target.cpu_affinity(policy['cpu_affinity'])
+            if target.nice() != nice_value:
+                target.nice(nice_value)
+            if policy['ionice_class'] and hasattr(target, 'ionice'):
+                ioclass = IONICE_CLASSES[policy['ionice_class']]
+                target.ionice(ioclass, None if ioclass == 3 else policy['ionice_level'])
+        except psutil.NoSuchProcess:
+            continue
+        except psutil.AccessDenied as e:
+            message = f"Permission denied ({e.msg or 'raising priority needs CAP_SYS_NICE'})"
+            if message not in errors:
+                errors.append(message)
+        except (ValueError, OSError) as e:
+            if str(e) not in errors:
+                errors.append(str(e))
+
+    cgroup_root = get_cgroup_root()
+    if cgroup_root:
+        cgroup = cgroup_root / f'minehost-{server_id}'
+        try:
+            cgroup.mkdir(exist_ok=True)
+            write_cgroup_value(cgroup, 'cpu.max', policy['cpu_max'] or 'max', errors)
+            write_cgroup_value(cgroup, 'memory.max', policy['memory_max'] or 'max', errors)
+            write_cgroup_value(cgroup, 'cpu.weight', str(policy['idle_cpu_weight'] if idle else policy['cpu_weight']), errors)
+            if policy['io_weight']:
+                write_cgroup_value(cgroup, 'io.weight', f"default {policy['io_weight']}", errors)
+            if str(pid) not in (cgroup / 'cgroup.procs').read_text().split():
+                (cgroup / 'cgroup.procs').write_text(str(pid))
+            state['cgroup'] = str(cgroup)
+        except OSError as e:
+            errors.append(f"cgroup: {e}")
+
+    server_resource_state[server_id] = state
+    return state
+
+def release_resource_state(server_id: str):
+    """Remove the per-server cgroup once its JVM has exited"""
+    state = server_resource_state.pop(server_id, None)
+    if state and state.get('cgroup'):
+        try:
+            Path(state['cgroup']).rmdir()
+        except OSError:
+            pass
+
+async def resource_policy_loop():
+    """Re-apply resource policies so new JVM threads and player count changes are picked up"""
+    while True:
+        await asyncio.sleep(RESOURCE_POLICY_INTERVAL)
+        for server_id, process in list(running_servers.items()):
+            config = get_server_config(server_id)
+            if not config or 'resources' not in config:
+                continue
+            try:
+                await asyncio.to_thread(apply_resource_policy, server_id, process.pid, get_resource_policy(config))
+            except Exception as e:
+                logger.warning(f"Failed to apply resource policy to {server_id}: {e}")
+
+@api_router.get("/servers/{server_id}/resources")
+async def get_resources(server_id: str):
+    """Get the resource policy and what is currently applied"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    return {
+        "policy": get_resource_policy(config),
+        "applied": server_resource_state.get(server_id),
+        "cgroup_available": get_cgroup_root() is not None,
+        "cpu_count": psutil.cpu_count()
+    }
+
+@api_router.put("/servers/{server_id}/resources")
+async def update_resources(server_id: str, policy: ResourcePolicy):
+    """Update the resource policy, applying it immediately if the server is running"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    cpu_count = psutil.cpu_count() or 1
+    if policy.cpu_affinity and any(cpu < 0 or cpu >= cpu_count for cpu in policy.cpu_affinity):
+        raise HTTPException(status_code=400, detail=f"CPU ids must be between 0 and {cpu_count - 1}")
+    if not (-20 <= policy.nice <= 19 and -20 <= (policy.idle_nice or 0) <= 19):
+        raise HTTPException(status_code=400, detail="Nice values must be between -20 and 19")
+    if policy.ionice_class and policy.ionice_class not in IONICE_CLASSES:
+        raise HTTPException(status_code=400, detail=f"ionice_class must be one of {', '.join(IONICE_CLASSES)}")
+    if not 0 <= policy.ionice_level <= 7:
+        raise HTTPException(status_code=400, detail="ionice_level must be between 0 and 7")
+    for weight in (policy.cpu_weight, policy.idle_cpu_weight, policy.io_weight or 100):
+        if not 1 <= weight <= 10000:
+            raise HTTPException(status_code=400, detail="Weights must be between 1 and 10000")
+
+    config['resources'] = policy.model_dump()
+    save_server_config(server_id, config)
+
+    applied = None
+    if server_id in running_servers:
+        applied = await asyncio.to_thread(apply_resource_policy, server_id, running_servers[server_id].pid, config['resources'])
+
+    return {"message": "Resource policy updated", "policy": config['resources'], "applied": applied}
+
+# ============== Bulk Actions / Autostart ==============
+
+async def wait_until_ready(server_id: str, timeout: float) -> bool:
+    """Wait for a server to log "Done (x s)!". Returns False if it exits or times out first."""
+    event = server_ready_events.get(server_id)
+    if event is None:
+        return server_id in server_ready_at
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return server_id in server_ready_at
+
+async def scheduled_start(server_id: str, entry: dict):
+    """Start a server once a starting slot is free and hold the slot until it is ready"""
+    settings = load_settings()
+    limit = max(1, settings['max_concurrent_starts'])
+
+    async with start_slots:
+        await start_slots.wait_for(lambda: len(servers_starting) < limit)
+        servers_starting[server_id] = time.monotonic()
+
+    try:
+        entry['state'] = 'starting'
+        entry['started_at'] = datetime.now(timezone.utc).isoformat()
+        started = time.monotonic()
+        await start_server(server_id)
+
+        if await wait_until_ready(server_id, settings['start_timeout']):
+            entry['state'] = 'ready'
+            entry['time_to_ready'] = round(time.monotonic() - started, 2)
+            entry['reported_boot_time'] = server_boot_times.get(server_id)
+        else:
+            entry['state'] = 'failed'
+            entry['error'] = "Server exited before becoming ready" if server_id not in running_servers else "Timed out waiting for server to become ready"
+    except HTTPException as e:
+        entry['state'] = 'failed'
+        entry['error'] = e.detail
+    except Exception as e:
+        entry['state'] = 'failed'
+        entry['error'] = str(e)
+    finally:
+        entry['finished_at'] = datetime.now(timezone.utc).isoformat()
+        async with start_slots:
+            servers_starting.pop(server_id, None)
+            start_slots.notify_all()
+
+async def run_bulk_batch(batch: dict):
+    """Execute a bulk start/stop/restart batch"""
+    started = time.monotonic()
+    entries = batch['servers']
+
+    async def stop_one(server_id: str):
+        entry = entries[server_id]
+        if server_id not in running_servers:
+            entry['state'] = 'stopped'
+            return
+        entry['state'] = 'stopping'
+        try:
+            await stop_server(server_id)
+            entry['state'] = 'stopped'
+        except Exception as e:
+            entry['state'] = 'failed'
+            entry['error'] = str(e)
+
+    if batch['action'] in ('stop', 'restart'):
+        await asyncio.gather(*(stop_one(sid) for sid in entries))
+
+    if batch['action'] in ('start', 'restart'):
+        starts = []
+        for server_id, entry in entries.items():
+            if entry['state'] == 'failed':
+                continue
+            if server_id in running_servers:
+                entry['state'] = 'running'
+                continue
+            entry['state'] = 'queued'
+            starts.append(scheduled_start(server_id, entry))
+        await asyncio.gather(*starts)
+
+    batch['status'] = 'completed'
+    batch['total_seconds'] = round(time.monotonic() - started, 2)
+    batch['finished_at'] = datetime.now(timezone.utc).isoformat()
+
+def create_bulk_batch(action: str, server_ids: List[str], source: str = 'api') -> dict:
+    """Register a bulk batch and run it in the background"""
+    batch_id = str(uuid.uuid4())[:8]
+    batch = {
+        "id": batch_id,
+        "action": action,
+        "source": source,
+        "status": "running",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+        "total_seconds": None,
+        "servers": {sid: {"state": "pending", "error": None} for sid in dict.fromkeys(server_ids)}
+    }
+    bulk_batches[batch_id] = batch
+    for old_id in list(bulk_batches)[:-BULK_BATCHES_KEEP]:
+        if bulk_batches[old_id]['status'] == 'completed':
+            del bulk_batches[old_id]
+
+    asyncio.create_task(run_bulk_batch(batch))
+    return batch
+
+@api_router.post("/bulk")
+async def bulk_action(data: BulkAction):
+    """Start, stop or restart several servers; starts are staggered by the scheduler"""
+    if data.action not in ('start', 'stop', 'restart'):
+        raise HTTPException(status_code=400, detail="Invalid action")
+    if not data.server_ids:
+        raise HTTPException(status_code=400, detail="No servers selected")
+
+    missing = [sid for sid in data.server_ids if not get_server_config(sid)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Server not found: {', '.join(missing)}")
+
+    return create_bulk_batch(data.action, data.server_ids)
+
+@api_router.get("/bulk")
+async def list_bulk_batches():
+    """List recent bulk batches"""
+    return {"batches": list(reversed(bulk_batches.values())), "starting": list(servers_starting)}
+
+@api_router.get("/bulk/{batch_id}")
+async def get_bulk_batch(batch_id: str):
+    """Get progress of a bulk batch"""
+    if batch_id not in bulk_batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return bulk_batches[batch_id]
+
+@api_router.get("/settings/autostart")
+async def get_autostart():
+    """Get the boot-time autostart list and scheduler limits"""
+    settings = load_settings()
+    return {
+        "server_ids": settings['autostart'],
+        "max_concurrent_starts": settings['max_concurrent_starts'],
+        "start_timeout": settings['start_timeout']
+    }
+
+@api_router.put("/settings/autostart")
+async def update_autostart(data: AutostartSettings):
+    """Update the autostart list (in boot order) and scheduler limits"""
+    missing = [sid for sid in data.server_ids if not get_server_config(sid)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Server not found: {', '.join(missing)}")
+    if data.max_concurrent_starts < 1:
+        raise HTTPException(status_code=400, detail="max_concurrent_starts must be at least 1")
+
+    settings = load_settings()
+    settings['autostart'] = list(dict.fromkeys(data.server_ids))
+    settings['max_concurrent_starts'] = data.max_concurrent_starts
+    settings['start_timeout'] = data.start_timeout
+    save_settings(settings)
+
+    return {"message": "Autostart updated", "server_ids": settings['autostart']}
+
+# ============== Hibernation ==============
+
+def get_hibernation_settings(config: dict) -> dict:
+    return HibernationSettings(**config.get('hibernation', {})).model_dump()
+
+async def handle_sleep_connection(server_id: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answer Server List Ping for a sleeping server and wake it on a login attempt"""
+    try:
+        length = await asyncio.wait_for(read_varint(reader), 10)
+        if not 0 < length <= 1024:
+            return
+        data = await asyncio.wait_for(reader.readexactly(length), 10)
+
+        packet_id, offset = unpack_varint(data)
+        if packet_id != 0x00:
+            return
+        protocol, offset = unpack_varint(data, offset)
+        address_length, offset = unpack_varint(data, offset)
+        offset += address_length + 2  # address + port
+        next_state, offset = unpack_varint(data, offset)
+
+        config = get_server_config(server_id) or {}
+        settings = get_hibernation_settings(config)
+
+        if next_state == 1:
+            # Status request, then an optional ping to echo
+            await asyncio.wait_for(reader.readexactly(await read_varint(reader)), 10)
+            status = {
+                "version": {"name": config.get('version', ''), "protocol": protocol},
+                "players": {"max": config.get('max_players', 20), "online": 0, "sample": []},
+                "description": {"text": settings['motd']}
+            }
+            writer.write(pack_packet(0x00, pack_mc_string(json.dumps(status))))
+            await writer.drain()
+
+            ping = await asyncio.wait_for(reader.readexactly(await read_varint(reader)), 10)
+            packet_id, offset = unpack_varint(ping)
+            if packet_id == 0x01:
+                writer.write(pack_packet(0x01, ping[offset:]))
+                await writer.drain()
+        elif next_state in (2, 3):
+            # Login: tell the player to come back, then wake the server
+            reason = json.dumps({"text": "Server is waking up, reconnect in a moment"})
+            writer.write(pack_packet(0x00, pack_mc_string(reason)))
+            await writer.drain()
+            logger.info(f"Login attempt on sleeping server {server_id}, waking up")
+            asyncio.create_task(wake_server(server_id))
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+async def open_sleep_listener(server_id: str):
+    """Bind the lightweight wake listener on the server's port"""
+    if server_id in sleep_listeners:
+        return
+
+    _, port = get_server_address(server_id)
+    host = get_server_properties(server_id).get('server-ip') or None
+    sleep_listeners[server_id] = await asyncio.start_server(
+        lambda r, w: handle_sleep_connection(server_id, r, w), host, port, reuse_address=True
+    )
+
+async def close_sleep_listener(server_id: str):
+    """Release the port held by the wake listener"""
+    listener = sleep_listeners.pop(server_id, None)
+    if listener:
+        listener.close()
+        await listener.wait_closed()
+
+async def hibernate_server(server_id: str):
+    """Gracefully stop a server and keep its port answering with the wake listener"""
+    if server_id in running_servers:
+        await stop_server(server_id)
+
+    config = get_server_config(server_id)
+    if not config:
+        return
+    config['hibernating'] = True
+    save_server_config(server_id, config)
+
+    await open_sleep_listener(server_id)
+    logger.info(f"Server {server_id} is hibernating")
+
+async def wake_server(server_id: str):
+    """Start a hibernating server; the listener is closed by start_server before launch"""
+    if server_id not in sleep_listeners:
+        return
+    try:
+        await start_server(server_id)
+    except HTTPException as e:
+        logger.error(f"Failed to wake server {server_id}: {e.detail}")
+        try:
+            await open_sleep_listener(server_id)
+        except OSError:
+            pass
+
+async def hibernation_loop():
+    """Hibernate servers that have had no players for their configured idle time"""
+    while True:
+        await asyncio.sleep(HIBERNATION_CHECK_INTERVAL)
+        for server_id in list(running_servers):
+            config = get_server_config(server_id)
+            if not config:
+                continue
+            settings = get_hibernation_settings(config)
+            status = server_status.get(server_id)
+            if not settings['enabled'] or server_id not in server_ready_at or status is None:
+                server_idle_since.pop(server_id, None)
+                continue
+
+            if status['players_online'] > 0:
+                server_idle_since.pop(server_id, None)
+                continue
+
+            idle_since = server_idle_since.setdefault(server_id, time.monotonic())
+            if time.monotonic() - idle_since >= settings['idle_minutes'] * 60:
+                try:
+                    await hibernate_server(server_id)
+                except Exception as e:
+                    logger.error(f"Failed to hibernate server {server_id}: {e}")
+
+@api_router.get("/servers/{server_id}/hibernation")
+async def get_hibernation(server_id: str):
+    """Get the idle hibernation policy"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    idle_since = server_idle_since.get(server_id)
+    return {
+        "settings": get_hibernation_settings(config),
+        "sleeping": server_id in sleep_listeners,
+        "idle_seconds": round(time.monotonic() - idle_since) if idle_since else 0
+    }
+
+@api_router.put("/servers/{server_id}/hibernation")
+async def update_hibernation(server_id: str, settings: HibernationSettings):
+    """Update the idle hibernation policy"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if settings.idle_minutes < 1:
+        raise HTTPException(status_code=400, detail="idle_minutes must be at least 1")
+
+    config['hibernation'] = settings.model_dump()
+    save_server_config(server_id, config)
+    return {"message": "Hibernation settings updated", "settings": config['hibernation']}
+
+@api_router.post("/servers/{server_id}/hibernate")
+async def hibernate_now(server_id: str):
+    """Put a server to sleep now"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if server_id in sleep_listeners:
+        raise HTTPException(status_code=400, detail="Server already sleeping")
+
+    try:
+        await hibernate_server(server_id)
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Cannot bind wake listener: {e}")
+    return {"message": "Server hibernating"}
+
+@api_router.post("/servers/{server_id}/wake")
+async def wake_now(server_id: str):
+    """Wake a sleeping server"""
+    if server_id not in sleep_listeners:
+        raise HTTPException(status_code=400, detail="Server not sleeping")
+
+    return await start_server(server_id)
+
+# ============== Offline Project Index ==============
+
+# Every project document Modrinth returns (search hits, project details, version lists)
+# is kept in a local SQLite FTS5 index so search works offline and can answer instantly
+# while the live query runs. Rows are stored in search-hit shape.
+
+PROJECT_INDEX_MAX_ROWS = int(os.environ.get('MINEHOST_PROJECT_INDEX_ROWS', 50000))
+project_index_lock = threading.RLock()  # reentrant: facet updates rewrite rows via index_projects_sync
+_project_index: Optional[sqlite3.Connection] = None
+_project_index_failed = False
+
+def get_project_index() -> Optional[sqlite3.Connection]:
+    """Open (and create) the index; None when SQLite lacks FTS5 or the file is unusable"""
+    global _project_index, _project_index_failed
+    with project_index_lock:
+        if _project_index is None and not _project_index_failed:
+            _project_index = open_project_index()
+            _project_index_failed = _project_index is None
+    return _project_index
+
+def open_project_index() -> Optional[sqlite3.Connection]:
+    """Connect and create the schema (call with project_index_lock held)"""
+    db = None
+    try:
+        db = sqlite3.connect(PROJECT_INDEX_FILE, check_same_thread=False)
+        db.executescript('''
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id TEXT PRIMARY KEY,
+                project_type TEXT,
+                categories TEXT,
+                versions TEXT,
+                downloads INTEGER,
+                doc TEXT,
+                seen_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS projects_seen ON projects (seen_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS project_text USING fts5(project_id UNINDEXED, title, description, tokens);
+        ''')
+        return db
+    except sqlite3.Error as e:
+        logger.warning(f"Offline project index disabled: {e}")
+        if db is not None:
+            db.close()
+        return None
+
+def project_hit_from_details(project: dict) -> dict:
+    """Search-hit shaped document from a /project response"""
+    return {
+        "project_id": project['id'],
+        "project_type": project.get('project_type'),
+        "slug": project.get('slug'),
+        "title": project.get('title'),
+        "description": project.get('description'),
+        "categories": sorted(set(project.get('categories', [])) | set(project.get('loaders', []))),
+        "versions": project.get('game_versions', []),
+        "downloads": project.get('downloads', 0),
+        "follows": project.get('followers', 0),
+        "icon_url": project.get('icon_url'),
+        "date_modified": project.get('updated'),
+    }
+
+def index_projects_sync(hits: List[dict]):
+    """Insert or refresh project documents, then trim the least recently seen beyond the size bound"""
+    db = get_project_index()
+    if db is None or not hits:
+        return
+    now = time.time()
+    with project_index_lock, db:
+        for hit in hits:
+            if not hit.get('project_id'):
+                continue
+            doc = json.dumps(hit, sort_keys=True)
+            row = db.execute('SELECT doc FROM projects WHERE project_id = ?', (hit['project_id'],)).fetchone()
+            if row and row[0] == doc:
+                db.execute('UPDATE projects SET seen_at = ? WHERE project_id = ?', (now, hit['project_id']))
+                continue
+            db.execute('INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                hit['project_id'], hit.get('project_type'), f" {' '.join(hit.get('categories', []))} ",
+                f" {' '.join(hit.get('versions', []))} ", hit.get('downloads', 0), doc, now
+            ))
+            db.execute('DELETE FROM project_text WHERE project_id = ?', (hit['project_id'],))
+            db.execute('INSERT INTO project_text VALUES (?, ?, ?, ?)', (
+                hit['project_id'], hit.get('title') or '', hit.get('description') or '',
+                ' '.join([hit.get('slug') or '', hit.get('author') or ''] + hit.get('categories', []))
+            ))
+        excess = db.execute('SELECT COUNT(*) FROM projects').fetchone()[0] - PROJECT_INDEX_MAX_ROWS
+        if excess > 0:
+            stale = [r[0] for r in db.execute('SELECT project_id FROM projects ORDER BY seen_at LIMIT ?', (excess,))]
+            db.executemany('DELETE FROM projects WHERE project_id = ?', [(p,) for p in stale])
+            db.executemany('DELETE FROM project_text WHERE project_id = ?', [(p,) for p in stale])
+
+def index_version_facets_sync(project_id: str, versions: List[dict]):
+    """Widen a known project's loader and game-version facets from its version list"""
+    db = get_project_index()
+    if db is None or not versions:
+        return
+    # One lock across the read and the write so a concurrent refresh of the row isn't lost
+    with project_index_lock:
+        row = db.execute('SELECT doc FROM projects WHERE project_id = ?', (project_id,)).fetchone()
+        if not row:
+            return
+        hit = json.loads(row[0])
+        hit['categories'] = sorted(set(hit.get('categories', [])).union(*(v.get('loaders', []) for v in versions)))
+        hit['versions'] = sorted(set(hit.get('versions', [])).union(*(v.get('game_versions', []) for v in versions)))
+        index_projects_sync([hit])
+
+def index_modrinth_response(path: str, data: Any):
+    """Feed a successful Modrinth response into the offline index (runs in a thread)"""
+    try:
+        if path == '/search':
+            index_projects_sync(data.get('hits', []))
+        elif path == '/projects':
+            index_projects_sync([project_hit_from_details(p) for p in data])
+        elif path.startswith('/project/') and path.endswith('/version'):
+            index_version_facets_sync(path.split('/')[2], data)
+        elif path.startswith('/project/'):
+            index_projects_sync([project_hit_from_details(data)])
+    except (sqlite3.Error, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"Could not index Modrinth response for {path}: {e}")
+
+def search_project_index_sync(query: str, project_types: List[str], categories: List[str],
+                              game_version: str = '', limit: int = 20) -> List[dict]:
+    """Local search: every query word must prefix-match; any of categories and the game version must match"""
+    db = get_project_index()
+    if db is None:
+        return []
+    words = re.findall(r'\w+', query.lower())
+    sql = 'SELECT p.doc FROM projects p'
+    args: List[Any] = []
+    where = [f"p.project_type IN ({','.join('?' * len(project_types))})"]
+    args_where: List[Any] = list(project_types)
+    if words:
+        sql += ' JOIN project_text t ON t.project_id = p.project_id AND project_text MATCH ?'
+        args.append(' '.join(f'"{word}"*' for word in words))
+    if categories:
+        where.append('(' + ' OR '.join('p.categories LIKE ?' for _ in categories) + ')')
+        args_where += [f'% {category} %' for category in categories]
+    if game_version:
+        where.append('p.versions LIKE ?')
+        args_where.append(f'% {game_version} %')
+    sql += ' WHERE ' + ' AND '.join(where)
+    sql += (' ORDER BY bm25(project_text), p.downloads DESC' if words else ' ORDER BY p.downloads DESC') + ' LIMIT ?'
+    with project_index_lock:
+        rows = db.execute(sql, args + args_where + [limit]).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+# ============== Mods/Plugins API (Modrinth) ==============
+
+MODRINTH_API = 'https://api.modrinth.com/v2'
+MODRINTH_CACHE_MAX_BYTES = int(os.environ.get('MINEHOST_MODRINTH_CACHE_BYTES', 32 * 1024 * 1024))
+MODRINTH_SEARCH_TTL = 300
+MODRINTH_PROJECT_TTL = 900
+MODRINTH_NEGATIVE_TTL = 30  # 404s, so typos don't hit upstream on every keystroke
+MODRINTH_STALE_TTL = 3600  # expired entries are still served while a refresh runs
+
+class ResponseCache:
+    """
+    Size-bounded LRU + TTL cache for upstream responses. Concurrent misses for the same key
+    share one load (single-flight), and expired entries inside the stale window are returned
+    immediately while a background load refreshes them.
+    """
+
+    def __init__(self, max_bytes: int, stale_ttl: float):
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.entries: collections.OrderedDict = collections.OrderedDict()  # key -> (fresh_until, stale_until, size, value)
+        self.inflight: Dict[tuple, asyncio.Task] = {}
+        self.bytes = 0
+
+    async def get(self, key: tuple, loader):
+        """Cached value for key; loader() is awaited on a miss and returns (value, size, ttl)"""
+        entry = self.entries.get(key)
+        if entry:
+            now = time.monotonic()
+            if now < entry[1]:
+                self.entries.move_to_end(key)
+                if now >= entry[0]:
+                    self.load(key, loader)
+                return entry[3]
+        # Shielded so one client disconnecting doesn't cancel the load other callers are waiting on
+        return await asyncio.shield(self.load(key, loader))
+
+    def load(self, key: tuple, loader) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.fill(key, loader))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.finished(key, t))
+        return task
+
+    def finished(self, key: tuple, task: asyncio.Task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled() and task.exception():
+            # Background refreshes have no waiter; the stale entry stays until it ages out
+            logger.debug(f"Cache load for {key} failed: {task.exception()}")
+
+    async def fill(self, key: tuple, loader):
+        value, size, ttl = await loader()
+        self.put(key, value, size, ttl)
+        return value
+
+    def put(self, key: tuple, value, size: int, ttl: float):
+        old = self.entries.pop(key, None)
+        if old:
+            self.bytes -= old[2]
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        self.entries[key] = (now + ttl, now + ttl + self.stale_ttl, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted[2]
+
+modrinth_cache = ResponseCache(MODRINTH_CACHE_MAX_BYTES, MODRINTH_STALE_TTL)
+
+async def fetch_modrinth(method: str, path: str, params: dict, body: Any, ttl: float) -> tuple:
+    """(json, body size, ttl) for a Modrinth request; 404s load as None with a short ttl, other errors raise"""
+    async with upstream_session() as session:
+        async with session.request(method, f'{MODRINTH_API}{path}', params=params, json=body) as resp:
+            if resp.status == 404:
+                return None, 0, MODRINTH_NEGATIVE_TTL
+            resp.raise_for_status()
+            data = await resp.read()
+    parsed = json.loads(data)
+    if method == 'GET':
+        # Indexed in the background; the caller doesn't wait for SQLite
+        asyncio.get_running_loop().run_in_executor(None, index_modrinth_response, path, parsed)
+    return parsed, len(data), ttl
+
+async def cached_modrinth_request(method: str, path: str, params: dict, body: Any, ttl: float):
+    key = (method, path, tuple(sorted(params.items())), json.dumps(body, sort_keys=True))
+    try:
+        return await modrinth_cache.get(key, lambda: fetch_modrinth(method, path, params, body, ttl))
+    except aiohttp.ClientResponseError as e:
+        logger.warning(f"Modrinth request {path} failed: {e.status} {e.message}")
+        if e.status == 429:
+            raise HTTPException(status_code=503, detail="Modrinth rate limit reached, try again shortly")
+        raise HTTPException(status_code=502, detail=f"Modrinth returned an error ({e.status})")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning(f"Modrinth request {path} failed: {e}")
+        raise HTTPException(status_code=502, detail="Modrinth is unreachable")
+
+async def modrinth_get(path: str, params: Optional[dict] = None, ttl: float = MODRINTH_SEARCH_TTL):
+    """Cached Modrinth GET returning parsed JSON (None for 404s); raises 502/503 when Modrinth fails"""
+    return await cached_modrinth_request('GET', path, params or {}, None, ttl)
+
+async def modrinth_post(path: str, body: Any, ttl: float = MODRINTH_SEARCH_TTL):
+    """Cached Modrinth POST (for lookup endpoints such as version_files), same contract as modrinth_get"""
+    return await cached_modrinth_request('POST', path, {}, body, ttl)
+
+def normalize_search_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+def search_facets(facets: List[List[str]]) -> str:
+    """Facets JSON in a canonical order so equivalent searches share a cache entry"""
+    return json.dumps(sorted(sorted(group) for group in facets))
+
+async def search_with_index(params: dict, source: str, project_types: List[str], categories: List[str],
+                            game_version: str, limit: int) -> tuple:
+    """(hits, source): live Modrinth results, falling back to the offline index when Modrinth fails"""
+    def local():
+        return asyncio.to_thread(search_project_index_sync, params['query'], project_types, categories, game_version, limit)
+
+    if source == 'local':
+        return await local(), 'local'
+    try:
+        data = await modrinth_get('/search', params)
+    except HTTPException:
+        hits = await local()
+        if not hits:
+            raise
+        return hits, 'offline'
+    return (data.get('hits', []) if data else []), 'live'
+
+# Installed jars are identified by content hash, resolved against Modrinth in two bulk requests
+jar_hash_cache: Dict[str, tuple] = {}
+
+def file_sha1_batch(paths: List[str]) -> List[Optional[str]]:
+    results = []
+    for path in paths:
+        digest = hashlib.sha1()
+        try:
+            with open(path, 'rb') as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+            results.append(digest.hexdigest())
+        except OSError:
+            results.append(None)
+    return results
+
+IDENTIFY_WAIT = 2.0  # seconds a mods/plugins listing waits for Modrinth details
+
+async def identify_jars(paths: List[Path]) -> Dict[str, dict]:
+    """
+    Modrinth project and version for each jar, keyed by path. Hashes are cached by
+    (mtime, size); all jars are looked up with one version_files and one projects request.
+    Lookups get IDENTIFY_WAIT seconds; slower ones keep filling the cache in the background
+    and show up on a later listing.
+    """
+    hashes = await map_cached_files(paths, jar_hash_cache, file_sha1_batch, 16)
+    known = sorted({digest for digest in hashes.values() if digest})
+    versions = {}
+    projects = {}
+    deadline = time.monotonic() + IDENTIFY_WAIT
+    try:
+        if known:
+            versions = await asyncio.wait_for(
+                modrinth_post('/version_files', {'hashes': known, 'algorithm': 'sha1'}, MODRINTH_PROJECT_TTL),
+                deadline - time.monotonic()) or {}
+        project_ids = sorted({version['project_id'] for version in versions.values()})
+        if project_ids:
+            found = await asyncio.wait_for(
+                modrinth_get('/projects', {'ids': json.dumps(project_ids)}, MODRINTH_PROJECT_TTL),
+                max(deadline - time.monotonic(), 0)) or []
+            projects = {project['id']: project for project in found}
+    except (HTTPException, asyncio.TimeoutError):
+        pass  # listings still work offline, just without Modrinth details
+
+    identified = {}
+    for key, digest in hashes.items():
+        version = versions.get(digest) or {}
+        project = projects.get(version.get('project_id'), {})
+        identified[key] = {
+            "sha1": digest,
+            "project_id": version.get('project_id'),
+            "version_id": version.get('id'),
+            "version_number": version.get('version_number'),
+            "title": project.get('title'),
+            "slug": project.get('slug'),
+            "icon_url": project.get('icon_url'),
+        }
+    return identified
+
+@api_router.get("/mods/search")
+async def search_mods(query: str, loader: str = "fabric", version: str = "", limit: int = 20, source: str = "live"):
+    """Search mods on Modrinth (source=local answers from the offline index instead)"""
+    facets = [
+        [f'project_type:mod'],
+        [f'categories:{loader}']
+    ]
+    
+    if version:
+        facets.append([f'versions:{version}'])
+    
+    params = {
+        'query': normalize_search_query(query),
+        'limit': limit,
+        'facets': search_facets(facets)
+    }
+    
+    hits, source = await search_with_index(params, source, ['mod'], [loader], version, limit)
+    return {"mods": hits, "source": source}
+
+@api_router.get("/mods/{mod_id}")
+async def get_mod_details(mod_id: str):
+    """Get mod details from Modrinth"""
+    data = await modrinth_get(f'/project/{mod_id}', ttl=MODRINTH_PROJECT_TTL)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Mod not found")
+    return data
+
+@api_router.get("/mods/{mod_id}/versions")
+async def get_mod_versions(mod_id: str, loader: str = "", game_version: str = ""):
+    """Get mod versions from Modrinth"""
+    params = {}
+    if loader:
+        params['loaders'] = json.dumps([loader])
+    if game_version:
+        params['game_versions'] = json.dumps([game_version])
+    
+    versions = await modrinth_get(f'/project/{mod_id}/version', params)
+    return {"versions": versions or []}
+
+@api_router.post("/servers/{server_id}/mods")
+async def install_mod(server_id: str, mod_id: str, version_id: str):
+    """Install a mod to the server with automatic dependency installation"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    server_path = SERVERS_DIR / server_id
+    mods_path = server_path / 'mods'
+    mods_path.mkdir(exist_ok=True)
+    
+    installed_mods = []
+    
+    async def download_and_install_mod(mid: str, vid: str, is_dependency: bool = False) -> Optional[str]:
+        """Download and install a single mod"""
+        async with upstream_session() as session:
+            async with session.get(f'https://api.modrinth.com/v2/version/{vid}') as resp:
+                if resp.status != 200:
+                    return None
+                version_data = await resp.json()
+            
+            # Download primary file
+            files = version_data.get('files', [])
+            primary_file = next((f for f in files if f.get('primary')), files[0] if files else None)
+            
+            if not primary_file:
+                return None
+            
             download_url = primary_file['url']
             filename = primary_file['filename']
             file_path = mods_path / filename
@@ -1018,8 +2747,7 @@ async def install_mod(server_id: str, mod_id: str, version_id: str):
             
             async with session.get(download_url) as resp:
                 if resp.status == 200:
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        await f.write(await resp.read())
+                    await replace_file(file_path, await resp.read())
                     return filename
         
         return None
@@ -1031,7 +2759,7 @@ async def install_mod(server_id: str, mod_id: str, version_id: str):
         
         # Extract dependencies from the installed mod
         jar_path = mods_path / filename
-        dependencies = extract_mod_dependencies(jar_path)
+        dependencies = extract_mod_dependencies(jar_path, config.get('server_type'))
         
         # Try to install dependencies
         if dependencies:
@@ -1047,7 +2775,7 @@ async def install_mod(server_id: str, mod_id: str, version_id: str):
                                 ['categories:' + config.get('server_type', 'fabric')]
                             ])
                         }
-                        async with aiohttp.ClientSession() as session:
+                        async with upstream_session() as session:
                             async with session.get('https://api.modrinth.com/v2/search', params=params) as resp:
                                 if resp.status == 200:
                                     data = await resp.json()
@@ -1084,271 +2812,2938 @@ async def list_installed_mods(server_id: str):
     
     mods = []
     if mods_path.exists():
-        for mod_file in mods_path.iterdir():
-            if mod_file.suffix == '.jar':
-                metadata = get_mod_metadata(mod_file)
-                mods.append(metadata)
+        jars = [mod_file for mod_file in mods_path.iterdir() if mod_file.suffix == '.jar']
+        identified = await identify_jars(jars)
+        for mod_file in jars:
+            metadata = get_mod_metadata(mod_file, config.get('server_type'))
+            metadata['modrinth'] = identified.get(str(mod_file))
+            mods.append(metadata)
     
     return {"mods": mods}
 
-@api_router.delete("/servers/{server_id}/mods/{filename}")
-async def remove_mod(server_id: str, filename: str):
-    """Remove an installed mod"""
-    config = get_server_config(server_id)
-    if not config:
-        raise HTTPException(status_code=404, detail="Server not found")
-    
-    mod_path = SERVERS_DIR / server_id / 'mods' / filename
-    
-    if mod_path.exists():
-        mod_path.unlink()
-        return {"message": "Mod removed"}
-    
-    raise HTTPException(status_code=404, detail="Mod not found")
+@api_router.delete("/servers/{server_id}/mods/{filename}")
+async def remove_mod(server_id: str, filename: str):
+    """Remove an installed mod"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    mod_path = SERVERS_DIR / server_id / 'mods' / filename
+    
+    if mod_path.exists():
+        mod_path.unlink()
+        return {"message": "Mod removed"}
+    
+    raise HTTPException(status_code=404, detail="Mod not found")
+
+# ============== Plugins API (For Paper/Spigot) ==============
+
+@api_router.get("/plugins/search")
+async def search_plugins(query: str, limit: int = 20, source: str = "live"):
+    """Search plugins on Modrinth (plugin type; source=local answers from the offline index instead)"""
+    facets = [
+        ['project_type:plugin'],
+        ['categories:paper', 'categories:spigot', 'categories:bukkit']
+    ]
+    
+    params = {
+        'query': normalize_search_query(query),
+        'limit': limit,
+        'facets': search_facets(facets)
+    }
+    
+    hits, source = await search_with_index(params, source, ['mod', 'plugin'], ['paper', 'spigot', 'bukkit'], '', limit)
+    return {"plugins": hits, "source": source}
+
+@api_router.post("/servers/{server_id}/plugins")
+async def install_plugin(server_id: str, plugin_id: str, version_id: str):
+    """Install a plugin to the server"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    if config['server_type'] not in ['paper', 'spigot', 'bukkit']:
+        raise HTTPException(status_code=400, detail="Plugins only supported on Paper/Spigot servers")
+    
+    server_path = SERVERS_DIR / server_id
+    plugins_path = server_path / 'plugins'
+    plugins_path.mkdir(exist_ok=True)
+    
+    # Get version info
+    async with upstream_session() as session:
+        async with session.get(f'https://api.modrinth.com/v2/version/{version_id}') as resp:
+            if resp.status != 200:
+                raise HTTPException(status_code=404, detail="Version not found")
+            version_data = await resp.json()
+        
+        files = version_data.get('files', [])
+        primary_file = next((f for f in files if f.get('primary')), files[0] if files else None)
+        
+        if not primary_file:
+            raise HTTPException(status_code=404, detail="No downloadable file found")
+        
+        download_url = primary_file['url']
+        filename = primary_file['filename']
+        
+        async with session.get(download_url) as resp:
+            if resp.status == 200:
+                await replace_file(plugins_path / filename, await resp.read())
+    
+    return {"message": "Plugin installed", "filename": filename}
+
+@api_router.get("/servers/{server_id}/plugins")
+async def list_installed_plugins(server_id: str):
+    """List installed plugins"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    server_path = SERVERS_DIR / server_id
+    plugins_path = server_path / 'plugins'
+    
+    plugins = []
+    if plugins_path.exists():
+        jars = [plugin_file for plugin_file in plugins_path.iterdir() if plugin_file.suffix == '.jar']
+        identified = await identify_jars(jars)
+        for plugin_file in jars:
+            plugins.append({
+                "filename": plugin_file.name,
+                "size": plugin_file.stat().st_size,
+                "modrinth": identified.get(str(plugin_file))
+            })
+    
+    return {"plugins": plugins}
+
+# ============== Mod/Plugin Updates ==============
+
+JAR_FOLDERS = ('mods', 'plugins')
+PLUGIN_LOADERS = ['paper', 'spigot', 'bukkit']
+UPDATE_DOWNLOADS = 6  # concurrent jar downloads per update job
+
+def get_jar_folder(server_id: str, folder: str) -> Path:
+    if not get_server_config(server_id):
+        raise HTTPException(status_code=404, detail="Server not found")
+    if folder not in JAR_FOLDERS:
+        raise HTTPException(status_code=404, detail="Unknown folder")
+    return SERVERS_DIR / server_id / folder
+
+def previous_jar_folder(path: Path) -> Path:
+    return path.with_name(f'.{path.name}-previous')
+
+async def find_jar_updates(server_id: str, folder: str) -> List[dict]:
+    """Newer Modrinth versions for the jars in a folder, from one bulk update lookup"""
+    config = get_server_config(server_id)
+    path = get_jar_folder(server_id, folder)
+    jars = sorted(path.glob('*.jar')) if path.is_dir() else []
+    hashes = await map_cached_files(jars, jar_hash_cache, file_sha1_batch, 16)
+    known = sorted({digest for digest in hashes.values() if digest})
+    if not known:
+        return []
+    loaders = PLUGIN_LOADERS if folder == 'plugins' else [config.get('server_type', 'fabric')]
+    latest = await modrinth_post('/version_files/update', {
+        'hashes': known, 'algorithm': 'sha1', 'loaders': loaders, 'game_versions': [config.get('version', '')]
+    }) or {}
+
+    updates = []
+    for jar in jars:
+        digest = hashes.get(str(jar))
+        version = latest.get(digest)
+        if not version:
+            continue
+        files = version.get('files', [])
+        primary = next((f for f in files if f.get('primary')), files[0] if files else None)
+        if not primary or primary.get('hashes', {}).get('sha1') == digest:
+            continue
+        updates.append({
+            "filename": jar.name,
+            "project_id": version.get('project_id'),
+            "version_id": version.get('id'),
+            "version_number": version.get('version_number'),
+            "new_filename": primary['filename'],
+            "url": primary['url'],
+            "size": primary.get('size'),
+            "sha512": primary.get('hashes', {}).get('sha512'),
+        })
+    return updates
+
+async def download_verified(session: UpstreamSession, url: str, dest: Path, sha512: Optional[str]):
+    """Stream a download to dest, failing when its SHA-512 doesn't match"""
+    digest = hashlib.sha512()
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        async with aiofiles.open(dest, 'wb') as f:
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+                await f.write(chunk)
+    if sha512 and digest.hexdigest() != sha512:
+        dest.unlink(missing_ok=True)
+        raise ValueError(f"Hash mismatch for {dest.name}")
+
+def swapped_jar_folder(path: Path) -> Path:
+    return path.with_name(f'.{path.name}-swap')
+
+def swap_jar_folder(live: Path, incoming: Path, previous: Path):
+    """
+    Make incoming (jars only) the live folder and keep the replaced jars in previous.
+    Everything else in the folder (plugin config folders, disabled jars) moves across.
+    Jars are never modified in place, so hardlinked copies in clones are unaffected.
+    The folder is briefly parked between two renames; recover_jar_folder repairs a
+    crash in that window on the next start.
+    """
+    for entry in list(live.iterdir()):
+        if entry.suffix != '.jar' and not (incoming / entry.name).exists():
+            os.rename(entry, incoming / entry.name)
+    parked = swapped_jar_folder(live)
+    os.rename(live, parked)
+    os.rename(incoming, live)
+    if previous.exists():
+        shutil.rmtree(previous)
+    os.rename(parked, previous)
+
+def recover_jar_folder(live: Path):
+    """Finish or undo a swap_jar_folder or update that was interrupted by a crash"""
+    parked = swapped_jar_folder(live)
+    staging = live.with_name(f'.{live.name}-staging')
+    if parked.is_dir():
+        if not live.exists():
+            # Crashed between the two renames: put the old folder back
+            os.rename(parked, live)
+            logger.warning(f"Restored {live} after an interrupted update")
+        else:
+            # The new folder is live; only parking the old one as previous was left
+            previous = previous_jar_folder(live)
+            if previous.exists():
+                shutil.rmtree(previous)
+            os.rename(parked, previous)
+    if staging.is_dir() and live.is_dir():
+        # Non-jar entries may already have been moved into staging
+        for entry in list(staging.iterdir()):
+            if entry.suffix != '.jar' and not (live / entry.name).exists():
+                os.rename(entry, live / entry.name)
+        shutil.rmtree(staging)
+
+async def apply_jar_updates(server_id: str, folder: str, selected: Optional[List[str]], job: dict) -> dict:
+    path = get_jar_folder(server_id, folder)
+    updates = await find_jar_updates(server_id, folder)
+    if selected is not None:
+        updates = [u for u in updates if u['filename'] in selected]
+    if not updates:
+        return {"updated": []}
+
+    staging = path.with_name(f'.{folder}-staging')
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir()
+    try:
+        replaced = {u['filename'] for u in updates}
+        for jar in path.glob('*.jar'):
+            if jar.name not in replaced:
+                clone_file(str(jar), str(staging / jar.name), 'hardlink')
+
+        semaphore = asyncio.Semaphore(UPDATE_DOWNLOADS)
+        done = 0
+        async with upstream_session(UPSTREAM_BACKGROUND) as session:
+            async def fetch(update: dict):
+                nonlocal done
+                async with semaphore:
+                    await download_verified(session, update['url'], staging / update['new_filename'], update['sha512'])
+                done += 1
+                update_job(job, done / len(updates) * 0.9, f"Downloaded {done}/{len(updates)}")
+            # Let every download settle before the staging folder can be removed
+            errors = [e for e in await asyncio.gather(*(fetch(u) for u in updates), return_exceptions=True) if e]
+            if errors:
+                raise errors[0]
+
+        if server_id in running_servers:
+            raise HTTPException(status_code=400, detail="Server was started during the update")
+        await asyncio.to_thread(swap_jar_folder, path, staging, previous_jar_folder(path))
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+    return {"updated": [{k: u[k] for k in ('filename', 'new_filename', 'version_number')} for u in updates]}
+
+@api_router.get("/servers/{server_id}/{folder}/check-updates")
+async def check_jar_updates(server_id: str, folder: str):
+    """List available updates for installed mods or plugins"""
+    get_jar_folder(server_id, folder)
+    return {"updates": await find_jar_updates(server_id, folder)}
+
+@api_router.post("/servers/{server_id}/{folder}/apply-updates")
+async def apply_updates(server_id: str, folder: str, options: JarUpdateApply):
+    """Download updates and swap them in as a job, keeping the previous jars for rollback"""
+    get_jar_folder(server_id, folder)
+    if server_id in running_servers:
+        raise HTTPException(status_code=400, detail="Stop the server before updating")
+
+    async def work(job):
+        async with get_world_lock(server_id):
+            return await apply_jar_updates(server_id, folder, options.filenames, job)
+
+    return create_job(f'{folder}-update', server_id, work)
+
+@api_router.post("/servers/{server_id}/{folder}/rollback")
+async def rollback_updates(server_id: str, folder: str):
+    """Swap back the jars replaced by the last update (running it again redoes the update)"""
+    path = get_jar_folder(server_id, folder)
+    previous = previous_jar_folder(path)
+    if not previous.is_dir():
+        raise HTTPException(status_code=404, detail="No previous version to roll back to")
+    if server_id in running_servers:
+        raise HTTPException(status_code=400, detail="Stop the server before rolling back")
+
+    async with get_world_lock(server_id):
+        await asyncio.to_thread(swap_jar_folder, path, previous, previous)
+    return {"message": "Rolled back"}
+
+# ============== Mod Dependency Graph ==============
+
+# Ids the loader itself provides; only minecraft has a version we can check
+PLATFORM_MOD_IDS = {'minecraft', 'java', 'fabricloader', 'fabric-loader', 'quilt_loader', 'forge', 'neoforge', 'javafml', 'lowcodefml'}
+MOD_MANIFEST_MAX_DEPTH = 3  # jar-in-jar nesting followed for Fabric
+dependency_graph_cache: collections.OrderedDict = collections.OrderedDict()
+DEPENDENCY_GRAPH_CACHE_SIZE = 32
+
+def fabric_constraints(value) -> Dict[str, List[str]]:
+    """depends/breaks/conflicts: id -> alternative version predicates (any may match)"""
+    if not isinstance(value, dict):
+        return {}
+    return {mod_id: ([ranges] if isinstance(ranges, str) else [str(r) for r in ranges]) for mod_id, ranges in value.items()}
+
+def read_jar_implementation_version(zf: zipfile.ZipFile) -> Optional[str]:
+    try:
+        manifest = zf.read('META-INF/MANIFEST.MF').decode('utf-8', 'replace')
+    except KeyError:
+        return None
+    match = re.search(r'^Implementation-Version:\s*(\S+)', manifest, re.MULTILINE)
+    return match.group(1) if match else None
+
+def read_forge_manifests(zf: zipfile.ZipFile, name: str) -> List[dict]:
+    data = tomllib.loads(zf.read(name).decode('utf-8', 'replace'))
+    jar_version = read_jar_implementation_version(zf)
+    mods = []
+    for entry in data.get('mods', []):
+        mod_id = entry.get('modId')
+        version = str(entry.get('version', ''))
+        mod = {"id": mod_id, "version": jar_version if '${' in version else version, "loader": "forge",
+               "syntax": "maven", "provides": [], "depends": {}, "optional": {}, "breaks": {}, "conflicts": {},
+               "after": [], "before": []}
+        for dep in data.get('dependencies', {}).get(mod_id, []):
+            dep_id = dep.get('modId')
+            if not dep_id or str(dep.get('side', 'BOTH')).upper() == 'CLIENT':
+                continue
+            kind = str(dep.get('type', '')).lower() or ('required' if dep.get('mandatory', True) else 'optional')
+            target = {'required': 'depends', 'optional': 'optional', 'incompatible': 'breaks', 'discouraged': 'conflicts'}.get(kind)
+            if target:
+                mod[target][dep_id] = [str(dep.get('versionRange', ''))]
+            ordering = str(dep.get('ordering', 'NONE')).upper()
+            if ordering in ('AFTER', 'BEFORE'):
+                mod[ordering.lower()].append(dep_id)
+        mods.append(mod)
+    return mods
+
+# Manifests each server type's loader reads, most preferred first. Multi-loader jars carry
+# several; any other manifest is only used when none of these is present.
+LOADER_MANIFESTS = {'fabric': ('fabric',), 'quilt': ('fabric',), 'forge': ('forge', 'legacy'), 'neoforge': ('neoforge', 'forge')}
+MANIFEST_FALLBACK_ORDER = ('fabric', 'forge', 'neoforge', 'legacy')
+
+def read_mod_manifest_groups(zf: zipfile.ZipFile, depth: int = 0) -> Dict[str, List[dict]]:
+    """Mods declared by each manifest in a jar: fabric (with nested jars), forge, neoforge and legacy mcmod.info"""
+    names = set(zf.namelist())
+    groups: Dict[str, List[dict]] = {}
+    if 'fabric.mod.json' in names:
+        data = json.loads(zf.read('fabric.mod.json').decode('utf-8', 'replace'), strict=False)
+        mods = groups['fabric'] = []
+        mods.append({"id": data.get('id'), "version": str(data.get('version', '')), "loader": "fabric",
+                     "syntax": "fabric", "provides": list(data.get('provides', [])),
+                     "depends": fabric_constraints(data.get('depends')), "optional": {},
+                     "breaks": fabric_constraints(data.get('breaks')),
+                     "conflicts": fabric_constraints(data.get('conflicts')), "after": [], "before": []})
+        if depth < MOD_MANIFEST_MAX_DEPTH:
+            for nested in data.get('jars', []):
+                if nested.get('file') in names:
+                    # Jar-in-jar is a Fabric feature, so nested jars are read as Fabric would
+                    with zipfile.ZipFile(io.BytesIO(zf.read(nested['file']))) as inner:
+                        mods += [dict(mod, nested=True) for mod in read_mod_manifests(inner, 'fabric', depth + 1)]
+    for group, name in (('forge', 'META-INF/mods.toml'), ('neoforge', 'META-INF/neoforge.mods.toml')):
+        if name in names and tomllib is not None:
+            groups[group] = read_forge_manifests(zf, name)
+    if 'mcmod.info' in names:
+        data = json.loads(zf.read('mcmod.info').decode('utf-8', 'replace'), strict=False)
+        mods = groups['legacy'] = []
+        for entry in (data if isinstance(data, list) else data.get('modList', [data])):
+            requires = {}
+            for dep in entry.get('dependencies', []):
+                dep_id = dep.get('modid') if isinstance(dep, dict) else dep
+                if dep_id and (not isinstance(dep, dict) or dep.get('mandatory', True)):
+                    requires[dep_id] = ['']
+            mods.append({"id": entry.get('modid'), "version": entry.get('version'), "loader": "forge",
+                         "syntax": "maven", "provides": [], "depends": requires, "optional": {}, "breaks": {},
+                         "conflicts": {}, "after": [], "before": []})
+    return {group: [mod for mod in mods if mod.get('id')] for group, mods in groups.items()}
+
+def select_mod_manifests(groups: Dict[str, List[dict]], loader: Optional[str]) -> List[dict]:
+    """The mods the server's loader sees: its own manifest, else the first other one present"""
+    for group in LOADER_MANIFESTS.get(loader, ()) + MANIFEST_FALLBACK_ORDER:
+        if groups.get(group):
+            return groups[group]
+    return []
+
+def read_mod_manifests(zf: zipfile.ZipFile, loader: Optional[str] = None, depth: int = 0) -> List[dict]:
+    """Mods declared by a jar, as the given loader (fabric, forge, neoforge...) reads it"""
+    return select_mod_manifests(read_mod_manifest_groups(zf, depth), loader)
+
+def read_mod_manifest_batch(paths: List[str]) -> List[dict]:
+    # Every manifest is kept so the cached result serves servers of any loader
+    results = []
+    for path in paths:
+        try:
+            with zipfile.ZipFile(path) as zf:
+                results.append({"groups": read_mod_manifest_groups(zf)})
+        except (OSError, zipfile.BadZipFile, ValueError, KeyError, AttributeError, TypeError) as e:
+            results.append({"groups": {}, "error": str(e)})
+    return results
+
+mod_manifest_cache: Dict[str, tuple] = {}
+
+def version_parts(version: str) -> tuple:
+    """(release components, pre-release components or None); build metadata is ignored"""
+    core, _, pre = version.strip().split('+', 1)[0].partition('-')
+    def parts(text):
+        return [(0, int(p)) if p.isdigit() else (1, p.lower()) for p in text.split('.') if p]
+    return parts(core), (parts(pre) if pre else None)
+
+def compare_versions(a: str, b: str) -> int:
+    core_a, pre_a = version_parts(a)
+    core_b, pre_b = version_parts(b)
+    length = max(len(core_a), len(core_b))
+    core_a += [(0, 0)] * (length - len(core_a))
+    core_b += [(0, 0)] * (length - len(core_b))
+    if core_a != core_b:
+        return -1 if core_a < core_b else 1
+    if pre_a == pre_b:
+        return 0
+    if pre_a is None or pre_b is None:
+        return 1 if pre_a is None else -1  # a release sorts after its pre-releases
+    return -1 if pre_a < pre_b else 1
+
+def fabric_predicate_matches(version: str, predicate: str) -> bool:
+    """Fabric version predicate: space-separated terms (>=, <=, >, <, =, ~, ^, x wildcards) that must all match"""
+    for term in predicate.split():
+        if term == '*':
+            continue
+        op = next((o for o in ('>=', '<=', '>', '<', '=', '~', '^') if term.startswith(o)), '')
+        target = term[len(op):]
+        components = target.split('.')
+        wildcard = next((i for i, c in enumerate(components) if c in ('x', 'X', '*')), None)
+        if wildcard is not None:
+            # 1.20.x: the version must start with the components before the wildcard
+            prefix = version_parts('.'.join(components[:wildcard]))[0]
+            if version_parts(version)[0][:len(prefix)] != prefix:
+                return False
+            continue
+        result = compare_versions(version, target)
+        if op in ('~', '^'):
+            keep = 2 if op == '~' else 1
+            upper = version_parts(target)[0][:keep]
+            if result < 0 or version_parts(version)[0][:keep] != upper:
+                return False
+        elif not {'>=': result >= 0, '<=': result <= 0, '>': result > 0, '<': result < 0}.get(op, result == 0):
+            return False
+    return True
+
+def maven_range_matches(version: str, spec: str) -> bool:
+    """
+    Maven version range as used by Forge mods.toml: [1,2), (,1.0], [1.0], unions. A bare
+    version is only a recommendation and matches anything, as in Maven and Forge.
+    """
+    spec = spec.strip()
+    ranges = re.findall(r'[\[(][^\])]*[\])]', spec)
+    if not ranges:
+        return True
+    for bounds in ranges:
+        body = bounds[1:-1]
+        if ',' not in body:
+            if compare_versions(version, body) == 0:
+                return True
+            continue
+        low, high = (part.strip() for part in body.split(',', 1))
+        if low and compare_versions(version, low) < (0 if bounds[0] == '[' else 1):
+            continue
+        if high and compare_versions(version, high) > (0 if bounds[-1] == ']' else -1):
+            continue
+        return True
+    return False
+
+def version_satisfies(version: Optional[str], ranges: List[str], syntax: str) -> bool:
+    """Whether version matches any of the alternatives; unknown versions are given the benefit of the doubt"""
+    if not version or not any(r.strip() for r in ranges):
+        return True
+    matcher = fabric_predicate_matches if syntax == 'fabric' else maven_range_matches
+    try:
+        return any(matcher(version, r) for r in ranges)
+    except ValueError:
+        return True
+
+def find_cycles(edges: Dict[str, set]) -> List[List[str]]:
+    """Strongly connected components with more than one node (or a self-loop), via Tarjan's algorithm"""
+    index, low, on_stack, stack, cycles = {}, {}, set(), [], []
+
+    def visit(node):
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for nxt in edges.get(node, ()):
+            if nxt not in index:
+                visit(nxt)
+                low[node] = min(low[node], low[nxt])
+            elif nxt in on_stack:
+                low[node] = min(low[node], index[nxt])
+        if low[node] == index[node]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            if len(component) > 1 or node in edges.get(node, ()):
+                cycles.append(sorted(component))
+
+    for node in sorted(edges):
+        if node not in index:
+            visit(node)
+    return cycles
+
+def solve_dependency_graph(manifests: Dict[str, dict], minecraft_version: Optional[str]) -> dict:
+    """Check every declared relation between the installed mods; manifests maps jar filename -> manifest"""
+    providers: Dict[str, List[tuple]] = {}  # id -> [(version, jar, nested)]
+    mods = []
+    for jar, manifest in sorted(manifests.items()):
+        for mod in manifest['mods']:
+            mods.append((jar, mod))
+            for mod_id in [mod['id']] + mod['provides']:
+                providers.setdefault(mod_id, []).append((mod['version'], jar, mod.get('nested', False)))
+    if minecraft_version:
+        providers.setdefault('minecraft', []).append((minecraft_version, None, False))
+
+    missing, unsatisfied, conflicts = [], [], []
+    order: Dict[str, set] = {}
+    for jar, mod in mods:
+        for kind in ('depends', 'optional'):
+            for dep_id, ranges in mod[kind].items():
+                found = providers.get(dep_id)
+                if not found:
+                    if kind == 'depends' and dep_id not in PLATFORM_MOD_IDS:
+                        missing.append({"mod": mod['id'], "jar": jar, "requires": dep_id, "versions": ranges})
+                    continue
+                if not any(version_satisfies(version, ranges, mod['syntax']) for version, _, _ in found):
+                    unsatisfied.append({"mod": mod['id'], "jar": jar, "requires": dep_id, "versions": ranges,
+                                        "found": [version for version, _, _ in found], "optional": kind == 'optional'})
+        for kind, severity in (('breaks', 'error'), ('conflicts', 'warning')):
+            for other_id, ranges in mod[kind].items():
+                for version, other_jar, _ in providers.get(other_id, []):
+                    if other_jar != jar and version_satisfies(version, ranges, mod['syntax']):
+                        conflicts.append({"mod": mod['id'], "jar": jar, "with": other_id, "other_jar": other_jar,
+                                          "versions": ranges, "found": version, "kind": kind, "severity": severity})
+        if mod['loader'] == 'forge':
+            # Forge loads required dependencies and AFTER targets first
+            for dep_id in list(mod['depends']) + mod['after']:
+                if dep_id in providers and dep_id not in PLATFORM_MOD_IDS:
+                    order.setdefault(dep_id, set()).add(mod['id'])
+            for dep_id in mod['before']:
+                if dep_id in providers:
+                    order.setdefault(mod['id'], set()).add(dep_id)
+
+    for mod_id, found in sorted(providers.items()):
+        top_level = sorted({(jar, version) for version, jar, nested in found if jar and not nested})
+        if mod_id in PLATFORM_MOD_IDS:
+            continue
+        for other_jar, version in top_level[1:]:
+            conflicts.append({"mod": mod_id, "jar": top_level[0][0], "with": mod_id, "other_jar": other_jar,
+                              "versions": [], "found": version, "kind": "duplicate", "severity": "error"})
+
+    cycles = find_cycles(order)
+    errors = len(missing) + sum(1 for u in unsatisfied if not u['optional']) + sum(1 for c in conflicts if c['severity'] == 'error')
+    return {
+        "ok": errors == 0 and not cycles,
+        "jars": len(manifests),
+        "mods": len(mods),
+        "missing": missing,
+        "unsatisfied": unsatisfied,
+        "conflicts": conflicts,
+        "cycles": cycles,
+        "unreadable": sorted(jar for jar, manifest in manifests.items() if manifest.get('error')),
+    }
+
+async def check_mod_dependencies(server_id: str) -> dict:
+    """Dependency report for a server's mods, cached by the hash of the installed jar set"""
+    config = get_server_config(server_id)
+    mods_path = SERVERS_DIR / server_id / 'mods'
+    jars = sorted(mods_path.glob('*.jar')) if mods_path.is_dir() else []
+    hashes = await map_cached_files(jars, jar_hash_cache, file_sha1_batch, 16)
+    loader = config.get('server_type')
+    digest = hashlib.sha256(json.dumps([loader, config.get('version'), sorted(
+        (Path(path).name, sha1) for path, sha1 in hashes.items())]).encode()).hexdigest()
+    if digest in dependency_graph_cache:
+        dependency_graph_cache.move_to_end(digest)
+        return {**dependency_graph_cache[digest], "cached": True}
+
+    manifests = await map_cached_files(jars, mod_manifest_cache, read_mod_manifest_batch, 16)
+    report = solve_dependency_graph({
+        Path(path).name: {**manifest, "mods": select_mod_manifests(manifest['groups'], loader)}
+        for path, manifest in manifests.items()
+    }, config.get('version'))
+    dependency_graph_cache[digest] = report
+    while len(dependency_graph_cache) > DEPENDENCY_GRAPH_CACHE_SIZE:
+        dependency_graph_cache.popitem(last=False)
+    return {**report, "cached": False}
+
+@api_router.get("/servers/{server_id}/mods/dependencies")
+async def get_mod_dependencies(server_id: str):
+    """Check installed mods for missing, out-of-range and conflicting dependencies and load-order cycles"""
+    if not get_server_config(server_id):
+        raise HTTPException(status_code=404, detail="Server not found")
+    return await check_mod_dependencies(server_id)
+
+# ============== Streaming Archives ==============
+
+# Exclusions are matched against individual path components, not substrings of the full path
+EXPORT_EXCLUDE_NAMES = {'session.lock', 'logs', 'crash-reports', '.cache', 'incidents',
+                        '.mods-previous', '.plugins-previous', '.mods-staging', '.plugins-staging',
+                        '.mods-swap', '.plugins-swap'}
+EXPORT_EXCLUDE_SUFFIXES = ('.lock',)
+# Already compressed formats are stored instead of deflated again
+INCOMPRESSIBLE_SUFFIXES = {'.mca', '.mcc', '.jar', '.zip', '.gz', '.xz', '.zst', '.png', '.ogg', '.mcpack', '.dat', '.dat_old'}
+STREAM_CHUNK_SIZE = 1 << 20
+
+class ExportCancelled(Exception):
+    pass
+
+class QueueWriter:
+    """Write-only, unseekable file object that hands output to an async consumer in chunks"""
+
+    def __init__(self, out: queue.Queue, cancelled: threading.Event):
+        self.out = out
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        if len(self.buffer) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk, self.buffer = bytes(self.buffer), bytearray()
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.out.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+def iter_export_files(root: Path, arc_prefix: str, exclude: bool = True):
+    """Yield (path, arcname) for every file under root, pruning excluded components"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        if exclude:
+            dirnames[:] = [d for d in dirnames if d not in EXPORT_EXCLUDE_NAMES]
+        dirnames.sort()
+        relative_dir = Path(dirpath).relative_to(root)
+        for filename in sorted(filenames):
+            if exclude and (filename in EXPORT_EXCLUDE_NAMES or filename.endswith(EXPORT_EXCLUDE_SUFFIXES)):
+                continue
+            yield Path(dirpath) / filename, f"{arc_prefix}/{(relative_dir / filename).as_posix()}"
+
+# Parallel archive writers: blocks are compressed on a thread pool (zlib, lzma and zstandard release the GIL)
+# and written in their original order, so output streams as it is produced.
+
+ARCHIVE_BLOCK_SIZE = 4 * 1024 * 1024
+ARCHIVE_FORMATS = {
+    'zip': ('application/zip', 'zip'),
+    'tar.gz': ('application/gzip', 'tar.gz'),
+    'tar.xz': ('application/x-xz', 'tar.xz'),
+    'tar.zst': ('application/zstd', 'tar.zst'),
+}
+ARCHIVE_LEVELS = {'zip': (0, 9, 6), 'tar.gz': (1, 9, 6), 'tar.xz': (0, 9, 3), 'tar.zst': (1, 22, 3)}
+ARCHIVE_MAX_WORKERS = os.cpu_count() or 1
+ZIP64_LIMIT = 0xFFFFFFFF
+
+def pipelined(items, window: int):
+    """Yield items in order while the source runs up to window items ahead (keeping that many futures in flight)"""
+    pending = collections.deque()
+    for item in items:
+        pending.append(item)
+        if len(pending) > window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+def resolved(value):
+    return value.result() if isinstance(value, Future) else value
+
+def deflate_block(data: bytes, level: int, last: bool) -> bytes:
+    """Raw deflate of one block; sync-flushed blocks concatenate into a single stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class CroppedRegion:
+    """Export source for a region file reduced to the chunks inside a chunk rectangle"""
+
+    def __init__(self, path: Path, bounds: tuple):
+        self.path = path
+        self.bounds = bounds  # (cx1, cz1, cx2, cz2), inclusive
+        self.suffix = path.suffix
+
+    def __str__(self):
+        return f"{self.path} (cropped)"
+
+    def read(self) -> bytes:
+        rx, rz = region_coords(self.path)
+        cx1, cz1, cx2, cz2 = self.bounds
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        return build_region(
+            chunk for chunk in iter_region_chunks(data)
+            if cx1 <= rx * 32 + chunk[0] % 32 <= cx2 and cz1 <= rz * 32 + chunk[0] // 32 <= cz2
+        )
+
+def open_export_source(source) -> tuple:
+    """(file object, size, mtime, mode) for an export entry: a file path or an in-memory source like CroppedRegion"""
+    if isinstance(source, Path):
+        f = open(source, 'rb')
+        st = os.fstat(f.fileno())
+        return f, st.st_size, st.st_mtime, st.st_mode & 0o7777
+    st = os.stat(source.path)
+    data = source.read()
+    return io.BytesIO(data), len(data), st.st_mtime, st.st_mode & 0o7777
+
+def dos_datetime(mtime: float) -> tuple:
+    t = time.localtime(mtime)
+    year = min(max(t.tm_year, 1980), 2107)
+    return ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday, (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+
+def iter_zip_pieces(pool: ThreadPoolExecutor, entries, level: int):
+    """
+    Read files in order and yield the pieces of each ZIP entry: ('small', meta, data) for
+    files that fit in one block, or ('begin', meta), ('block', data)..., ('end', meta).
+    Compression is submitted to the pool as files are read.
+    """
+    for source, arcname in entries:
+        try:
+            f, size, mtime, mode = open_export_source(source)
+        except (FileNotFoundError, PermissionError, ValueError) as e:
+            # Files can disappear or be locked while a server is running
+            logger.warning(f"Skipping {source} in export: {e}")
+            continue
+        with f:
+            method = 0 if level == 0 or source.suffix.lower() in INCOMPRESSIBLE_SUFFIXES else 8
+            meta = {"name": arcname.encode('utf-8'), "method": method, "mtime": mtime,
+                    "mode": mode, "crc": 0, "size": 0, "zip64": size >= ZIP64_LIMIT}
+
+            data = f.read(ARCHIVE_BLOCK_SIZE)
+            following = f.read(ARCHIVE_BLOCK_SIZE) if data else b''
+            if not following:
+                meta['crc'], meta['size'] = zlib.crc32(data), len(data)
+                yield 'small', meta, pool.submit(deflate_block, data, level, True) if method else data
+                continue
+
+            yield 'begin', meta
+            while data:
+                meta['crc'] = zlib.crc32(data, meta['crc'])
+                meta['size'] += len(data)
+                yield 'block', pool.submit(deflate_block, data, level, not following) if method else data
+                data, following = following, f.read(ARCHIVE_BLOCK_SIZE) if following else b''
+            yield 'end', meta
+
+class ZipStreamWriter:
+    """Minimal streaming ZIP writer (zip64, data descriptors) for precompressed entry data"""
+
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0
+        self.central = []
+
+    def write(self, data: bytes):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def local_header(self, meta: dict, csize: int, descriptor: bool):
+        date, tod = dos_datetime(meta['mtime'])
+        flags = 0x800 | (0x08 if descriptor else 0)
+        extra = b''
+        crc, size = (0, 0) if descriptor else (meta['crc'], meta['size'])
+        if meta['zip64']:
+            extra = struct.pack('<HHQQ', 1, 16, size, csize)
+            size = csize = ZIP64_LIMIT
+        meta.update(offset=self.offset, date=date, time=tod, flags=flags)
+        self.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 45 if meta['zip64'] else 20, flags, meta['method'],
+                               tod, date, crc, csize, size, len(meta['name']), len(extra)) + meta['name'] + extra)
+
+    def add_small(self, meta: dict, data: bytes):
+        meta['zip64'] = meta['zip64'] or len(data) >= ZIP64_LIMIT
+        self.local_header(meta, len(data), descriptor=False)
+        self.write(data)
+        self.central.append(dict(meta, csize=len(data)))
+
+    def begin(self, meta: dict):
+        self.local_header(meta, 0, descriptor=True)
+        meta['csize'] = 0
+
+    def block(self, meta: dict, data: bytes):
+        self.write(data)
+        meta['csize'] += len(data)
+
+    def end(self, meta: dict):
+        if meta['zip64']:
+            self.write(struct.pack('<IIQQ', 0x08074b50, meta['crc'], meta['csize'], meta['size']))
+        else:
+            self.write(struct.pack('<IIII', 0x08074b50, meta['crc'], meta['csize'], meta['size']))
+        self.central.append(dict(meta))
+
+    def close(self):
+        cd_offset = self.offset
+        for meta in self.central:
+            values = [meta['size'], meta['csize'], meta['offset']]
+            extra_values = [v for v in values if v >= ZIP64_LIMIT]
+            extra = struct.pack(f'<HH{len(extra_values)}Q', 1, 8 * len(extra_values), *extra_values) if extra_values else b''
+            size, csize, offset = (min(v, ZIP64_LIMIT) for v in values)
+            needed = 45 if extra_values or meta['zip64'] else 20
+            self.write(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 45, needed, meta['flags'],
+                                   meta['method'], meta['time'], meta['date'], meta['crc'], csize, size,
+                                   len(meta['name']), len(extra), 0, 0, 0, (0o100000 | meta['mode']) << 16, offset)
+                       + meta['name'] + extra)
+        cd_size = self.offset - cd_offset
+        count = len(self.central)
+        if count >= 0xFFFF or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            eocd64_offset = self.offset
+            self.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, (3 << 8) | 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.write(struct.pack('<IIQI', 0x07064b50, 0, eocd64_offset, 1))
+        self.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(cd_size, ZIP64_LIMIT), min(cd_offset, ZIP64_LIMIT), 0))
+        self.out.flush()
+
+def write_parallel_zip(out, entries, level: int = 6, workers: int = ARCHIVE_MAX_WORKERS):
+    """Write files to a ZIP on an unseekable stream, deflating blocks in parallel (runs in a worker thread)"""
+    writer = ZipStreamWriter(out)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        current = None
+        for piece in pipelined(iter_zip_pieces(pool, entries, level), workers * 2):
+            kind = piece[0]
+            if kind == 'small':
+                writer.add_small(piece[1], resolved(piece[2]))
+            elif kind == 'begin':
+                current = piece[1]
+                writer.begin(current)
+            elif kind == 'block':
+                writer.block(current, resolved(piece[1]))
+            else:
+                writer.end(current)
+    writer.close()
+
+def iter_tar_stream(entries):
+    """Uncompressed tar (PAX) byte stream for the given files"""
+    for source, arcname in entries:
+        try:
+            f, size, mtime, mode = open_export_source(source)
+        except (FileNotFoundError, PermissionError, ValueError) as e:
+            logger.warning(f"Skipping {source} in export: {e}")
+            continue
+        with f:
+            info = tarfile.TarInfo(arcname)
+            info.size, info.mtime, info.mode = size, int(mtime), mode
+            yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            remaining = info.size
+            while remaining:
+                data = f.read(min(remaining, ARCHIVE_BLOCK_SIZE))
+                if not data:
+                    # File shrank while being read; keep the header's promise
+                    data = bytes(remaining)
+                remaining -= len(data)
+                yield data
+            if info.size % tarfile.BLOCKSIZE:
+                yield bytes(tarfile.BLOCKSIZE - info.size % tarfile.BLOCKSIZE)
+    yield bytes(tarfile.BLOCKSIZE * 2)
+
+def rechunk(pieces, size: int):
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+# Concatenated gzip members, xz streams and zstd frames each decode as a single file
+def gzip_block(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def xz_block(data: bytes, level: int) -> bytes:
+    return lzma.compress(data, preset=level)
+
+def zstd_block(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+TAR_CODECS = {'tar.gz': gzip_block, 'tar.xz': xz_block, 'tar.zst': zstd_block}
+
+def write_parallel_tar(out, entries, fmt: str, level: int, workers: int = ARCHIVE_MAX_WORKERS):
+    """Write a compressed tar, compressing fixed-size blocks in parallel (runs in a worker thread)"""
+    codec = TAR_CODECS[fmt]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        blocks = (pool.submit(codec, block, level) for block in rechunk(iter_tar_stream(entries), ARCHIVE_BLOCK_SIZE))
+        for future in pipelined(blocks, workers * 2):
+            out.write(future.result())
+    out.flush()
+
+def export_archive_response(entries, name: str, fmt: str = 'zip', level: Optional[int] = None,
+                            workers: Optional[int] = None) -> StreamingResponse:
+    """Stream entries in the requested archive format, validating level and worker count"""
+    if fmt not in ARCHIVE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(ARCHIVE_FORMATS)}")
+    if fmt == 'tar.zst' and zstandard is None:
+        raise HTTPException(status_code=400, detail="tar.zst exports require the zstandard package")
+    low, high, default = ARCHIVE_LEVELS[fmt]
+    level = default if level is None else level
+    if not low <= level <= high:
+        raise HTTPException(status_code=400, detail=f"Level for {fmt} must be between {low} and {high}")
+    workers = min(max(workers or ARCHIVE_MAX_WORKERS, 1), ARCHIVE_MAX_WORKERS)
+
+    media_type, extension = ARCHIVE_FORMATS[fmt]
+    if fmt == 'zip':
+        return archive_response(write_parallel_zip, f'{name}.{extension}', media_type, entries, level, workers)
+    return archive_response(write_parallel_tar, f'{name}.{extension}', media_type, entries, fmt, level, workers)
+
+async def stream_archive(writer, *args):
+    """Run a blocking archive writer in a thread and yield its output as it is produced"""
+    chunks: queue.Queue = queue.Queue(maxsize=8)
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        result = done
+        try:
+            writer(QueueWriter(chunks, cancelled), *args)
+        except ExportCancelled:
+            return
+        except Exception as e:
+            logger.error(f"Archive export failed: {e}")
+            result = e
+        while not cancelled.is_set():
+            try:
+                chunks.put(result, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+
+    def consume():
+        # Poll so a reader abandoned by a disconnected client can notice and exit
+        while not cancelled.is_set():
+            try:
+                return chunks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return done
+
+    producer = asyncio.get_running_loop().run_in_executor(None, produce)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(consume)
+            if chunk is done:
+                break
+            if isinstance(chunk, Exception):
+                # Abort the response rather than hand out a truncated archive
+                raise chunk
+            yield chunk
+    finally:
+        # Client went away or we finished: unblock the producer and let it exit
+        cancelled.set()
+        await producer
+
+def archive_response(writer, filename: str, media_type: str, *args) -> StreamingResponse:
+    return StreamingResponse(
+        stream_archive(writer, *args),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# ============== Uploads ==============
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.environ.get('MINEHOST_MAX_UPLOAD_SIZE', 64 * 1024 ** 3))
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+async def save_upload(file: UploadFile, target: Path) -> int:
+    """Stream an upload to disk in chunks, enforcing MAX_UPLOAD_SIZE"""
+    total = 0
+    try:
+        async with aiofiles.open(target, 'wb') as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="Upload exceeds the size limit")
+                await f.write(chunk)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return total
+
+def safe_archive_path(root: Path, name: str) -> Optional[Path]:
+    """Destination of an archive member inside root, or None if it would escape it (zip-slip)"""
+    name = name.replace('\\', '/')
+    parts = [part for part in name.split('/') if part not in ('', '.')]
+    if name.startswith('/') or '..' in parts or (parts and ':' in parts[0]):
+        return None
+    target = root.joinpath(*parts)
+    if not target.resolve().is_relative_to(root.resolve()):
+        return None
+    return target
+
+def read_archive_names(archive: Path) -> List[str]:
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.namelist()
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid ZIP file")
+
+def archive_root_prefix(names: List[str]) -> str:
+    """'name/' when every member sits under one top-level folder, else ''"""
+    roots = {name.replace('\\', '/').split('/')[0] for name in names}
+    if len(roots) == 1 and all('/' in name.replace('\\', '/') for name in names):
+        return roots.pop() + '/'
+    return ''
+
+def file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def extract_archive_sync(archive: Path, dest: Path, strip_prefix: str, job: Optional[dict] = None) -> dict:
+    """
+    Extract a ZIP into dest with a pool of threads, each reading through its own handle.
+    Every member path is validated before anything is written, and files that already
+    exist with the same size and CRC32 are skipped.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        members = []
+        for info in zf.infolist():
+            name = info.filename.replace('\\', '/')
+            if not name.startswith(strip_prefix):
+                continue
+            name = name[len(strip_prefix):]
+            if not name.strip('/'):
+                continue
+            target = safe_archive_path(dest, name)
+            if target is None:
+                raise HTTPException(status_code=400, detail=f"Unsafe path in archive: {info.filename}")
+            members.append((info, target))
+
+    dest.mkdir(parents=True, exist_ok=True)
+    handles = []
+    local = threading.local()
+
+    def extract(info: zipfile.ZipInfo, target: Path) -> bool:
+        if info.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.is_file() and target.stat().st_size == info.file_size and file_crc32(target) == info.CRC:
+            return True
+        if not hasattr(local, 'zip'):
+            local.zip = zipfile.ZipFile(archive)
+            handles.append(local.zip)
+        with local.zip.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+        return False
+
+    total = sum(info.file_size for info, _ in members) or 1
+    stats = {"files": 0, "skipped": 0, "bytes": 0}
+    try:
+        with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+            futures = {pool.submit(extract, info, target): info for info, target in members}
+            for future in as_completed(futures):
+                info = futures[future]
+                skipped = future.result()
+                if info.is_dir():
+                    continue
+                stats['files'] += 1
+                stats['skipped'] += skipped
+                stats['bytes'] += info.file_size
+                if job:
+                    update_job(job, stats['bytes'] / total, f"Extracted {stats['files']} files")
+    finally:
+        for handle in handles:
+            handle.close()
+    return stats
+
+# ============== Resumable Uploads ==============
+
+UPLOAD_SESSION_TTL = 24 * 3600  # seconds since the last received chunk
+UPLOAD_CLEANUP_INTERVAL = 600
+MAX_UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+
+upload_sessions: Dict[str, dict] = {}
+upload_locks: Dict[str, asyncio.Lock] = {}
+
+def upload_part_path(session_id: str) -> Path:
+    return UPLOADS_DIR / f'{session_id}.part'
+
+def save_upload_session(session: dict):
+    session['updated_at'] = time.time()
+    with open(UPLOADS_DIR / f"{session['id']}.json", 'w') as f:
+        json.dump(session, f)
+
+def get_upload_session(session_id: str) -> dict:
+    """Session from memory, or from disk after a backend restart"""
+    if session_id not in upload_sessions:
+        session_file = UPLOADS_DIR / f'{session_id}.json'
+        if not re.fullmatch(r'[0-9a-f]{12}', session_id) or not session_file.exists():
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        with open(session_file) as f:
+            upload_sessions[session_id] = json.load(f)
+    return upload_sessions[session_id]
+
+def discard_upload_session(session_id: str):
+    upload_sessions.pop(session_id, None)
+    upload_locks.pop(session_id, None)
+    (UPLOADS_DIR / f'{session_id}.json').unlink(missing_ok=True)
+    upload_part_path(session_id).unlink(missing_ok=True)
+
+def create_upload_session(kind: str, filename: str, size: Optional[int], server_id: Optional[str] = None,
+                          chunk_size: int = 8 * 1024 * 1024, sha256: Optional[str] = None,
+                          modpack: Optional[ModpackImport] = None) -> dict:
+    """Start an upload backed by a sparse file. size None means the file is streamed in one piece."""
+    if kind not in ('world', 'server', 'mrpack'):
+        raise HTTPException(status_code=400, detail="Upload kind must be 'world', 'server' or 'mrpack'")
+    if kind == 'world' and not get_server_config(server_id or ''):
+        raise HTTPException(status_code=404, detail="Server not found")
+    if size is not None and not 0 < size <= MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Upload exceeds the size limit")
+    if not 0 < chunk_size <= MAX_UPLOAD_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail="Invalid chunk size")
+    if modpack is not None:
+        validate_modpack_options(modpack)
+
+    session = {
+        "id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "server_id": server_id,
+        "filename": Path(filename).name,
+        "size": size,
+        "chunk_size": chunk_size,
+        "chunks": -(-size // chunk_size) if size else 0,
+        "received": [],
+        "sha256": sha256.lower() if sha256 else None,
+        "modpack": modpack.model_dump() if modpack else None,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    with open(upload_part_path(session['id']), 'wb') as f:
+        if size:
+            f.truncate(size)
+    save_upload_session(session)
+    upload_sessions[session['id']] = session
+    return session
+
+def missing_chunk_ranges(session: dict) -> List[List[int]]:
+    """Inclusive [first, last] chunk index ranges not received yet"""
+    received = set(session['received'])
+    ranges = []
+    for index in range(session['chunks']):
+        if index in received:
+            continue
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ranges
+
+def upload_session_status(session: dict) -> dict:
+    missing = missing_chunk_ranges(session)
+    chunk_size = session['chunk_size']
+    return {
+        **{k: v for k, v in session.items() if k != 'received'},
+        "received_chunks": len(session['received']),
+        "missing": missing,
+        "missing_bytes": [[first * chunk_size, min((last + 1) * chunk_size, session['size']) - 1] for first, last in missing],
+        "expires_at": datetime.fromtimestamp(session['updated_at'] + UPLOAD_SESSION_TTL, timezone.utc).isoformat()
+    }
+
+def write_upload_chunk(path: Path, offset: int, data: bytes):
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def finalize_upload(session_id: str) -> dict:
+    """Check a completed upload and hand the file to the world or server import job"""
+    session = get_upload_session(session_id)
+    async with upload_locks.setdefault(session_id, asyncio.Lock()):
+        # A concurrent finalize or cancel may have taken the session while we waited
+        if upload_sessions.get(session_id) is not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session['size'] is not None and len(session['received']) < session['chunks']:
+            raise HTTPException(status_code=400, detail=f"Upload incomplete: {len(session['received'])}/{session['chunks']} chunks")
+        part = upload_part_path(session_id)
+        if session['sha256'] and await asyncio.to_thread(file_sha256, part) != session['sha256']:
+            discard_upload_session(session_id)
+            raise HTTPException(status_code=400, detail="Upload checksum mismatch")
+
+        archive = UPLOADS_DIR / f'{session_id}.zip'
+        os.rename(part, archive)
+        discard_upload_session(session_id)
+
+    if session['kind'] == 'world':
+        return await start_world_upload(session['server_id'], archive, session['filename'])
+    if session['kind'] == 'mrpack':
+        return await start_mrpack_import(archive, ModpackImport(**(session.get('modpack') or {})))
+    return await start_server_import(archive)
+
+async def upload_cleanup_loop():
+    """Drop upload sessions that stopped receiving chunks"""
+    while True:
+        await asyncio.sleep(UPLOAD_CLEANUP_INTERVAL)
+        for session_file in list(UPLOADS_DIR.glob('*.json')):
+            try:
+                with open(session_file) as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if time.time() - session.get('updated_at', 0) > UPLOAD_SESSION_TTL:
+                logger.info(f"Upload session {session['id']} expired")
+                discard_upload_session(session['id'])
+
+@api_router.post("/uploads")
+async def create_upload(data: UploadSessionCreate):
+    """Start a resumable upload of a world or server ZIP"""
+    session = create_upload_session(data.kind, data.filename, data.size, data.server_id, data.chunk_size, data.sha256,
+                                    data.modpack)
+    return upload_session_status(session)
+
+@api_router.get("/uploads/{session_id}")
+async def get_upload(session_id: str):
+    """Upload progress and the chunk ranges still missing"""
+    return upload_session_status(get_upload_session(session_id))
+
+@api_router.put("/uploads/{session_id}/chunks/{index}")
+async def put_upload_chunk(session_id: str, index: int, request: Request):
+    """Store one chunk. Send its checksum in X-Chunk-SHA256 or X-Chunk-CRC32 (hex)."""
+    session = get_upload_session(session_id)
+    if session['size'] is None or not 0 <= index < session['chunks']:
+        raise HTTPException(status_code=400, detail="Invalid chunk index")
+    offset = index * session['chunk_size']
+    expected_size = min(session['chunk_size'], session['size'] - offset)
+
+    sha256 = request.headers.get('x-chunk-sha256')
+    crc32 = request.headers.get('x-chunk-crc32')
+    if not sha256 and not crc32:
+        raise HTTPException(status_code=400, detail="Missing chunk checksum header")
+
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > expected_size:
+            raise HTTPException(status_code=400, detail="Chunk larger than expected")
+    if len(data) != expected_size:
+        raise HTTPException(status_code=400, detail=f"Chunk size mismatch: expected {expected_size} bytes")
+    if sha256 and hashlib.sha256(data).hexdigest() != sha256.lower():
+        raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+    if crc32:
+        try:
+            expected_crc32 = int(crc32, 16)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid X-Chunk-CRC32 header")
+        if zlib.crc32(data) != expected_crc32:
+            raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+
+    # Write under the session lock so a chunk can't land in a file finalize or cancel has taken away
+    async with upload_locks.setdefault(session_id, asyncio.Lock()):
+        if upload_sessions.get(session_id) is not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        try:
+            await asyncio.to_thread(write_upload_chunk, upload_part_path(session_id), offset, bytes(data))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if index not in session['received']:
+            session['received'].append(index)
+        await asyncio.to_thread(save_upload_session, session)
+    return {"index": index, "received_chunks": len(session['received']), "chunks": session['chunks']}
+
+@api_router.post("/uploads/{session_id}/finalize")
+async def finalize_upload_session(session_id: str):
+    """Finish an upload and start extracting it; returns the job"""
+    return await finalize_upload(session_id)
+
+@api_router.delete("/uploads/{session_id}")
+async def cancel_upload(session_id: str):
+    """Abort an upload and delete what was received"""
+    get_upload_session(session_id)
+    async with upload_locks.setdefault(session_id, asyncio.Lock()):
+        discard_upload_session(session_id)
+    return {"message": "Upload cancelled"}
+
+# ============== Anvil Region Files ==============
+
+REGION_SECTOR_SIZE = 4096
+REGION_HEADER_SIZE = 8192
+REGION_CHUNKS = 1024
+
+def iter_region_chunks(data):
+    """
+    Yield (index, timestamp, payload) for every valid chunk in a region file buffer.
+    payload is the compression-type byte followed by the compressed chunk data.
+    """
+    if len(data) < REGION_HEADER_SIZE:
+        return
+    locations = struct.unpack_from('>1024I', data, 0)
+    timestamps = struct.unpack_from('>1024I', data, REGION_SECTOR_SIZE)
+    for index, location in enumerate(locations):
+        sector, count = location >> 8, location & 0xFF
+        if sector < 2 or count == 0:
+            continue
+        start = sector * REGION_SECTOR_SIZE
+        if start + 5 > len(data):
+            continue
+        length = struct.unpack_from('>I', data, start)[0]
+        if length == 0 or length + 4 > count * REGION_SECTOR_SIZE or start + 4 + length > len(data):
+            continue
+        yield index, timestamps[index], bytes(data[start + 4:start + 4 + length])
+
+def unreadable_region_entries(data: bytes, chunks: list) -> int:
+    """Header entries that iter_region_chunks could not read (rebuilding the file would drop them)"""
+    if len(data) < REGION_HEADER_SIZE:
+        return 0
+    return sum(1 for location in struct.unpack_from('>1024I', data, 0) if location) - len(chunks)
+
+def build_region(chunks) -> bytes:
+    """Build a compact region file (no free sectors) from (index, timestamp, payload) tuples"""
+    locations = [0] * REGION_CHUNKS
+    timestamps = [0] * REGION_CHUNKS
+    body = bytearray()
+    sector = REGION_HEADER_SIZE // REGION_SECTOR_SIZE
+    for index, timestamp, payload in sorted(chunks, key=lambda chunk: chunk[0]):
+        record = struct.pack('>I', len(payload)) + payload
+        count = -(-len(record) // REGION_SECTOR_SIZE)
+        if count > 255:
+            raise ValueError(f"Chunk {index} is too large for a region sector run")
+        locations[index] = (sector << 8) | count
+        timestamps[index] = timestamp
+        body += record
+        body += bytes(count * REGION_SECTOR_SIZE - len(record))
+        sector += count
+    return struct.pack('>1024I', *locations) + struct.pack('>1024I', *timestamps) + bytes(body)
+
+REGION_COMPRESSION_NAMES = {1: 'gzip', 2: 'zlib', 3: 'none', 4: 'lz4', 127: 'custom'}
+REGION_COMPRESSION_IDS = {'deflate': 2, 'lz4': 4, 'none': 3}  # server.properties region-file-compression
+LZ4_BLOCK_MAGIC = b'LZ4Block'
+LZ4_BLOCK_HEADER_SIZE = 21
+LZ4_BLOCK_SIZE = 1 << 16
+LZ4_BLOCK_LEVEL = 6  # lz4-java token level for 64 KiB blocks
+LZ4_BLOCK_SEED = 0x9747B28C
+LZ4_BLOCK_CHECKSUM_MASK = 0x0FFFFFFF  # lz4-java's StreamingXXHash32.asChecksum() keeps 28 bits
+
+def lz4_block_checksum(block: bytes) -> int:
+    return xxhash.xxh32_intdigest(block, seed=LZ4_BLOCK_SEED) & LZ4_BLOCK_CHECKSUM_MASK
+
+def lz4_block_decompress(data: bytes) -> bytes:
+    """Decode the lz4-java LZ4BlockOutputStream framing Minecraft uses for lz4 chunks"""
+    if lz4 is None:
+        raise ValueError("lz4 chunk compression requires the lz4 package")
+    out = bytearray()
+    offset = 0
+    while offset + LZ4_BLOCK_HEADER_SIZE <= len(data):
+        if data[offset:offset + 8] != LZ4_BLOCK_MAGIC:
+            raise ValueError("Bad LZ4Block magic")
+        token = data[offset + 8]
+        compressed_len, original_len, checksum = struct.unpack_from('<iiI', data, offset + 9)
+        offset += LZ4_BLOCK_HEADER_SIZE
+        if original_len == 0:
+            break
+        block = data[offset:offset + compressed_len]
+        offset += compressed_len
+        if token & 0xF0 == 0x10:  # stored
+            decoded = block
+        else:
+            decoded = lz4.block.decompress(block, uncompressed_size=original_len)
+        # Verify like LZ4BlockInputStream does, so a bad encoder can't pass its own round trip
+        if xxhash is not None and lz4_block_checksum(decoded) != checksum:
+            raise ValueError("LZ4Block checksum mismatch")
+        out += decoded
+    return bytes(out)
+
+def lz4_block_compress(data: bytes) -> bytes:
+    """Encode data the way lz4-java's LZ4BlockOutputStream does, so the server can read it"""
+    if lz4 is None or xxhash is None:
+        raise ValueError("lz4 chunk compression requires the lz4 and xxhash packages")
+    out = bytearray()
+    for offset in range(0, len(data), LZ4_BLOCK_SIZE):
+        block = data[offset:offset + LZ4_BLOCK_SIZE]
+        compressed = lz4.block.compress(block, store_size=False)
+        method = 0x20
+        if len(compressed) >= len(block):
+            compressed, method = block, 0x10
+        out += LZ4_BLOCK_MAGIC + bytes([method | LZ4_BLOCK_LEVEL]) + struct.pack(
+            '<iiI', len(compressed), len(block), lz4_block_checksum(block))
+        out += compressed
+    out += LZ4_BLOCK_MAGIC + bytes([0x10 | LZ4_BLOCK_LEVEL]) + struct.pack('<iii', 0, 0, 0)
+    return bytes(out)
+
+def compress_chunk(data: bytes, compression: int) -> bytes:
+    """Region payload (compression byte + data) for chunk NBT bytes"""
+    if compression == 1:
+        return b'\x01' + gzip.compress(data)
+    if compression == 2:
+        return b'\x02' + zlib.compress(data)
+    if compression == 3:
+        return b'\x03' + data
+    if compression == 4:
+        return b'\x04' + lz4_block_compress(data)
+    raise ValueError(f"Unsupported chunk compression {compression}")
+
+def decompress_chunk(payload: bytes) -> bytes:
+    """Chunk NBT bytes from a region payload (compression byte + data)"""
+    compression, data = payload[0], payload[1:]
+    if compression == 1:
+        return gzip.decompress(data)
+    if compression == 2:
+        return zlib.decompress(data)
+    if compression == 3:
+        return data
+    if compression == 4:
+        return lz4_block_decompress(data)
+    raise ValueError(f"Unsupported chunk compression {compression}")
+
+def region_coords(path) -> Optional[tuple]:
+    """(x, z) region coordinates from an r.<x>.<z>.mca file name"""
+    parts = Path(path).name.split('.')
+    if len(parts) != 4 or parts[0] != 'r' or parts[3] != 'mca':
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-heavy world processing"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: forking a process that runs threads and an event loop is unsafe
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+def chunk_batches(items: list, size: int) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def read_region_header_stats(path: str) -> dict:
+    """
+    Chunk statistics for one region file read from the 8 KiB header tables via mmap.
+    Only the 5-byte chunk prefix is touched to learn the compression type; payloads are
+    never decompressed.
+    """
+    stats = {
+        "size": 0, "valid": True, "chunks": 0, "used_sectors": 0, "file_sectors": 0,
+        "compression": {}, "days": {}
+    }
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        stats['size'] = size
+        stats['file_sectors'] = -(-size // REGION_SECTOR_SIZE)
+        if size < REGION_HEADER_SIZE:
+            stats['valid'] = size == 0
+            return stats
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            locations = struct.unpack_from('>1024I', mm, 0)
+            timestamps = struct.unpack_from('>1024I', mm, REGION_SECTOR_SIZE)
+            for index, location in enumerate(locations):
+                sector, count = location >> 8, location & 0xFF
+                if sector < 2 or count == 0:
+                    continue
+                start = sector * REGION_SECTOR_SIZE
+                if start + 5 > size:
+                    stats['valid'] = False
+                    continue
+                compression = mm[start + 4]
+                name = 'external' if compression & 0x80 else REGION_COMPRESSION_NAMES.get(compression, 'unknown')
+                stats['compression'][name] = stats['compression'].get(name, 0) + 1
+                stats['chunks'] += 1
+                stats['used_sectors'] += count
+                day = timestamps[index] // 86400
+                stats['days'][day] = stats['days'].get(day, 0) + 1
+    return stats
+
+def read_region_header_batch(paths: List[str]) -> List[dict]:
+    results = []
+    for path in paths:
+        try:
+            results.append(read_region_header_stats(path))
+        except OSError as e:
+            results.append({"valid": False, "error": str(e)})
+    return results
+
+async def map_cached_files(paths: List[Path], cache: Dict[str, tuple], batch_worker: Callable, batch_size: int,
+                           in_threads: bool = False) -> Dict[str, Any]:
+    """
+    Run batch_worker over files in the process pool, reusing cache entries keyed by
+    (mtime_ns, size) so only changed files are processed again. in_threads uses the
+    default thread pool instead, for small files not worth starting worker processes for.
+    """
+    results = {}
+    stale = []
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        key = str(path)
+        cached = cache.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            results[key] = cached[2]
+        else:
+            stale.append((key, st.st_mtime_ns, st.st_size))
+
+    if stale:
+        loop = asyncio.get_running_loop()
+        pool = None if in_threads else get_process_pool()
+        batches = chunk_batches(stale, batch_size)
+        outputs = await asyncio.gather(*(
+            loop.run_in_executor(pool, batch_worker, [key for key, _, _ in batch]) for batch in batches
+        ))
+        for batch, batch_results in zip(batches, outputs):
+            for (key, mtime_ns, size), result in zip(batch, batch_results):
+                cache[key] = (mtime_ns, size, result)
+                results[key] = result
+    return results
+
+region_stats_cache: Dict[str, tuple] = {}
+
+async def get_region_stats(paths: List[Path]) -> Dict[str, dict]:
+    """Header stats for many region files"""
+    return await map_cached_files(paths, region_stats_cache, read_region_header_batch, 64)
+
+def summarize_region_stats(region_stats: List[dict]) -> dict:
+    """Aggregate per-region header stats into dimension totals"""
+    today = int(time.time() // 86400)
+    summary = {
+        "regions": len(region_stats), "invalid_regions": 0, "chunks": 0, "size": 0,
+        "waste_bytes": 0, "compression": {},
+        "last_touched": {"1d": 0, "7d": 0, "30d": 0, "365d": 0, "older": 0},
+        "newest_chunk": None, "oldest_chunk": None
+    }
+    newest, oldest = None, None
+    for stats in region_stats:
+        if not stats.get('valid', False):
+            summary['invalid_regions'] += 1
+        summary['chunks'] += stats.get('chunks', 0)
+        summary['size'] += stats.get('size', 0)
+        if stats.get('file_sectors'):
+            free = stats['file_sectors'] - REGION_HEADER_SIZE // REGION_SECTOR_SIZE - stats['used_sectors']
+            summary['waste_bytes'] += max(free, 0) * REGION_SECTOR_SIZE
+        for name, count in stats.get('compression', {}).items():
+            summary['compression'][name] = summary['compression'].get(name, 0) + count
+        for day, count in stats.get('days', {}).items():
+            day = int(day)
+            age = today - day
+            bucket = '1d' if age < 1 else '7d' if age < 7 else '30d' if age < 30 else '365d' if age < 365 else 'older'
+            summary['last_touched'][bucket] += count
+            if day > 0:
+                newest = day if newest is None else max(newest, day)
+                oldest = day if oldest is None else min(oldest, day)
+
+    summary['explored_area_km2'] = round(summary['chunks'] * 256 / 1_000_000, 3)
+    summary['waste_percent'] = round(summary['waste_bytes'] * 100 / summary['size'], 1) if summary['size'] else 0
+    if newest is not None:
+        summary['newest_chunk'] = datetime.fromtimestamp(newest * 86400, timezone.utc).date().isoformat()
+        summary['oldest_chunk'] = datetime.fromtimestamp(oldest * 86400, timezone.utc).date().isoformat()
+    return summary
+
+# ============== NBT ==============
+
+NBT_NUMERIC_FORMATS = {1: '>b', 2: '>h', 3: '>i', 4: '>q', 5: '>f', 6: '>d'}
+NBT_ARRAY_FORMATS = {7: 'b', 11: 'i', 12: 'q'}
+
+def read_nbt_payload(data, tag: int, offset: int) -> tuple:
+    """Decode one tag payload; returns (value, next offset)"""
+    if tag in NBT_NUMERIC_FORMATS:
+        fmt = NBT_NUMERIC_FORMATS[tag]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+    if tag in NBT_ARRAY_FORMATS:
+        length = struct.unpack_from('>i', data, offset)[0]
+        offset += 4
+        if tag == 7:
+            return bytes(data[offset:offset + length]), offset + length
+        fmt = NBT_ARRAY_FORMATS[tag]
+        return list(struct.unpack_from(f'>{length}{fmt}', data, offset)), offset + length * struct.calcsize(fmt)
+    if tag == 8:
+        length = struct.unpack_from('>H', data, offset)[0]
+        offset += 2
+        return bytes(data[offset:offset + length]).decode('utf-8', errors='replace'), offset + length
+    if tag == 9:
+        item_tag = data[offset]
+        length = struct.unpack_from('>i', data, offset + 1)[0]
+        offset += 5
+        items = []
+        for _ in range(max(length, 0)):
+            value, offset = read_nbt_payload(data, item_tag, offset)
+            items.append(value)
+        return items, offset
+    if tag == 10:
+        compound = {}
+        while True:
+            child_tag = data[offset]
+            offset += 1
+            if child_tag == 0:
+                return compound, offset
+            name, offset = read_nbt_payload(data, 8, offset)
+            compound[name], offset = read_nbt_payload(data, child_tag, offset)
+    raise ValueError(f"Unknown NBT tag {tag}")
+
+def parse_nbt(data: bytes) -> dict:
+    """Parse an uncompressed NBT document into nested dicts/lists"""
+    if not data or data[0] != 10:
+        raise ValueError("NBT root is not a compound")
+    _, offset = read_nbt_payload(data, 8, 1)
+    return read_nbt_payload(data, 10, offset)[0]
+
+def read_nbt_file(path: Path) -> dict:
+    """Parse an NBT file such as level.dat, gzip-compressed or not"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return parse_nbt(data)
+
+NBT_FIXED_SIZES = {1: 1, 2: 2, 3: 4, 4: 8, 5: 4, 6: 8}
+NBT_ARRAY_ITEM_SIZES = {7: 1, 11: 4, 12: 8}
+
+def skip_nbt_payload(data, tag: int, offset: int) -> int:
+    """Offset just past one tag payload, without building its value"""
+    if tag in NBT_FIXED_SIZES:
+        return offset + NBT_FIXED_SIZES[tag]
+    if tag in NBT_ARRAY_ITEM_SIZES:
+        return offset + 4 + struct.unpack_from('>i', data, offset)[0] * NBT_ARRAY_ITEM_SIZES[tag]
+    if tag == 8:
+        return offset + 2 + struct.unpack_from('>H', data, offset)[0]
+    if tag == 9:
+        item_tag = data[offset]
+        length = max(struct.unpack_from('>i', data, offset + 1)[0], 0)
+        offset += 5
+        if item_tag in NBT_FIXED_SIZES:
+            return offset + length * NBT_FIXED_SIZES[item_tag]
+        for _ in range(length):
+            offset = skip_nbt_payload(data, item_tag, offset)
+        return offset
+    if tag == 10:
+        while True:
+            child_tag = data[offset]
+            offset += 1
+            if child_tag == 0:
+                return offset
+            offset = skip_nbt_payload(data, child_tag, skip_nbt_payload(data, 8, offset))
+    raise ValueError(f"Unknown NBT tag {tag}")
+
+def find_nbt_long(data: bytes, path: tuple) -> Optional[int]:
+    """
+    TAG_Long at a path of compound names below the root (e.g. ('Level', 'InhabitedTime')),
+    skipping every other payload instead of parsing the document
+    """
+    if not data or data[0] != 10:
+        return None
+    offset = skip_nbt_payload(data, 8, 1)
+    for depth, wanted in enumerate(path):
+        last = depth == len(path) - 1
+        while True:
+            tag = data[offset]
+            if tag == 0:
+                return None
+            name, offset = read_nbt_payload(data, 8, offset + 1)
+            if name == wanted:
+                break
+            offset = skip_nbt_payload(data, tag, offset)
+        if last:
+            return struct.unpack_from('>q', data, offset)[0] if tag == 4 else None
+        if tag != 10:
+            return None
+    return None
+
+def chunk_inhabited_time(nbt: bytes) -> Optional[int]:
+    """InhabitedTime of a chunk: at the root since 1.18, inside Level before that"""
+    inhabited = find_nbt_long(nbt, ('InhabitedTime',))
+    return inhabited if inhabited is not None else find_nbt_long(nbt, ('Level', 'InhabitedTime'))
+
+DIFFICULTY_NAMES = {0: 'peaceful', 1: 'easy', 2: 'normal', 3: 'hard'}
+GAME_MODE_NAMES = {0: 'survival', 1: 'creative', 2: 'adventure', 3: 'spectator'}
+
+def read_level_metadata(path: str) -> dict:
+    """World metadata from a level.dat file"""
+    data = read_nbt_file(Path(path)).get('Data', {})
+    seed = data.get('WorldGenSettings', {}).get('seed', data.get('RandomSeed'))
+    if 'SpawnX' in data:
+        spawn = [data['SpawnX'], data.get('SpawnY'), data.get('SpawnZ')]
+    else:
+        spawn = data.get('spawn', {}).get('pos')
+    difficulty = data.get('Difficulty')
+    last_played = data.get('LastPlayed')
+    game_rules = data.get('GameRules', data.get('game_rules', {}))
+    return {
+        "level_name": data.get('LevelName'),
+        # Seeds are 64-bit; keep them as strings so JavaScript clients don't round them
+        "seed": str(seed) if seed is not None else None,
+        "spawn": list(spawn) if spawn else None,
+        "game_rules": {k: str(v) for k, v in game_rules.items()} if isinstance(game_rules, dict) else {},
+        "data_version": data.get('DataVersion'),
+        "version": data.get('Version', {}).get('Name'),
+        "last_played": datetime.fromtimestamp(last_played / 1000, timezone.utc).isoformat() if last_played else None,
+        "difficulty": DIFFICULTY_NAMES.get(difficulty, difficulty),
+        "game_mode": GAME_MODE_NAMES.get(data.get('GameType'), data.get('GameType')),
+        "hardcore": bool(data.get('hardcore', 0))
+    }
+
+def read_level_metadata_batch(paths: List[str]) -> List[Optional[dict]]:
+    results = []
+    for path in paths:
+        try:
+            results.append(read_level_metadata(path))
+        except (OSError, ValueError, EOFError, IndexError, struct.error, zlib.error) as e:
+            results.append({"error": f"Unreadable level.dat: {e}"})
+    return results
+
+# Parsed level.dat metadata cached by (mtime_ns, size)
+level_metadata_cache: Dict[str, tuple] = {}
+
+def get_world_spawn(world_path: Path) -> Optional[tuple]:
+    """(x, z) world spawn from level.dat"""
+    try:
+        data = read_nbt_file(world_path / 'level.dat').get('Data', {})
+    except (OSError, ValueError, EOFError, IndexError, struct.error):
+        return None
+    if 'SpawnX' in data and 'SpawnZ' in data:
+        return data['SpawnX'], data['SpawnZ']
+    pos = data.get('spawn', {}).get('pos')  # 1.21.9+
+    if isinstance(pos, list) and len(pos) == 3:
+        return pos[0], pos[2]
+    return None
+
+# ============== World Management ==============
+
+# Serializes snapshot, restore and offline maintenance work on a server's worlds
+world_locks: Dict[str, asyncio.Lock] = {}
+
+def get_world_lock(server_id: str) -> asyncio.Lock:
+    if server_id not in world_locks:
+        world_locks[server_id] = asyncio.Lock()
+    return world_locks[server_id]
+
+# Nested dimension folders (vanilla) and sibling world suffixes (Bukkit/Paper)
+DIMENSION_DIRS = {'DIM-1': 'minecraft:the_nether', 'DIM1': 'minecraft:the_end'}
+BUKKIT_DIMENSION_WORLDS = {'_nether': ('DIM-1', 'minecraft:the_nether'), '_the_end': ('DIM1', 'minecraft:the_end')}
+
+# World size accounting
+world_size_cache: Dict[str, dict] = {}
+world_dir_cache: Dict[str, tuple] = {}  # dir -> (mtime_ns, files_total, subdirs, has_region_files)
+world_size_tasks: Dict[str, asyncio.Task] = {}
+WORLD_SIZE_TTL = 60
+
+def get_world_dimensions(world_path: Path) -> Dict[str, Path]:
+    """Map dimension ids to the folders that hold their region/entities/poi data"""
+    dimensions = {'minecraft:overworld': world_path}
+
+    for dirname, dimension in DIMENSION_DIRS.items():
+        if (world_path / dirname).is_dir():
+            dimensions[dimension] = world_path / dirname
+
+    # Bukkit keeps the nether and end in sibling worlds (world_nether/DIM-1, world_the_end/DIM1)
+    for suffix, (dirname, dimension) in BUKKIT_DIMENSION_WORLDS.items():
+        sibling = world_path.parent / f'{world_path.name}{suffix}' / dirname
+        if dimension not in dimensions and sibling.is_dir():
+            dimensions[dimension] = sibling
+
+    # Datapack/mod dimensions live in dimensions/<namespace>/<name>
+    custom_root = world_path / 'dimensions'
+    if custom_root.is_dir():
+        for namespace in custom_root.iterdir():
+            if namespace.is_dir():
+                for dimension_dir in namespace.iterdir():
+                    if dimension_dir.is_dir() and dimension_dir.name not in ('overworld', 'the_nether', 'the_end'):
+                        dimensions[f'{namespace.name}:{dimension_dir.name}'] = dimension_dir
+
+    return dimensions
+
+def scan_tree_size(path: str, totals: Dict[str, int]) -> int:
+    """
+    Total size of a directory tree, reusing cached per-directory totals.
+    A directory is only re-listed when its mtime changed; Minecraft replaces .dat/.json
+    files via rename, which bumps the mtime, but writes .mca files in place, so
+    directories holding region files always re-stat their files.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+    cached = world_dir_cache.get(path)
+    if cached and cached[0] == mtime_ns and not cached[3]:
+        files_total, subdirs = cached[1], cached[2]
+    else:
+        files_total = 0
+        subdirs = []
+        has_region_files = False
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files_total += entry.stat(follow_symlinks=False).st_size
+                            if entry.name.endswith(('.mca', '.mcc')):
+                                has_region_files = True
+                    except OSError:
+                        continue
+        except OSError:
+            return 0
+        world_dir_cache[path] = (mtime_ns, files_total, subdirs, has_region_files)
+
+    total = files_total + sum(scan_tree_size(sub, totals) for sub in subdirs)
+    totals[path] = total
+    return total
+
+def compute_world_size(world_path: Path) -> dict:
+    """Per-world and per-dimension size totals (runs in a worker thread)"""
+    totals: Dict[str, int] = {}
+    world_total = scan_tree_size(str(world_path), totals)
+
+    dimensions = {}
+    nested_total = 0
+    for dimension, dimension_path in get_world_dimensions(world_path).items():
+        if dimension == 'minecraft:overworld':
+            continue
+        key = str(dimension_path)
+        size = totals[key] if key in totals else scan_tree_size(key, totals)
+        dimensions[dimension] = size
+        if dimension_path.is_relative_to(world_path):
+            nested_total += size
+
+    dimensions['minecraft:overworld'] = world_total - nested_total
+    return {
+        "size": world_total,
+        "dimensions": dimensions,
+        "computed_at": datetime.now(timezone.utc).isoformat(),
+        "computed_monotonic": time.monotonic()
+    }
+
+async def refresh_world_size(world_path: Path) -> dict:
+    """Recompute a world's size off the event loop, sharing an in-flight scan"""
+    key = str(world_path)
+    task = world_size_tasks.get(key)
+    if task is None:
+        async def run():
+            try:
+                result = await asyncio.to_thread(compute_world_size, world_path)
+                world_size_cache[key] = result
+                return result
+            finally:
+                world_size_tasks.pop(key, None)
+        task = world_size_tasks[key] = asyncio.create_task(run())
+    return await task
+
+def forget_world_size(world_path: Path):
+    """Drop cached totals for a world that was removed or replaced"""
+    prefix = str(world_path)
+    world_size_cache.pop(prefix, None)
+    for path in [p for p in world_dir_cache if p == prefix or p.startswith(prefix + os.sep)]:
+        del world_dir_cache[path]
+
+@api_router.get("/servers/{server_id}/worlds")
+async def list_worlds(server_id: str):
+    """List worlds in server"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    server_path = SERVERS_DIR / server_id
+    world_paths = [item for item in server_path.iterdir() if item.is_dir() and (item / 'level.dat').exists()]
+    
+    # Cached totals are returned immediately; only never-seen worlds wait for a scan
+    missing = [p for p in world_paths if str(p) not in world_size_cache]
+    size_scan = asyncio.gather(*(refresh_world_size(p) for p in missing))
+    metadata = await map_cached_files([p / 'level.dat' for p in world_paths], level_metadata_cache,
+                                      read_level_metadata_batch, 4, in_threads=True)
+    await size_scan
+    
+    worlds = []
+    for world_path in world_paths:
+        sizes = world_size_cache[str(world_path)]
+        if time.monotonic() - sizes['computed_monotonic'] > WORLD_SIZE_TTL:
+            asyncio.create_task(refresh_world_size(world_path))
+        worlds.append({
+            "name": world_path.name,
+            "size": sizes['size'],
+            "dimensions": sizes['dimensions'],
+            "computed_at": sizes['computed_at'],
+            "metadata": metadata.get(str(world_path / 'level.dat'))
+        })
+    
+    return {"worlds": worlds}
+
+@api_router.get("/servers/{server_id}/worlds/{world_name}/stats")
+async def get_world_stats(server_id: str, world_name: str):
+    """Chunk, explored-area, waste and last-touched statistics per dimension"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    world_path = SERVERS_DIR / server_id / world_name
+    if '/' in world_name or world_name in ('.', '..') or not (world_path / 'level.dat').exists():
+        raise HTTPException(status_code=404, detail="World not found")
+
+    started = time.monotonic()
+    dimensions = await asyncio.to_thread(get_world_dimensions, world_path)
+    region_files = {
+        dimension: await asyncio.to_thread(lambda d=path: sorted((d / 'region').glob('r.*.*.mca')))
+        for dimension, path in dimensions.items()
+    }
+    all_stats = await get_region_stats([p for paths in region_files.values() for p in paths])
+
+    result = {}
+    for dimension, paths in region_files.items():
+        result[dimension] = summarize_region_stats([all_stats[str(p)] for p in paths if str(p) in all_stats])
+
+    return {
+        "world": world_name,
+        "dimensions": result,
+        "total": summarize_region_stats(list(all_stats.values())),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+    }
+
+@api_router.post("/servers/{server_id}/worlds/upload")
+async def upload_world(server_id: str, file: UploadFile = File(...)):
+    """Upload a world in one request (see /uploads for resumable uploads)"""
+    session = create_upload_session('world', file.filename or 'world.zip', None, server_id)
+    try:
+        await save_upload(file, upload_part_path(session['id']))
+    except BaseException:
+        discard_upload_session(session['id'])
+        raise
+    return await finalize_upload(session['id'])
+
+async def start_world_upload(server_id: str, temp_zip: Path, filename: str) -> dict:
+    """Validate an uploaded world ZIP and extract it in a background job"""
+    server_path = SERVERS_DIR / server_id
+    try:
+        prefix = archive_root_prefix(await asyncio.to_thread(read_archive_names, temp_zip))
+        # Archives without a top-level folder are named after the uploaded file
+        world_name = prefix.rstrip('/') or Path(filename).stem
+        if world_name in ('.', '..') or world_name.startswith('.'):
+            raise HTTPException(status_code=400, detail="Invalid world name")
+        if server_id in running_servers and (server_path / world_name).exists():
+            raise HTTPException(status_code=400, detail="Stop the server before replacing one of its worlds")
+    except BaseException:
+        temp_zip.unlink(missing_ok=True)
+        raise
+    
+    async def work(job):
+        world_path = server_path / world_name
+        try:
+            async with get_world_lock(server_id):
+                result = await asyncio.to_thread(extract_archive_sync, temp_zip, world_path, prefix, job)
+        finally:
+            temp_zip.unlink(missing_ok=True)
+        forget_world_size(world_path)
+        return {"name": world_name, **result}
+    
+    return create_job('world-upload', server_id, work)
+
+@api_router.get("/servers/{server_id}/worlds/{world_name}/export")
+async def export_world(server_id: str, world_name: str, format: str = 'zip', level: Optional[int] = None,
+                       workers: Optional[int] = None, dimensions: Optional[str] = None,
+                       bbox: Optional[str] = None, bbox_units: str = 'block'):
+    """
+    Export a world as a streamed archive (zip, tar.gz, tar.xz or tar.zst).
+    dimensions (comma-separated ids) and bbox ("x1,z1,x2,z2" in block or region units)
+    crop the export to the selected area.
+    """
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    world_path = SERVERS_DIR / server_id / world_name
+    
+    if not world_path.is_dir() or world_name in ('.', '..'):
+        raise HTTPException(status_code=404, detail="World not found")
+    
+    if not dimensions and not bbox:
+        entries = iter_export_files(world_path, world_name)
+        return export_archive_response(entries, world_name, format, level, workers)
+
+    bounds = parse_crop_bounds(bbox, bbox_units) if bbox else None
+    selected = await asyncio.to_thread(select_export_dimensions, world_path, dimensions)
+    entries = iter_cropped_world_entries(world_path, selected, bounds)
+    return export_archive_response(entries, f'{world_name}-cropped', format, level, workers)
+
+@api_router.delete("/servers/{server_id}/worlds/{world_name}")
+async def delete_world(server_id: str, world_name: str):
+    """Delete a world"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    
+    world_path = SERVERS_DIR / server_id / world_name
+    
+    if not world_path.exists():
+        raise HTTPException(status_code=404, detail="World not found")
+    
+    shutil.rmtree(world_path)
+    forget_world_size(world_path)
+    
+    return {"message": "World deleted"}
+
+# ============== Snapshots ==============
+
+SNAPSHOT_CHECK_INTERVAL = 60
+SNAPSHOT_WORKERS = min(8, os.cpu_count() or 1)
+
+def get_snapshot_store(server_id: str) -> Path:
+    return SNAPSHOTS_DIR / server_id
+
+def put_snapshot_object(store: Path, data: bytes) -> tuple:
+    """Store a blob by content hash. Returns (digest, newly_written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = store / 'objects' / digest[:2] / digest
+    if path.exists():
+        return digest, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{digest}.{uuid.uuid4().hex[:8]}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return digest, True
+
+def read_snapshot_object(store: Path, digest: str) -> bytes:
+    with open(store / 'objects' / digest[:2] / digest, 'rb') as f:
+        return f.read()
+
+def load_snapshot_summaries(server_id: str) -> List[dict]:
+    """Snapshot summaries, oldest first"""
+    manifests_dir = get_snapshot_store(server_id) / 'manifests'
+    summaries = []
+    if manifests_dir.exists():
+        for summary_file in manifests_dir.glob('*.json'):
+            if summary_file.name.endswith('.files.json'):
+                continue
+            try:
+                with open(summary_file) as f:
+                    summaries.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+    return sorted(summaries, key=lambda m: m['created_at'])
+
+def load_snapshot_files(server_id: str, snapshot_id: str) -> Dict[str, dict]:
+    with open(get_snapshot_store(server_id) / 'manifests' / f'{snapshot_id}.files.json') as f:
+        return json.load(f)
+
+def get_server_worlds(server_id: str) -> List[str]:
+    server_path = SERVERS_DIR / server_id
+    return sorted(item.name for item in server_path.iterdir() if item.is_dir() and (item / 'level.dat').exists())
+
+def snapshot_file(store: Path, path: Path, previous: Optional[dict]) -> tuple:
+    """Store one world file. Region files are split so each chunk is deduplicated on its own."""
+    st = path.stat()
+    if previous and previous['size'] == st.st_size and previous['mtime_ns'] == st.st_mtime_ns:
+        return previous, 0, 0
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    new_bytes = 0
+    new_chunks = 0
+    if path.suffix == '.mca' and len(data) >= REGION_HEADER_SIZE:
+        chunks = []
+        for index, timestamp, payload in iter_region_chunks(data):
+            digest, is_new = put_snapshot_object(store, payload)
+            chunks.append([index, timestamp, digest])
+            if is_new:
+                new_bytes += len(payload)
+                new_chunks += 1
+        entry = {"type": "region", "chunks": chunks}
+    else:
+        digest, is_new = put_snapshot_object(store, data)
+        entry = {"type": "file", "hash": digest}
+        if is_new:
+            new_bytes += len(data)
+
+    entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+    return entry, new_bytes, new_chunks
+
+def create_snapshot_sync(server_id: str, worlds: List[str], kind: str, job: Optional[dict] = None) -> dict:
+    """Snapshot worlds into the content-addressed store (runs in a worker thread)"""
+    store = get_snapshot_store(server_id)
+    (store / 'manifests').mkdir(parents=True, exist_ok=True)
+    server_path = SERVERS_DIR / server_id
+
+    summaries = load_snapshot_summaries(server_id)
+    previous = load_snapshot_files(server_id, summaries[-1]['id']) if summaries else {}
+
+    world_files = []
+    for world in worlds:
+        for path, arcname in iter_export_files(server_path / world, world):
+            world_files.append((arcname, path))
+
+    files = {}
+    stats = {"files": len(world_files), "bytes_total": 0, "bytes_new": 0, "chunks_total": 0, "chunks_new": 0}
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS) as pool:
+        futures = {pool.submit(snapshot_file, store, path, previous.get(rel)): rel for rel, path in world_files}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            rel = futures[future]
+            try:
+                entry, new_bytes, new_chunks = future.result()
+            except FileNotFoundError:
+                continue
+            files[rel] = entry
+            stats['bytes_total'] += entry['size']
+            stats['bytes_new'] += new_bytes
+            stats['chunks_new'] += new_chunks
+            stats['chunks_total'] += len(entry.get('chunks', []))
+            if job:
+                update_job(job, done_count / max(len(futures), 1), f"Stored {done_count}/{len(futures)} files")
+
+    now = datetime.now(timezone.utc)
+    summary = {
+        "id": f"{now.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}",
+        "kind": kind,
+        "worlds": worlds,
+        "created_at": now.isoformat(),
+        "stats": stats
+    }
+    manifests_dir = store / 'manifests'
+    for name, content in ((f"{summary['id']}.files.json", files), (f"{summary['id']}.json", summary)):
+        tmp = manifests_dir / f'{name}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(content, f, separators=(',', ':'))
+        os.replace(tmp, manifests_dir / name)
+    return summary
+
+def restore_snapshot_file(store: Path, entry: dict, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if entry['type'] == 'region':
+        data = build_region((index, timestamp, read_snapshot_object(store, digest)) for index, timestamp, digest in entry['chunks'])
+    else:
+        data = read_snapshot_object(store, entry['hash'])
+    with open(target, 'wb') as f:
+        f.write(data)
+    # Matching mtimes let the next snapshot skip unchanged files
+    os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+def restore_snapshot_sync(server_id: str, snapshot_id: str, job: Optional[dict] = None) -> dict:
+    """Rebuild snapshot worlds in staging folders in parallel, then swap them in"""
+    store = get_snapshot_store(server_id)
+    server_path = SERVERS_DIR / server_id
+    summary = next((m for m in load_snapshot_summaries(server_id) if m['id'] == snapshot_id), None)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    files = load_snapshot_files(server_id, snapshot_id)
+
+    staging = {world: server_path / f'.{world}.restore' for world in summary['worlds']}
+    for path in staging.values():
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir()
+
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS) as pool:
+        futures = []
+        for rel, entry in files.items():
+            world, _, inner = rel.partition('/')
+            futures.append(pool.submit(restore_snapshot_file, store, entry, staging[world] / inner))
+        for done_count, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if job:
+                update_job(job, done_count / len(futures), f"Restored {done_count}/{len(futures)} files")
+
+    for world, staged in staging.items():
+        live = server_path / world
+        previous = server_path / f'.{world}.pre-restore'
+        if live.exists():
+            shutil.rmtree(previous, ignore_errors=True)
+            os.rename(live, previous)
+        os.rename(staged, live)
+        shutil.rmtree(previous, ignore_errors=True)
+        forget_world_size(live)
+
+    return {"snapshot_id": snapshot_id, "worlds": summary['worlds'], "files": len(files)}
+
+def select_retained_snapshots(summaries: List[dict], policy: dict) -> set:
+    """Ids to keep: the newest scheduled snapshot per hour/day/week bucket, plus every manual one"""
+    keep = {m['id'] for m in summaries if m['kind'] != 'scheduled'}
+    scheduled = sorted((m for m in summaries if m['kind'] == 'scheduled'), key=lambda m: m['created_at'], reverse=True)
+    if scheduled:
+        keep.add(scheduled[0]['id'])
+
+    for count, bucket_format in ((policy['hourly'], '%Y-%m-%d %H'), (policy['daily'], '%Y-%m-%d'), (policy['weekly'], '%G-W%V')):
+        buckets = set()
+        for summary in scheduled:
+            if len(buckets) >= count:
+                break
+            bucket = datetime.fromisoformat(summary['created_at']).strftime(bucket_format)
+            if bucket not in buckets:
+                buckets.add(bucket)
+                keep.add(summary['id'])
+    return keep
+
+def delete_snapshot_files(server_id: str, snapshot_id: str):
+    manifests_dir = get_snapshot_store(server_id) / 'manifests'
+    (manifests_dir / f'{snapshot_id}.json').unlink(missing_ok=True)
+    (manifests_dir / f'{snapshot_id}.files.json').unlink(missing_ok=True)
+
+def collect_snapshot_garbage(server_id: str) -> dict:
+    """Delete objects no remaining snapshot references"""
+    store = get_snapshot_store(server_id)
+    referenced = set()
+    for summary in load_snapshot_summaries(server_id):
+        for entry in load_snapshot_files(server_id, summary['id']).values():
+            if entry['type'] == 'region':
+                referenced.update(chunk[2] for chunk in entry['chunks'])
+            else:
+                referenced.add(entry['hash'])
+
+    removed = 0
+    freed = 0
+    objects_dir = store / 'objects'
+    if objects_dir.exists():
+        for object_file in objects_dir.glob('*/*'):
+            if object_file.name not in referenced:
+                freed += object_file.stat().st_size
+                object_file.unlink()
+                removed += 1
+    return {"objects_removed": removed, "bytes_freed": freed}
+
+def apply_snapshot_retention(server_id: str, policy: dict) -> dict:
+    summaries = load_snapshot_summaries(server_id)
+    keep = select_retained_snapshots(summaries, policy)
+    expired = [m['id'] for m in summaries if m['id'] not in keep]
+    for snapshot_id in expired:
+        delete_snapshot_files(server_id, snapshot_id)
+    result = collect_snapshot_garbage(server_id) if expired else {"objects_removed": 0, "bytes_freed": 0}
+    result['expired'] = expired
+    return result
+
+async def take_snapshot(server_id: str, worlds: List[str], kind: str, job: Optional[dict] = None) -> dict:
+    """Pause saving on a running server, snapshot its worlds and enforce retention"""
+    async with get_world_lock(server_id):
+        if job:
+            update_job(job, message="Flushing world to disk")
+        async with world_saves_paused(server_id):
+            summary = await asyncio.to_thread(create_snapshot_sync, server_id, worlds, kind, job)
+
+        if kind == 'scheduled':
+            config = get_server_config(server_id) or {}
+            policy = SnapshotPolicy(**config.get('snapshots', {})).model_dump()
+            summary['retention'] = await asyncio.to_thread(apply_snapshot_retention, server_id, policy)
+        return summary
+
+async def snapshot_loop():
+    """Take scheduled snapshots of running servers"""
+    last_run: Dict[str, float] = {}
+    while True:
+        await asyncio.sleep(SNAPSHOT_CHECK_INTERVAL)
+        for server_id in list(running_servers):
+            config = get_server_config(server_id)
+            if not config:
+                continue
+            policy = SnapshotPolicy(**config.get('snapshots', {}))
+            if policy.interval_minutes <= 0 or server_id not in server_ready_at:
+                continue
+
+            if server_id not in last_run:
+                scheduled = [m for m in load_snapshot_summaries(server_id) if m['kind'] == 'scheduled']
+                last_run[server_id] = datetime.fromisoformat(scheduled[-1]['created_at']).timestamp() if scheduled else 0
+            if time.time() - last_run[server_id] < policy.interval_minutes * 60:
+                continue
+
+            last_run[server_id] = time.time()
+            worlds = get_server_worlds(server_id)
+            if worlds and not get_world_lock(server_id).locked():
+                create_job('snapshot', server_id, lambda job, sid=server_id, w=worlds: take_snapshot(sid, w, 'scheduled', job))
+
+@api_router.get("/servers/{server_id}/snapshots")
+async def list_snapshots(server_id: str):
+    """List world snapshots, newest first"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    summaries = await asyncio.to_thread(load_snapshot_summaries, server_id)
+    return {"snapshots": list(reversed(summaries))}
+
+@api_router.post("/servers/{server_id}/snapshots")
+async def create_snapshot(server_id: str, data: Optional[SnapshotCreate] = None):
+    """Take a snapshot in the background"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    available = get_server_worlds(server_id)
+    worlds = data.worlds if data and data.worlds else available
+    unknown = [w for w in worlds if w not in available]
+    if unknown or not worlds:
+        raise HTTPException(status_code=404, detail=f"World not found: {', '.join(unknown) or 'none'}")
+
+    return create_job('snapshot', server_id, lambda job: take_snapshot(server_id, worlds, 'manual', job))
+
+@api_router.post("/servers/{server_id}/snapshots/{snapshot_id}/restore")
+async def restore_snapshot(server_id: str, snapshot_id: str):
+    """Restore a snapshot's worlds (server must be stopped)"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if server_id in running_servers:
+        raise HTTPException(status_code=400, detail="Stop the server before restoring a snapshot")
+
+    async def work(job):
+        async with get_world_lock(server_id):
+            return await asyncio.to_thread(restore_snapshot_sync, server_id, snapshot_id, job)
+
+    return create_job('snapshot-restore', server_id, work)
+
+@api_router.delete("/servers/{server_id}/snapshots/{snapshot_id}")
+async def delete_snapshot(server_id: str, snapshot_id: str):
+    """Delete a snapshot and garbage-collect objects only it used"""
+    if not any(m['id'] == snapshot_id for m in await asyncio.to_thread(load_snapshot_summaries, server_id)):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+    async with get_world_lock(server_id):
+        await asyncio.to_thread(delete_snapshot_files, server_id, snapshot_id)
+        result = await asyncio.to_thread(collect_snapshot_garbage, server_id)
+
+    return {"message": "Snapshot deleted", **result}
+
+@api_router.get("/servers/{server_id}/snapshot-policy")
+async def get_snapshot_policy(server_id: str):
+    """Get the snapshot schedule and retention policy"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    return SnapshotPolicy(**config.get('snapshots', {})).model_dump()
+
+@api_router.put("/servers/{server_id}/snapshot-policy")
+async def update_snapshot_policy(server_id: str, policy: SnapshotPolicy):
+    """Update the snapshot schedule and retention policy"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if min(policy.interval_minutes, policy.hourly, policy.daily, policy.weekly) < 0:
+        raise HTTPException(status_code=400, detail="Policy values cannot be negative")
+
+    config['snapshots'] = policy.model_dump()
+    save_server_config(server_id, config)
+    return {"message": "Snapshot policy updated", "policy": config['snapshots']}
+
+# ============== Entity Hotspots ==============
+
+entity_scan_cache: Dict[str, tuple] = {}
+
+def iter_entity_types(entities: list):
+    for entity in entities:
+        if isinstance(entity, dict):
+            if 'id' in entity:
+                yield entity['id']
+            yield from iter_entity_types(entity.get('Passengers', []))
+
+def scan_entity_region(path: str) -> dict:
+    """
+    Per-chunk counts by type for one entities/ or poi/ region file (runs in the process pool).
+    Returns parallel arrays: chunk index, local type id and count, plus the local type names.
+    """
+    is_poi = Path(path).parent.name == 'poi'
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    names: Dict[str, int] = {}
+    chunk_ids, type_ids = [], []
+    for index, _, payload in iter_region_chunks(data):
+        if payload[0] & 0x80:
+            continue
+        try:
+            nbt = parse_nbt(decompress_chunk(payload))
+        except (ValueError, OSError, EOFError, IndexError, struct.error, zlib.error):
+            continue
+        if is_poi:
+            sections = nbt.get('Sections', {})
+            types = (r.get('type', 'unknown') for section in sections.values() for r in section.get('Records', []))
+        else:
+            types = iter_entity_types(nbt.get('Entities', []))
+        for type_name in types:
+            chunk_ids.append(index)
+            type_ids.append(names.setdefault(type_name, len(names)))
+
+    width = max(len(names), 1)
+    keys, counts = np.unique(np.array(chunk_ids, dtype=np.int64) * width + np.array(type_ids, dtype=np.int64), return_counts=True)
+    return {
+        "types": list(names),
+        "chunk": (keys // width).astype(np.int16),
+        "type": (keys % width).astype(np.int32),
+        "count": counts.astype(np.int32)
+    }
+
+def scan_entity_batch(paths: List[str]) -> List[Optional[dict]]:
+    results = []
+    for path in paths:
+        try:
+            results.append(scan_entity_region(path))
+        except OSError:
+            results.append(None)
+    return results
+
+def summarize_hotspots(files: List[tuple], scans: Dict[str, dict], top: int) -> dict:
+    """Aggregate per-file scans into top chunks, a per-region heatmap and per-type totals"""
+    type_names: Dict[str, int] = {}
+    dimension_names: Dict[str, int] = {}
+    columns = {name: [] for name in ('dim', 'poi', 'cx', 'cz', 'type', 'count')}
+    for dimension, path in files:
+        scan = scans.get(str(path))
+        coords = region_coords(path)
+        if not scan or coords is None or not len(scan['count']):
+            continue
+        lookup = np.array([type_names.setdefault(name, len(type_names)) for name in scan['types']], dtype=np.int32)
+        size = len(scan['count'])
+        columns['dim'].append(np.full(size, dimension_names.setdefault(dimension, len(dimension_names)), dtype=np.int32))
+        columns['poi'].append(np.full(size, path.parent.name == 'poi', dtype=bool))
+        columns['cx'].append(coords[0] * 32 + scan['chunk'].astype(np.int32) % 32)
+        columns['cz'].append(coords[1] * 32 + scan['chunk'].astype(np.int32) // 32)
+        columns['type'].append(lookup[scan['type']])
+        columns['count'].append(scan['count'].astype(np.int64))
+
+    result = {"hotspots": [], "regions": [], "entity_types": {}, "poi_types": {}}
+    if not columns['count']:
+        return result
+    dim, poi, cx, cz, types, count = (np.concatenate(columns[name]) for name in ('dim', 'poi', 'cx', 'cz', 'type', 'count'))
+    dimensions = list(dimension_names)
+    names = np.array(list(type_names), dtype=object)
+
+    def totals(keys: np.ndarray) -> tuple:
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        entities = np.bincount(inverse, weights=np.where(poi, 0, count)).astype(np.int64)
+        pois = np.bincount(inverse, weights=np.where(poi, count, 0)).astype(np.int64)
+        return unique, inverse, entities, pois
+
+    chunks, inverse, entities, pois = totals(np.stack([dim, cx, cz], axis=1))
+    order = np.argsort(-(entities + pois), kind='stable')[:top]
+    for rank in order:
+        rows = inverse == rank
+        entity_rows = rows & ~poi
+        by_type = np.bincount(types[entity_rows], weights=count[entity_rows], minlength=len(names))
+        top_types = np.argsort(-by_type)[:5]
+        poi_rows = rows & poi
+        poi_by_type = np.bincount(types[poi_rows], weights=count[poi_rows], minlength=len(names))
+        d, x, z = chunks[rank]
+        result['hotspots'].append({
+            "dimension": dimensions[d],
+            "chunk_x": int(x), "chunk_z": int(z),
+            "block_x": int(x) * 16 + 8, "block_z": int(z) * 16 + 8,
+            "entities": int(entities[rank]),
+            "poi": int(pois[rank]),
+            "top_entities": {names[i]: int(by_type[i]) for i in top_types if by_type[i] > 0},
+            "top_poi": {names[i]: int(poi_by_type[i]) for i in np.argsort(-poi_by_type)[:5] if poi_by_type[i] > 0}
+        })
+
+    regions, region_inverse, region_entities, region_pois = totals(np.stack([dim, cx >> 5, cz >> 5], axis=1))
+    chunk_region = np.unique(np.stack([chunks[:, 0], chunks[:, 1] >> 5, chunks[:, 2] >> 5], axis=1), axis=0, return_inverse=True)[1].ravel()
+    densest = np.zeros(len(regions), dtype=np.int64)
+    np.maximum.at(densest, chunk_region, entities)
+    for i in np.argsort(-region_entities, kind='stable'):
+        d, x, z = regions[i]
+        result['regions'].append({
+            "dimension": dimensions[d], "x": int(x), "z": int(z),
+            "entities": int(region_entities[i]), "poi": int(region_pois[i]), "max_chunk_entities": int(densest[i])
+        })
+
+    for key, mask in (('entity_types', ~poi), ('poi_types', poi)):
+        by_type = np.bincount(types[mask], weights=count[mask], minlength=len(names))
+        result[key] = {names[i]: int(by_type[i]) for i in np.argsort(-by_type) if by_type[i] > 0}
+    return result
+
+@api_router.get("/servers/{server_id}/worlds/{world_name}/hotspots")
+async def get_world_hotspots(server_id: str, world_name: str, top: int = 20, dimension: Optional[str] = None):
+    """Chunks with the most entities and POIs, plus a per-region heatmap"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if world_name not in get_server_worlds(server_id):
+        raise HTTPException(status_code=404, detail="World not found")
+
+    started = time.monotonic()
+    dimensions = await asyncio.to_thread(get_world_dimensions, SERVERS_DIR / server_id / world_name)
+    if dimension:
+        dimensions = {d: p for d, p in dimensions.items() if d == dimension}
+    files = await asyncio.to_thread(list_region_files, dimensions, ('entities', 'poi'))
+    scans = await map_cached_files([path for _, path in files], entity_scan_cache, scan_entity_batch, 8)
+
+    result = await asyncio.to_thread(summarize_hotspots, files, scans, max(top, 1))
+    result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+# ============== World Maintenance ==============
+
+def list_region_files(dimensions: Dict[str, Path], folders: tuple) -> List[tuple]:
+    """(dimension, path) for every region file in the given folders of each dimension"""
+    return [
+        (dimension, path)
+        for dimension, dimension_path in dimensions.items()
+        for folder in folders
+        for path in sorted((dimension_path / folder).glob('r.*.*.mca'))
+    ]
+
+def rewrite_region_file(path: Path, chunks: list, dry_run: bool) -> int:
+    """Write a compact region file (deleting it when empty); returns the new size"""
+    if not chunks:
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        return 0
+    data = build_region(chunks)
+    if not dry_run:
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return len(data)
+
+def trim_region_file(region_path: str, min_inhabited: int, protected: List[tuple], dry_run: bool) -> dict:
+    """
+    Remove chunks below the InhabitedTime threshold from one region file and the matching
+    entities/poi files (runs in the process pool). protected holds inclusive chunk rectangles.
+    """
+    region_path = Path(region_path)
+    result = {"chunks": 0, "removed": 0, "unreadable": 0, "unrepaired": 0, "bytes_before": 0, "bytes_after": 0}
+    coords = region_coords(region_path)
+    if coords is None:
+        return result
+
+    with open(region_path, 'rb') as f:
+        data = f.read()
+    chunks = list(iter_region_chunks(data))
+    kept, removed = [], set()
+    for index, timestamp, payload in chunks:
+        result['chunks'] += 1
+        cx, cz = coords[0] * 32 + index % 32, coords[1] * 32 + index // 32
+        if payload[0] & 0x80 or any(x1 <= cx <= x2 and z1 <= cz <= z2 for x1, z1, x2, z2 in protected):
+            kept.append((index, timestamp, payload))
+            continue
+        try:
+            inhabited = chunk_inhabited_time(decompress_chunk(payload))
+        except (ValueError, OSError, EOFError, IndexError, struct.error, zlib.error):
+            inhabited = None
+        if inhabited is None:
+            result['unreadable'] += 1
+            kept.append((index, timestamp, payload))
+        elif inhabited < min_inhabited:
+            removed.add(index)
+        else:
+            kept.append((index, timestamp, payload))
+
+    if not removed:
+        return result
+
+    siblings = []
+    dimension_path = region_path.parent.parent
+    for folder in ('entities', 'poi'):
+        sibling = dimension_path / folder / region_path.name
+        if sibling.exists():
+            with open(sibling, 'rb') as f:
+                sibling_data = f.read()
+            siblings.append((sibling, sibling_data, list(iter_region_chunks(sibling_data))))
+    # Rebuilding would silently drop header entries iter_region_chunks can't read, so leave
+    # the region and its entities/poi files alone (compact with drop_corrupt can clear them)
+    unreadable_entries = unreadable_region_entries(data, chunks) + sum(
+        unreadable_region_entries(sibling_data, sibling_chunks) for _, sibling_data, sibling_chunks in siblings)
+    if unreadable_entries:
+        result['unreadable'] += unreadable_entries
+        result['unrepaired'] = 1
+        return result
+
+    result['removed'] = len(removed)
+    result['bytes_before'] += len(data)
+    result['bytes_after'] += rewrite_region_file(region_path, kept, dry_run)
+
+    for sibling, sibling_data, sibling_chunks in siblings:
+        remaining = [chunk for chunk in sibling_chunks if chunk[0] not in removed]
+        if len(remaining) == len(sibling_chunks):
+            continue
+        result['bytes_before'] += len(sibling_data)
+        result['bytes_after'] += rewrite_region_file(sibling, remaining, dry_run)
+    return result
+
+def get_trim_protection(world_path: Path, server_id: str, options: WorldTrim) -> Dict[str, List[tuple]]:
+    """Protected chunk rectangles per dimension from spawn and named areas"""
+    protected: Dict[str, List[tuple]] = {}
+    spawn = get_world_spawn(world_path)
+    if spawn and options.spawn_radius > 0:
+        x, z = spawn
+        r = options.spawn_radius
+        protected.setdefault('minecraft:overworld', []).append(((x - r) >> 4, (z - r) >> 4, (x + r) >> 4, (z + r) >> 4))
+
+    config = get_server_config(server_id) or {}
+    areas = [ProtectedArea(**a) for a in config.get('protected_areas', [])] + options.protected_areas
+    for area in areas:
+        protected.setdefault(area.dimension, []).append((
+            min(area.x1, area.x2) >> 4, min(area.z1, area.z2) >> 4,
+            max(area.x1, area.x2) >> 4, max(area.z1, area.z2) >> 4
+        ))
+    return protected
+
+async def trim_world(server_id: str, world_name: str, options: WorldTrim, job: dict) -> dict:
+    world_path = SERVERS_DIR / server_id / world_name
+    dimensions = await asyncio.to_thread(get_world_dimensions, world_path)
+    if options.dimensions:
+        dimensions = {d: p for d, p in dimensions.items() if d in options.dimensions}
+    protected = await asyncio.to_thread(get_trim_protection, world_path, server_id, options)
+
+    regions = await asyncio.to_thread(list_region_files, dimensions, ('region',))
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    futures = [
+        loop.run_in_executor(pool, trim_region_file, str(f), options.min_inhabited_ticks, protected.get(d, []), options.dry_run)
+        for d, f in regions
+    ]
+
+    totals = {"regions": len(regions), "chunks": 0, "removed": 0, "unreadable": 0, "unrepaired": 0,
+              "bytes_before": 0, "bytes_after": 0}
+    for done_count, future in enumerate(asyncio.as_completed(futures), 1):
+        for key, value in (await future).items():
+            totals[key] += value
+        update_job(job, done_count / len(futures), f"Trimmed {done_count}/{len(futures)} region files")
+
+    totals['bytes_reclaimed'] = totals['bytes_before'] - totals['bytes_after']
+    totals['dry_run'] = options.dry_run
+    return totals
+
+def compact_region_file(path: str, compression: Optional[int], drop_corrupt: bool, dry_run: bool) -> dict:
+    """
+    Validate one region file, optionally recompress its chunks and rewrite it without
+    free sectors (runs in the process pool). Decode times are measured before and after.
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    result = {
+        "files": 1, "chunks": 0, "invalid_entries": 0, "corrupt_chunks": 0, "recompressed": 0,
+        "rewritten": 0, "unrepaired": 0, "bytes_before": len(data), "bytes_after": len(data),
+        "decode_ms_before": 0.0, "decode_ms_after": 0.0
+    }
+    if len(data) < REGION_HEADER_SIZE:
+        result['invalid_entries'] += 1 if data else 0
+        return result
+
+    # Header validation: offsets inside the file, sane lengths, no overlapping sector runs
+    file_sectors = -(-len(data) // REGION_SECTOR_SIZE)
+    owners = [False] * file_sectors
+    for location in struct.unpack_from('>1024I', data, 0):
+        if location == 0:
+            continue
+        sector, count = location >> 8, location & 0xFF
+        if sector < 2 or count == 0 or sector + count > file_sectors:
+            result['invalid_entries'] += 1
+            continue
+        start = sector * REGION_SECTOR_SIZE
+        length = struct.unpack_from('>I', data, start)[0] if start + 4 <= len(data) else 0
+        if length == 0 or length + 4 > count * REGION_SECTOR_SIZE or start + 4 + length > len(data):
+            result['invalid_entries'] += 1
+        elif any(owners[sector:sector + count]):
+            result['invalid_entries'] += 1
+        owners[sector:sector + count] = [True] * count
+
+    chunks = list(iter_region_chunks(data))
+    result['chunks'] = len(chunks)
+    if unreadable_region_entries(data, chunks) and not drop_corrupt:
+        # Rebuilding would silently lose the entries iter_region_chunks can't read
+        result['unrepaired'] = 1
+        return result
+
+    kept = []
+    for index, timestamp, payload in chunks:
+        if payload[0] & 0x80:  # stored externally in a .mcc file
+            kept.append((index, timestamp, payload))
+            continue
+        started = time.perf_counter()
+        try:
+            nbt = decompress_chunk(payload)
+        except (ValueError, OSError, EOFError, zlib.error):
+            result['corrupt_chunks'] += 1
+            if not drop_corrupt:
+                kept.append((index, timestamp, payload))
+            continue
+        decode_ms = (time.perf_counter() - started) * 1000
+        result['decode_ms_before'] += decode_ms
+
+        if compression is not None and payload[0] != compression:
+            converted = compress_chunk(nbt, compression)
+            # Chunks over 255 sectors would need an external file; leave those as they are
+            if len(converted) + 4 <= 255 * REGION_SECTOR_SIZE:
+                started = time.perf_counter()
+                decompress_chunk(converted)
+                decode_ms = (time.perf_counter() - started) * 1000
+                payload = converted
+                result['recompressed'] += 1
+        result['decode_ms_after'] += decode_ms
+        kept.append((index, timestamp, payload))
 
-# ============== Plugins API (For Paper/Spigot) ==============
+    rebuilt = build_region(kept) if kept else b''
+    if rebuilt != data:
+        result['rewritten'] = 1
+        result['bytes_after'] = rewrite_region_file(path, kept, dry_run)
+    return result
 
-@api_router.get("/plugins/search")
-async def search_plugins(query: str, limit: int = 20):
-    """Search plugins on Modrinth (plugin type)"""
-    facets = [
-        ['project_type:plugin'],
-        ['categories:paper', 'categories:spigot', 'categories:bukkit']
+async def compact_world(server_id: str, world_name: str, options: WorldCompact, job: dict) -> dict:
+    world_path = SERVERS_DIR / server_id / world_name
+    compression = None
+    if options.recompress:
+        setting = get_server_properties(server_id).get('region-file-compression', 'deflate')
+        compression = REGION_COMPRESSION_IDS.get(setting)
+        if compression is None:
+            raise HTTPException(status_code=400, detail=f"Unknown region-file-compression: {setting}")
+        if compression == 4 and (lz4 is None or xxhash is None):
+            raise HTTPException(status_code=400, detail="lz4 compression requires the lz4 and xxhash packages")
+
+    dimensions = await asyncio.to_thread(get_world_dimensions, world_path)
+    if options.dimensions:
+        dimensions = {d: p for d, p in dimensions.items() if d in options.dimensions}
+    files = await asyncio.to_thread(list_region_files, dimensions, ('region', 'entities', 'poi'))
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    futures = [
+        loop.run_in_executor(pool, compact_region_file, str(path), compression, options.drop_corrupt, options.dry_run)
+        for _, path in files
     ]
-    
-    params = {
-        'query': query,
-        'limit': limit,
-        'facets': json.dumps(facets)
+
+    totals = {
+        "files": 0, "chunks": 0, "invalid_entries": 0, "corrupt_chunks": 0, "recompressed": 0,
+        "rewritten": 0, "unrepaired": 0, "bytes_before": 0, "bytes_after": 0,
+        "decode_ms_before": 0.0, "decode_ms_after": 0.0
     }
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get('https://api.modrinth.com/v2/search', params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                return {"plugins": data.get('hits', [])}
-    
-    return {"plugins": []}
+    for done_count, future in enumerate(asyncio.as_completed(futures), 1):
+        for key, value in (await future).items():
+            totals[key] += value
+        update_job(job, done_count / len(futures), f"Checked {done_count}/{len(futures)} region files")
 
-@api_router.post("/servers/{server_id}/plugins")
-async def install_plugin(server_id: str, plugin_id: str, version_id: str):
-    """Install a plugin to the server"""
-    config = get_server_config(server_id)
-    if not config:
-        raise HTTPException(status_code=404, detail="Server not found")
-    
-    if config['server_type'] not in ['paper', 'spigot', 'bukkit']:
-        raise HTTPException(status_code=400, detail="Plugins only supported on Paper/Spigot servers")
-    
-    server_path = SERVERS_DIR / server_id
-    plugins_path = server_path / 'plugins'
-    plugins_path.mkdir(exist_ok=True)
-    
-    # Get version info
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f'https://api.modrinth.com/v2/version/{version_id}') as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=404, detail="Version not found")
-            version_data = await resp.json()
-        
-        files = version_data.get('files', [])
-        primary_file = next((f for f in files if f.get('primary')), files[0] if files else None)
-        
-        if not primary_file:
-            raise HTTPException(status_code=404, detail="No downloadable file found")
-        
-        download_url = primary_file['url']
-        filename = primary_file['filename']
-        
-        async with session.get(download_url) as resp:
-            if resp.status == 200:
-                file_path = plugins_path / filename
-                async with aiofiles.open(file_path, 'wb') as f:
-                    await f.write(await resp.read())
-    
-    return {"message": "Plugin installed", "filename": filename}
+    totals['decode_ms_before'] = round(totals['decode_ms_before'], 1)
+    totals['decode_ms_after'] = round(totals['decode_ms_after'], 1)
+    totals['bytes_reclaimed'] = totals['bytes_before'] - totals['bytes_after']
+    totals['compression'] = REGION_COMPRESSION_NAMES.get(compression) if compression else None
+    totals['dry_run'] = options.dry_run
+    return totals
 
-@api_router.get("/servers/{server_id}/plugins")
-async def list_installed_plugins(server_id: str):
-    """List installed plugins"""
+@api_router.post("/servers/{server_id}/worlds/{world_name}/compact")
+async def compact_world_regions(server_id: str, world_name: str, options: Optional[WorldCompact] = None):
+    """Validate and defragment region files, optionally recompressing (server must be stopped)"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    server_path = SERVERS_DIR / server_id
-    plugins_path = server_path / 'plugins'
-    
-    plugins = []
-    if plugins_path.exists():
-        for plugin_file in plugins_path.iterdir():
-            if plugin_file.suffix == '.jar':
-                plugins.append({
-                    "filename": plugin_file.name,
-                    "size": plugin_file.stat().st_size
-                })
-    
-    return {"plugins": plugins}
+    if world_name not in get_server_worlds(server_id):
+        raise HTTPException(status_code=404, detail="World not found")
+    if server_id in running_servers:
+        raise HTTPException(status_code=400, detail="Stop the server before compacting the world")
+    options = options or WorldCompact()
 
-# ============== World Management ==============
+    async def work(job):
+        async with get_world_lock(server_id):
+            return await compact_world(server_id, world_name, options, job)
 
-@api_router.get("/servers/{server_id}/worlds")
-async def list_worlds(server_id: str):
-    """List worlds in server"""
-    config = get_server_config(server_id)
-    if not config:
-        raise HTTPException(status_code=404, detail="Server not found")
-    
-    server_path = SERVERS_DIR / server_id
-    worlds = []
-    
-    # Check for world directories
-    for item in server_path.iterdir():
-        if item.is_dir():
-            level_dat = item / 'level.dat'
-            if level_dat.exists():
-                worlds.append({
-                    "name": item.name,
-                    "size": sum(f.stat().st_size for f in item.rglob('*') if f.is_file())
-                })
-    
-    return {"worlds": worlds}
+    return create_job('world-compact', server_id, work)
 
-@api_router.post("/servers/{server_id}/worlds/upload")
-async def upload_world(server_id: str, file: UploadFile = File(...)):
-    """Upload a world"""
+@api_router.get("/servers/{server_id}/protected-areas")
+async def get_protected_areas(server_id: str):
+    """Get named areas that world maintenance never removes"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    server_path = SERVERS_DIR / server_id
-    temp_zip = server_path / 'temp_world.zip'
-    
-    # Save uploaded file
-    async with aiofiles.open(temp_zip, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    
-    # Extract
-    try:
-        with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-            # Find the world folder name
-            names = zip_ref.namelist()
-            root_dir = names[0].split('/')[0] if names else 'world'
-            zip_ref.extractall(server_path)
-    finally:
-        temp_zip.unlink(missing_ok=True)
-    
-    return {"message": "World uploaded", "name": root_dir}
+    return {"areas": config.get('protected_areas', [])}
 
-@api_router.get("/servers/{server_id}/worlds/{world_name}/export")
-async def export_world(server_id: str, world_name: str):
-    """Export a world as ZIP"""
+@api_router.put("/servers/{server_id}/protected-areas")
+async def update_protected_areas(server_id: str, areas: List[ProtectedArea]):
+    """Replace the server's protected areas"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    world_path = SERVERS_DIR / server_id / world_name
-    
-    if not world_path.exists():
-        raise HTTPException(status_code=404, detail="World not found")
-    
-    # Create ZIP
-    zip_path = SERVERS_DIR / server_id / f'{world_name}.zip'
-    
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in world_path.rglob('*'):
-            if file_path.is_file():
-                arcname = f"{world_name}/{file_path.relative_to(world_path)}"
-                zipf.write(file_path, arcname)
-    
-    return FileResponse(
-        zip_path,
-        media_type='application/zip',
-        filename=f'{world_name}.zip'
-    )
+    config['protected_areas'] = [area.model_dump() for area in areas]
+    save_server_config(server_id, config)
+    return {"message": "Protected areas updated", "areas": config['protected_areas']}
 
-@api_router.delete("/servers/{server_id}/worlds/{world_name}")
-async def delete_world(server_id: str, world_name: str):
-    """Delete a world"""
+@api_router.post("/servers/{server_id}/worlds/{world_name}/trim")
+async def trim_world_chunks(server_id: str, world_name: str, options: WorldTrim):
+    """Delete rarely visited chunks (server must be stopped)"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    world_path = SERVERS_DIR / server_id / world_name
-    
-    if not world_path.exists():
+    if world_name not in get_server_worlds(server_id):
         raise HTTPException(status_code=404, detail="World not found")
-    
-    shutil.rmtree(world_path)
-    
-    return {"message": "World deleted"}
+    if server_id in running_servers:
+        raise HTTPException(status_code=400, detail="Stop the server before trimming the world")
+
+    async def work(job):
+        async with get_world_lock(server_id):
+            return await trim_world(server_id, world_name, options, job)
+
+    return create_job('world-trim', server_id, work)
+
+# ============== Cropped Exports ==============
+
+CROP_REGION_FOLDERS = ('region', 'entities', 'poi')
+CROP_WORLD_FILES = ('level.dat',)
+CROP_WORLD_DIRS = ('datapacks',)
+LEGACY_DIMENSION_IDS = {0: 'minecraft:overworld', -1: 'minecraft:the_nether', 1: 'minecraft:the_end'}
+
+def parse_crop_bounds(bbox: str, units: str) -> tuple:
+    """Inclusive chunk rectangle (cx1, cz1, cx2, cz2) from an "x1,z1,x2,z2" box in block or region coordinates"""
+    try:
+        x1, z1, x2, z2 = (int(v) for v in bbox.split(','))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be four integers: x1,z1,x2,z2")
+    x1, x2 = sorted((x1, x2))
+    z1, z2 = sorted((z1, z2))
+    if units == 'block':
+        return x1 >> 4, z1 >> 4, x2 >> 4, z2 >> 4
+    if units == 'region':
+        return x1 * 32, z1 * 32, x2 * 32 + 31, z2 * 32 + 31
+    raise HTTPException(status_code=400, detail="bbox_units must be 'block' or 'region'")
+
+def select_export_dimensions(world_path: Path, requested: Optional[str]) -> Dict[str, Path]:
+    """Dimension folders to export; ids may omit the minecraft: namespace"""
+    dimensions = get_world_dimensions(world_path)
+    if not requested:
+        return dimensions
+    selected = {}
+    for name in filter(None, (n.strip() for n in requested.split(','))):
+        dimension = name if ':' in name else f'minecraft:{name}'
+        if dimension not in dimensions:
+            raise HTTPException(status_code=400, detail=f"Unknown dimension: {name}")
+        selected[dimension] = dimensions[dimension]
+    return selected
+
+def player_export_dimension(player: dict) -> Optional[str]:
+    dimension = player.get('Dimension')
+    return LEGACY_DIMENSION_IDS.get(dimension) if isinstance(dimension, int) else dimension
+
+def iter_cropped_world_entries(world_path: Path, dimensions: Dict[str, Path], bounds: Optional[tuple]):
+    """
+    Yield (source, arcname) export entries for the selected dimensions, limited to the chunk
+    rectangle when bounds is given. Region files inside the rectangle are streamed as-is, region
+    files crossing its edge are rebuilt with only the chunks inside, and the rest are never opened.
+    Player files are included for players standing in the exported area.
+    """
+    base = world_path.parent
+
+    def arcname(path: Path) -> str:
+        # Bukkit sibling worlds (world_nether/DIM-1) keep their own top-level folder
+        return path.relative_to(base).as_posix()
+
+    for name in CROP_WORLD_FILES:
+        if (world_path / name).is_file():
+            yield world_path / name, arcname(world_path / name)
+    for name in CROP_WORLD_DIRS:
+        if (world_path / name).is_dir():
+            yield from iter_export_files(world_path / name, arcname(world_path / name))
+
+    if bounds:
+        cx1, cz1, cx2, cz2 = bounds
+        rx1, rz1, rx2, rz2 = cx1 >> 5, cz1 >> 5, cx2 >> 5, cz2 >> 5
+    for dimension, path in list_region_files(dimensions, CROP_REGION_FOLDERS):
+        if not bounds:
+            yield path, arcname(path)
+            continue
+        coords = region_coords(path)
+        if not coords or not (rx1 <= coords[0] <= rx2 and rz1 <= coords[1] <= rz2):
+            continue
+        inside = cx1 <= coords[0] * 32 and coords[0] * 32 + 31 <= cx2 and cz1 <= coords[1] * 32 and coords[1] * 32 + 31 <= cz2
+        yield (path if inside else CroppedRegion(path, bounds)), arcname(path)
+
+    for player_file in sorted((world_path / 'playerdata').glob('*.dat')):
+        try:
+            player = read_nbt_file(player_file)
+            x, _, z = player['Pos']
+            # floor, not int(): x=-0.5 lies in chunk -1
+            chunk_x, chunk_z = math.floor(x) >> 4, math.floor(z) >> 4
+        except (OSError, ValueError, KeyError, IndexError, TypeError, OverflowError, EOFError,
+                struct.error, zlib.error) as e:
+            logger.warning(f"Skipping unreadable player file {player_file}: {e}")
+            continue
+        if player_export_dimension(player) not in dimensions:
+            continue
+        if bounds and not (cx1 <= chunk_x <= cx2 and cz1 <= chunk_z <= cz2):
+            continue
+        yield player_file, arcname(player_file)
+        for folder in ('advancements', 'stats'):
+            extra = world_path / folder / f'{player_file.stem}.json'
+            if extra.is_file():
+                yield extra, arcname(extra)
 
 # ============== Export/Import Server ==============
 
 @api_router.get("/servers/{server_id}/export")
-async def export_server(server_id: str):
-    """Export entire server as ZIP"""
+async def export_server(server_id: str, format: str = 'zip', level: Optional[int] = None,
+                        workers: Optional[int] = None):
+    """Export entire server as a streamed archive (zip, tar.gz, tar.xz or tar.zst)"""
     config = get_server_config(server_id)
     if not config:
         raise HTTPException(status_code=404, detail="Server not found")
     
     server_path = SERVERS_DIR / server_id
     export_name = f"{config['name'].replace(' ', '_')}_{server_id}"
-    zip_path = DATA_DIR / f'{export_name}.zip'
-    
-    # Files/folders to exclude
-    exclude_patterns = {'.lock', 'session.lock', 'logs', 'crash-reports', '.cache'}
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in server_path.rglob('*'):
-            if file_path.is_file():
-                # Check exclusions
-                if any(ex in str(file_path) for ex in exclude_patterns):
-                    continue
-                
-                arcname = f"{export_name}/{file_path.relative_to(server_path)}"
-                zipf.write(file_path, arcname)
-    
-    return FileResponse(
-        zip_path,
-        media_type='application/zip',
-        filename=f'{export_name}.zip',
-        background=BackgroundTasks()
-    )
+    entries = iter_export_files(server_path, export_name)
+    return export_archive_response(entries, export_name, format, level, workers)
 
 @api_router.post("/servers/import")
 async def import_server(file: UploadFile = File(...)):
-    """Import a server from ZIP"""
+    """Import a server from ZIP in one request (see /uploads for resumable uploads)"""
+    session = create_upload_session('server', file.filename or 'server.zip', None)
+    try:
+        await save_upload(file, upload_part_path(session['id']))
+    except BaseException:
+        discard_upload_session(session['id'])
+        raise
+    return await finalize_upload(session['id'])
+
+async def start_server_import(temp_zip: Path) -> dict:
+    """Validate an uploaded server ZIP and import it in a background job"""
     server_id = str(uuid.uuid4())[:8]
-    server_path = SERVERS_DIR / server_id
-    server_path.mkdir(exist_ok=True)
-    
-    temp_zip = server_path / 'import.zip'
-    
-    # Save uploaded file
-    async with aiofiles.open(temp_zip, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    
-    # Extract
     try:
-        with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-            # Extract to temp dir first
-            temp_extract = server_path / 'temp_extract'
-            zip_ref.extractall(temp_extract)
-            
-            # Move contents from nested folder if exists
-            items = list(temp_extract.iterdir())
-            if len(items) == 1 and items[0].is_dir():
-                for item in items[0].iterdir():
-                    shutil.move(str(item), str(server_path))
-                shutil.rmtree(temp_extract)
-            else:
-                for item in items:
-                    shutil.move(str(item), str(server_path))
-                temp_extract.rmdir()
-    finally:
+        # Exports wrap everything in one folder; strip it
+        prefix = archive_root_prefix(await asyncio.to_thread(read_archive_names, temp_zip))
+    except BaseException:
         temp_zip.unlink(missing_ok=True)
+        raise
+    
+    async def work(job):
+        # Extract outside SERVERS_DIR so the half-imported server is never listed
+        staging = UPLOADS_DIR / f'server-{server_id}'
+        try:
+            result = await asyncio.to_thread(extract_archive_sync, temp_zip, staging, prefix, job)
+            os.rename(staging, SERVERS_DIR / server_id)
+        finally:
+            temp_zip.unlink(missing_ok=True)
+            shutil.rmtree(staging, ignore_errors=True)
+        finish_server_import(server_id)
+        return {"server_id": server_id, **result}
+    
+    return create_job('server-import', server_id, work)
+
+def finish_server_import(server_id: str):
+    """Adopt an imported server folder: reuse its config.json or build a new one"""
+    server_path = SERVERS_DIR / server_id
     
     # Try to load existing config or create new one
     config_file = server_path / 'config.json'
@@ -1382,8 +5777,436 @@ async def import_server(file: UploadFile = File(...)):
                 config['eula_accepted'] = 'eula=true' in content.lower()
     
     save_server_config(server_id, config)
-    
-    return {"message": "Server imported", "server_id": server_id}
+
+# ============== Modpack Import ==============
+
+MRPACK_LOADERS = {'fabric-loader': 'fabric', 'forge': 'forge'}
+MRPACK_DOWNLOADS = 8  # concurrent file downloads per import
+
+def read_mrpack_index(pack: Path) -> dict:
+    """Parse and sanity-check modrinth.index.json from a .mrpack"""
+    try:
+        with zipfile.ZipFile(pack) as zf:
+            index = json.loads(zf.read('modrinth.index.json'))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Not a Modrinth modpack: {e}")
+    if index.get('formatVersion') != 1 or index.get('game') != 'minecraft':
+        raise HTTPException(status_code=400, detail="Unsupported modpack format")
+    return index
+
+def mrpack_server_setup(index: dict) -> tuple:
+    """(server_type, game version, loader version) from the pack's dependencies"""
+    dependencies = index.get('dependencies', {})
+    if 'minecraft' not in dependencies:
+        raise HTTPException(status_code=400, detail="Modpack does not declare a Minecraft version")
+    for dependency, server_type in MRPACK_LOADERS.items():
+        if dependency in dependencies:
+            return server_type, dependencies['minecraft'], dependencies[dependency]
+    loaders = [d for d in dependencies if d != 'minecraft']
+    if loaders:
+        raise HTTPException(status_code=400, detail=f"Unsupported modpack loader: {', '.join(loaders)}")
+    return 'vanilla', dependencies['minecraft'], None
+
+def mrpack_server_files(index: dict, server_path: Path) -> List[dict]:
+    """Files the server needs (env.server not 'unsupported'), with validated destinations"""
+    files = []
+    for entry in index.get('files', []):
+        if (entry.get('env') or {}).get('server', 'required') == 'unsupported':
+            continue
+        target = safe_archive_path(server_path, entry['path'])
+        if target is None:
+            raise HTTPException(status_code=400, detail=f"Unsafe path in modpack: {entry['path']}")
+        files.append({**entry, "target": target})
+    return files
+
+async def download_mrpack_file(session: UpstreamSession, entry: dict):
+    """Download one pack file, trying each mirror until one matches the pack's SHA-512"""
+    entry['target'].parent.mkdir(parents=True, exist_ok=True)
+    error = None
+    for url in entry.get('downloads', []):
+        try:
+            await download_verified(session, url, entry['target'], entry.get('hashes', {}).get('sha512'))
+            return
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            error = e
+    raise HTTPException(status_code=502, detail=f"Could not download {entry['path']}: {error}")
+
+async def download_modrinth_pack(version_id: str) -> Path:
+    """Fetch the .mrpack of a Modrinth modpack version into UPLOADS_DIR"""
+    version = await modrinth_get(f'/version/{version_id}', ttl=MODRINTH_PROJECT_TTL)
+    files = (version or {}).get('files', [])
+    pack = next((f for f in files if f['filename'].endswith('.mrpack')), None)
+    if not pack:
+        raise HTTPException(status_code=404, detail="Modpack version not found")
+    target = UPLOADS_DIR / f'{uuid.uuid4().hex[:12]}.mrpack'
+    async with upstream_session(UPSTREAM_BACKGROUND) as session:
+        await download_verified(session, pack['url'], target, pack.get('hashes', {}).get('sha512'))
+    return target
+
+async def import_mrpack(server_id: str, pack: Path, options: ModpackImport, job: dict) -> dict:
+    try:
+        index = await asyncio.to_thread(read_mrpack_index, pack)
+        server_type, game_version, loader_version = mrpack_server_setup(index)
+    except BaseException:
+        pack.unlink(missing_ok=True)
+        raise
+    reserved_port = None if options.port else await asyncio.to_thread(reserve_port)
+    try:
+        server = ServerCreate(
+            name=options.name or index.get('name') or 'Modpack Server', server_type=server_type, version=game_version,
+            ram_min=options.ram_min, ram_max=options.ram_max, port=options.port or reserved_port
+        )
+        server_path = SERVERS_DIR / server_id
+        server_path.mkdir()
+        config = new_server_config(server_id, server)
+        config['modpack'] = {"name": index.get('name'), "version": index.get('versionId'), "loader_version": loader_version}
+        save_server_config(server_id, config)
+    finally:
+        release_port(reserved_port)
+
+    try:
+        files = mrpack_server_files(index, server_path)
+        semaphore = asyncio.Semaphore(MRPACK_DOWNLOADS)
+        done = 0
+
+        async def fetch(entry: dict):
+            nonlocal done
+            async with semaphore:
+                await download_mrpack_file(session, entry)
+            done += 1
+            update_job(job, done / (len(files) + 1) * 0.9, f"Downloaded {done}/{len(files)} files")
+
+        async def server_jar():
+            if not await install_server_jar(server_id, server, loader_version):
+                raise HTTPException(status_code=502, detail=f"Could not download the {server_type} {game_version} server")
+
+        async with upstream_session(UPSTREAM_BACKGROUND) as session:
+            # The server JAR downloads alongside the pack files
+            results = await asyncio.gather(server_jar(), *(fetch(entry) for entry in files), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+
+        update_job(job, 0.95, "Applying overrides")
+        for prefix in ('overrides/', 'server-overrides/'):
+            await asyncio.to_thread(extract_archive_sync, pack, server_path, prefix)
+    except BaseException:
+        config['status'] = 'error'
+        save_server_config(server_id, config)
+        raise
+    finally:
+        pack.unlink(missing_ok=True)
+
+    config['status'] = 'stopped'
+    save_server_config(server_id, config)
+    return {"server_id": server_id, "name": server.name, "server_type": server_type, "version": game_version,
+            "files": len(files)}
+
+async def start_mrpack_import(pack: Optional[Path], options: ModpackImport) -> dict:
+    """Create a server from a .mrpack (or a Modrinth modpack version) in a background job"""
+    server_id = str(uuid.uuid4())[:8]
+
+    async def work(job):
+        nonlocal pack
+        if pack is None:
+            update_job(job, 0.0, "Downloading modpack")
+            pack = await download_modrinth_pack(options.version_id)
+        return await import_mrpack(server_id, pack, options, job)
+
+    return create_job('modpack-import', server_id, work)
+
+def validate_modpack_options(options: ModpackImport):
+    if options.port is not None and not 1 <= options.port <= 65535:
+        raise HTTPException(status_code=400, detail="Invalid port")
+
+@api_router.post("/servers/modpack")
+async def import_modpack(options: ModpackImport):
+    """Create a server from a Modrinth modpack version id"""
+    if not options.version_id:
+        raise HTTPException(status_code=400, detail="version_id is required")
+    validate_modpack_options(options)
+    return await start_mrpack_import(None, options)
+
+@api_router.post("/servers/modpack/upload")
+async def upload_modpack(file: UploadFile = File(...), name: Optional[str] = Form(None), port: Optional[int] = Form(None),
+                         ram_min: int = Form(1024), ram_max: int = Form(4096)):
+    """Create a server from an uploaded .mrpack (see /uploads for resumable uploads)"""
+    options = ModpackImport(name=name, port=port, ram_min=ram_min, ram_max=ram_max)
+    session = create_upload_session('mrpack', file.filename or 'pack.mrpack', None, modpack=options)
+    try:
+        await save_upload(file, upload_part_path(session['id']))
+    except BaseException:
+        discard_upload_session(session['id'])
+        raise
+    return await finalize_upload(session['id'])
+
+# ============== Local Imports ==============
+
+FICLONE = 0x40049409
+CLONE_MODES = ('auto', 'reflink', 'hardlink', 'copy', 'move')
+CLONE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+def reflink_file(src: str, dst: str) -> bool:
+    """Copy-on-write clone of a file (Btrfs, XFS, bcachefs...); False when unsupported"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        Path(dst).unlink(missing_ok=True)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+def clone_file(src: str, dst: str, mode: str) -> str:
+    """Clone one file with the cheapest method allowed by mode; returns the method used"""
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    if mode in ('auto', 'reflink') and reflink_file(src, dst):
+        return 'reflink'
+    shutil.copy2(src, dst)
+    return 'copy'
+
+def clone_tree(src: Path, dst: Path, mode: str = 'auto', job: Optional[dict] = None, exclude: bool = False,
+               link_if: Optional[Callable[[str], bool]] = None) -> dict:
+    """
+    Recreate the src tree at dst without going through an archive.
+    auto reflinks where the filesystem supports it and copies otherwise; hardlink shares
+    inodes (only for files nobody modifies in place, e.g. jars); move renames the tree,
+    copying and deleting when src is on another filesystem. Copies run in parallel.
+    exclude skips the same logs/locks as exports; link_if(relative_path) picks files to
+    hardlink whatever the mode.
+    """
+    if mode == 'move':
+        try:
+            os.rename(src, dst)
+            links = [os.path.join(root, name) for root, dirs, names in os.walk(dst) for name in dirs + names
+                     if os.path.islink(os.path.join(root, name))]
+            for link in links:
+                os.unlink(link)
+            return {"files": None, "bytes": None, "methods": {"rename": 1}, "skipped_links": len(links)}
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        result = clone_tree(src, dst, 'auto', job)
+        shutil.rmtree(src)
+        return result
+
+    files = []
+    skipped_links = 0
+    for root, dirs, names in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target_root = dst if rel == '.' else dst / rel
+        target_root.mkdir(parents=True, exist_ok=True)
+        if exclude:
+            dirs[:] = [d for d in dirs if d not in EXPORT_EXCLUDE_NAMES]
+        # Symlinks could point anywhere on the host; they are not imported
+        for name in [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            dirs.remove(name)
+            skipped_links += 1
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                skipped_links += 1
+                continue
+            if exclude and (name in EXPORT_EXCLUDE_NAMES or name.endswith(EXPORT_EXCLUDE_SUFFIXES)):
+                continue
+            rel_path = name if rel == '.' else f'{Path(rel).as_posix()}/{name}'
+            file_mode = 'hardlink' if link_if and link_if(rel_path) else mode
+            files.append((path, str(target_root / name), os.path.getsize(path), file_mode))
+
+    total = sum(size for _, _, size, _ in files) or 1
+    stats = {"files": 0, "bytes": 0, "methods": {}, "skipped_links": skipped_links}
+    with ThreadPoolExecutor(max_workers=CLONE_WORKERS) as pool:
+        futures = {pool.submit(clone_file, path, target, file_mode): size for path, target, size, file_mode in files}
+        for future in as_completed(futures):
+            method = future.result()
+            stats['files'] += 1
+            stats['bytes'] += futures[future]
+            stats['methods'][method] = stats['methods'].get(method, 0) + 1
+            if job:
+                update_job(job, stats['bytes'] / total, f"Copied {stats['files']}/{len(files)} files")
+    return stats
+
+def validate_import_source(path: str, mode: str) -> Path:
+    if mode not in CLONE_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of: {', '.join(CLONE_MODES)}")
+    source = Path(path).expanduser()
+    if not source.is_absolute() or not source.exists():
+        raise HTTPException(status_code=400, detail="Source path not found")
+    source = source.resolve()
+    data_dir = DATA_DIR.resolve()
+    if source.is_relative_to(data_dir) or data_dir.is_relative_to(source):
+        raise HTTPException(status_code=400, detail="Source overlaps the MineHost data folder")
+    if source.is_file() and source.suffix.lower() != '.zip':
+        raise HTTPException(status_code=400, detail="Source must be a folder or a .zip file")
+    return source
+
+async def import_into(source: Path, dest: Path, mode: str, job: dict) -> dict:
+    """Clone a folder or extract a ZIP into a staging folder, then rename it to dest"""
+    staging = UPLOADS_DIR / f'import-{uuid.uuid4().hex[:8]}'
+    try:
+        if source.is_file():
+            prefix = archive_root_prefix(await asyncio.to_thread(read_archive_names, source))
+            result = await asyncio.to_thread(extract_archive_sync, source, staging, prefix, job)
+        else:
+            result = await asyncio.to_thread(clone_tree, source, staging, mode, job)
+        os.rename(staging, dest)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return result
+
+@api_router.post("/servers/{server_id}/worlds/import-path")
+async def import_world_from_path(server_id: str, data: PathImport):
+    """Import a world folder (or ZIP) from the local filesystem"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    source = validate_import_source(data.path, data.mode)
+    if source.is_dir() and not (source / 'level.dat').exists():
+        raise HTTPException(status_code=400, detail="Source is not a world folder (no level.dat)")
+
+    # Only archives lose their suffix; folder names like "Survival 1.20.1" keep their dots
+    world_name = data.name or (source.stem if source.is_file() else source.name)
+    if '/' in world_name or world_name.startswith('.'):
+        raise HTTPException(status_code=400, detail="Invalid world name")
+    world_path = SERVERS_DIR / server_id / world_name
+    if world_path.exists():
+        raise HTTPException(status_code=400, detail="A world with this name already exists")
+
+    async def work(job):
+        result = await import_into(source, world_path, data.mode, job)
+        forget_world_size(world_path)
+        return {"name": world_name, **result}
+
+    return create_job('world-import', server_id, work)
+
+@api_router.post("/servers/import-path")
+async def import_server_from_path(data: PathImport):
+    """Import a server folder (or exported ZIP) from the local filesystem"""
+    source = validate_import_source(data.path, data.mode)
+    if source.is_dir() and not any((source / name).exists() for name in ('server.jar', 'server.properties', 'config.json')):
+        raise HTTPException(status_code=400, detail="Source is not a server folder")
+
+    server_id = str(uuid.uuid4())[:8]
+
+    async def work(job):
+        result = await import_into(source, SERVERS_DIR / server_id, data.mode, job)
+        finish_server_import(server_id)
+        return {"server_id": server_id, **result}
+
+    return create_job('server-import', server_id, work)
+
+# ============== Server Cloning ==============
+
+# Content servers never rewrite in place; sharing inodes costs nothing
+CLONE_HARDLINK_DIRS = ('libraries/', 'mods/', 'plugins/', 'versions/', 'cache/')
+
+def is_immutable_server_file(rel_path: str) -> bool:
+    if rel_path.endswith('.jar') and ('/' not in rel_path or rel_path.startswith(CLONE_HARDLINK_DIRS)):
+        return True
+    return rel_path.startswith(('libraries/', 'versions/'))
+
+def port_is_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('', port))
+            return True
+        except OSError:
+            return False
+
+port_reservations: set = set()  # handed out but not yet saved in a config
+port_reservation_lock = threading.Lock()
+
+def reserve_port(start: int = 25565, exclude: Optional[set] = None) -> int:
+    """find_free_port that won't hand the same port to two concurrent creators; see release_port"""
+    with port_reservation_lock:
+        port = find_free_port(start, set(exclude or ()) | port_reservations)
+        port_reservations.add(port)
+    return port
+
+def release_port(port: Optional[int]):
+    """Drop a reservation once the port is saved in a config (or the creation failed)"""
+    with port_reservation_lock:
+        port_reservations.discard(port)
+
+def find_free_port(start: int = 25565, exclude: Optional[set] = None) -> int:
+    """First port from start that no server is configured for and nothing is bound to"""
+    used = set(exclude or ())
+    for server in get_servers_list():
+        used.add(get_server_address(server['id'])[1])
+        properties = get_server_properties(server['id'])
+        for key in ('query.port', 'rcon.port'):
+            if properties.get(key, '').isdigit():
+                used.add(int(properties[key]))
+    for port in range(start, 65536):
+        if port not in used and port_is_free(port):
+            return port
+    raise HTTPException(status_code=500, detail="No free port available")
+
+@api_router.post("/servers/{server_id}/clone")
+async def clone_server(server_id: str, data: Optional[ServerClone] = None):
+    """Clone a server: jars and libraries are hardlinked, the rest reflinked or copied"""
+    config = get_server_config(server_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Server not found")
+    data = data or ServerClone()
+    if data.mode not in ('auto', 'copy'):
+        raise HTTPException(status_code=400, detail="Mode must be auto or copy")
+    if data.port is not None and not 1 <= data.port <= 65535:
+        raise HTTPException(status_code=400, detail="Invalid port")
+
+    new_id = str(uuid.uuid4())[:8]
+    reserved_port = None if data.port else await asyncio.to_thread(reserve_port, 25565)
+    port = data.port or reserved_port
+
+    async def work(job):
+        staging = UPLOADS_DIR / f'clone-{new_id}'
+        rcon_port = None
+        try:
+            # A running server keeps saving; pause it so the world is copied consistently
+            async with get_world_lock(server_id):
+                async with world_saves_paused(server_id):
+                    result = await asyncio.to_thread(
+                        clone_tree, SERVERS_DIR / server_id, staging, data.mode, job, True, is_immutable_server_file
+                    )
+            os.rename(staging, SERVERS_DIR / new_id)
+
+            properties = get_server_properties(new_id)
+            if properties:
+                properties['server-port'] = str(port)
+                if 'query.port' in properties:
+                    properties['query.port'] = str(port)
+                if properties.get('enable-rcon') == 'true':
+                    rcon_port = reserve_port(port + 1, {port})
+                    properties['rcon.port'] = str(rcon_port)
+                save_server_properties(new_id, properties)
+
+            clone = dict(config)
+            clone.pop('hibernating', None)
+            clone.update({
+                "id": new_id,
+                "name": data.name or f"{config['name']} (copy)",
+                "port": port,
+                "status": "stopped",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "last_started": None,
+                "players_online": 0,
+                "cloned_from": server_id
+            })
+            save_server_config(new_id, clone)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            release_port(reserved_port)
+            release_port(rcon_port)
+        return {"server_id": new_id, "port": port, **result}
+
+    return create_job('server-clone', server_id, work)
 
 # ============== Icon Management ==============
 
@@ -1455,6 +6278,11 @@ async def get_system_info():
         "running_servers": len(running_servers)
     }
 
+@api_router.get("/system/upstream")
+async def get_upstream_stats():
+    """Per-host request, latency, error and rate-limit counters for upstream APIs"""
+    return {host: state.summary() for host, state in sorted(upstream.hosts.items())}
+
 @api_router.get("/system/java")
 async def check_java():
     """Check Java installation"""
@@ -1477,6 +6305,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    """Start background loops"""
+    asyncio.create_task(resource_policy_loop())
+    asyncio.create_task(hibernation_loop())
+    asyncio.create_task(snapshot_loop())
+    asyncio.create_task(upload_cleanup_loop())
+
+    for server in get_servers_list():
+        for folder in JAR_FOLDERS:
+            try:
+                recover_jar_folder(SERVERS_DIR / server['id'] / folder)
+            except OSError as e:
+                logger.error(f"Cannot recover {folder} for {server['id']}: {e}")
+
+    # Servers that were asleep when the backend went down keep answering pings
+    for server in get_servers_list():
+        if server.get('hibernating'):
+            try:
+                await open_sleep_listener(server['id'])
+            except OSError as e:
+                logger.warning(f"Cannot reopen wake listener for {server['id']}: {e}")
+
+    autostart = [sid for sid in load_settings()['autostart'] if get_server_config(sid)]
+    if autostart:
+        logger.info(f"Autostarting {len(autostart)} server(s)")
+        create_bulk_batch('start', autostart, source='autostart')
+
 @app.on_event("shutdown")
 async def shutdown():
     """Cleanup on shutdown"""
@@ -1485,3 +6341,10 @@ async def shutdown():
             await stop_server(server_id)
         except:
             pass
+    for listener in sleep_listeners.values():
+        listener.close()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+    await upstream.close()
+    if _project_index is not None:
+        _project_index.close()
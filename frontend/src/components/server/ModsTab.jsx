@@ -18,6 +18,7 @@ import {
 } from "../ui/alert-dialog";
 import { toast } from "sonner";
 import axios from "axios";
+import { waitForJob } from "../../lib/jobs";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -30,6 +31,9 @@ export default function ModsTab({ serverId, serverVersion, serverType }) {
   const [installing, setInstalling] = useState(null);
   const [searchQuery, setSearchQuery] = useState("");
   const [deleteDialog, setDeleteDialog] = useState({ open: false, mod: null });
+  const [updates, setUpdates] = useState(null);
+  const [updating, setUpdating] = useState(false);
+  const [depReport, setDepReport] = useState(null);
 
   useEffect(() => {
     fetchInstalledMods();
@@ -46,22 +50,99 @@ export default function ModsTab({ serverId, serverVersion, serverType }) {
     } finally {
       setLoading(false);
     }
+    try {
+      const res = await axios.get(`${API}/servers/${serverId}/mods/dependencies`);
+      setDepReport(res.data);
+    } catch (err) {
+      console.error("Failed to check mod dependencies:", err);
+    }
+  };
+
+  const dependencyProblems = depReport
+    ? [
+        ...depReport.missing.map((m) => t("mods_dep_missing", { mod: m.mod, requires: m.requires })),
+        ...depReport.unsatisfied
+          .filter((u) => !u.optional)
+          .map((u) =>
+            t("mods_dep_unsatisfied", {
+              mod: u.mod,
+              requires: u.requires,
+              versions: u.versions.join(" | "),
+              found: u.found.join(", "),
+            })
+          ),
+        ...depReport.conflicts.map((c) =>
+          c.kind === "duplicate"
+            ? t("mods_dep_duplicate", { mod: c.mod, jar: c.jar, other: c.other_jar })
+            : t("mods_dep_conflict", { mod: c.mod, other: c.with })
+        ),
+        ...depReport.cycles.map((cycle) => t("mods_dep_cycle", { mods: cycle.join(" → ") })),
+      ]
+    : [];
+
+  const handleCheckUpdates = async () => {
+    setUpdating(true);
+    try {
+      const res = await axios.get(`${API}/servers/${serverId}/mods/check-updates`);
+      setUpdates(res.data.updates);
+      if (res.data.updates.length === 0) toast.success(t("mods_up_to_date"));
+    } catch (err) {
+      toast.error(err.response?.data?.detail || t("error"));
+    } finally {
+      setUpdating(false);
+    }
+  };
+
+  const handleApplyUpdates = async () => {
+    setUpdating(true);
+    try {
+      const res = await axios.post(`${API}/servers/${serverId}/mods/apply-updates`, {});
+      await waitForJob(res.data.id);
+      toast.success(t("mods_updated"));
+      setUpdates(null);
+      fetchInstalledMods();
+    } catch (err) {
+      toast.error(err.response?.data?.detail || err.message || t("error"));
+    } finally {
+      setUpdating(false);
+    }
+  };
+
+  const handleRollback = async () => {
+    setUpdating(true);
+    try {
+      await axios.post(`${API}/servers/${serverId}/mods/rollback`);
+      toast.success(t("mods_rolled_back"));
+      setUpdates(null);
+      fetchInstalledMods();
+    } catch (err) {
+      toast.error(err.response?.data?.detail || t("error"));
+    } finally {
+      setUpdating(false);
+    }
   };
 
   const handleSearch = async () => {
     if (!searchQuery.trim()) return;
 
     setSearching(true);
+    const params = {
+      query: searchQuery,
+      loader: serverType === "forge" ? "forge" : "fabric",
+      version: serverVersion,
+      limit: 20,
+    };
+    let live = false;
+    // The offline index answers instantly; live results replace it when they arrive
+    axios
+      .get(`${API}/mods/search`, { params: { ...params, source: "local" } })
+      .then((res) => {
+        if (!live && res.data.mods?.length) setSearchResults(res.data.mods);
+      })
+      .catch(() => {});
     try {
-      const loader = serverType === "forge" ? "forge" : "fabric";
-      const res = await axios.get(`${API}/mods/search`, {
-        params: {
-          query: searchQuery,
-          loader,
-          version: serverVersion,
-          limit: 20,
-        },
-      });
+      const res = await axios.get(`${API}/mods/search`, { params });
+      live = true;
       setSearchResults(res.data.mods || []);
     } catch (err) {
       toast.error(t("error"));
@@ -160,6 +241,37 @@ export default function ModsTab({ serverId, serverVersion, serverType }) {
             </div>
           ) : (
             <div className="space-y-3">
+              <div className="flex items-center justify-end gap-2">
+                <Button variant="ghost" size="sm" onClick={handleRollback} disabled={updating}>
+                  {t("mods_rollback")}
+                </Button>
+                {updates?.length > 0 ? (
+                  <Button size="sm" onClick={handleApplyUpdates} disabled={updating}>
+                    <Download className="w-4 h-4 mr-2" />
+                    {t("mods_update_all")} ({updates.length})
+                  </Button>
+                ) : (
+                  <Button variant="outline" size="sm" onClick={handleCheckUpdates} disabled={updating}>
+                    <RefreshCw className={`w-4 h-4 mr-2 ${updating ? "animate-spin" : ""}`} />
+                    {t("mods_check_updates")}
+                  </Button>
+                )}
+              </div>
+              {dependencyProblems.length > 0 && (
+                <div className="p-4 rounded-lg border border-amber-500/50 bg-amber-500/10">
+                  <div className="flex items-center gap-2 mb-2">
+                    <AlertCircle className="w-4 h-4 text-amber-500" />
+                    <p className="text-sm font-semibold text-amber-700 dark:text-amber-400">
+                      {t("mods_dep_problems")} ({dependencyProblems.length})
+                    </p>
+                  </div>
+                  <ul className="text-xs text-muted-foreground space-y-1">
+                    {dependencyProblems.map((problem, idx) => (
+                      <li key={idx}>{problem}</li>
+                    ))}
+                  </ul>
+                </div>
+              )}
               {installedMods.map((mod) => (
                 <div
                   key={mod.filename}
@@ -167,7 +279,14 @@ export default function ModsTab({ serverId, serverVersion, serverType }) {
                 >
                   <div className="flex-1">
                     <div className="flex items-center gap-2 mb-2">
-                      <p className="font-medium">{mod.mod_name || mod.filename}</p>
+                      {mod.modrinth?.icon_url && (
+                        <img
+                          src={mod.modrinth.icon_url}
+                          alt={mod.modrinth.title}
+                          className="w-6 h-6 rounded object-cover flex-shrink-0"
+                        />
+                      )}
+                      <p className="font-medium">{mod.modrinth?.title || mod.mod_name || mod.filename}</p>
                       {mod.mod_version && (
                         <Badge variant="outline" className="text-xs">
                           v{mod.mod_version}
@@ -247,7 +366,8 @@ export default function ModsTab({ serverId, serverVersion, serverType }) {
             <div className="grid grid-cols-2 gap-4">
               {searchResults.map((mod) => {
                 const isInstalled = installedMods.some(
-                  m => m.mod_name?.toLowerCase() === mod.title.toLowerCase() ||
+                  m => m.modrinth?.project_id === mod.project_id ||
+                       m.mod_name?.toLowerCase() === mod.title.toLowerCase() ||
                        m.filename?.toLowerCase() === mod.title.toLowerCase()
                 );
                 return (
@@ -50,13 +50,18 @@ export default function PluginsTab({ serverId, serverVersion }) {
     if (!searchQuery.trim()) return;
 
     setSearching(true);
+    const params = { query: searchQuery, limit: 20 };
+    let live = false;
+    // The offline index answers instantly; live results replace it when they arrive
+    axios
+      .get(`${API}/plugins/search`, { params: { ...params, source: "local" } })
+      .then((res) => {
+        if (!live && res.data.plugins?.length) setSearchResults(res.data.plugins);
+      })
+      .catch(() => {});
     try {
-      const res = await axios.get(`${API}/plugins/search`, {
-        params: {
-          query: searchQuery,
-          limit: 20,
-        },
-      });
+      const res = await axios.get(`${API}/plugins/search`, { params });
+      live = true;
       setSearchResults(res.data.plugins || []);
     } catch (err) {
       toast.error(t("error"));
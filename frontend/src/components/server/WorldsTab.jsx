@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useTranslation } from "react-i18next";
-import { Upload, Download, Trash2, Globe, FolderOpen, RefreshCw } from "lucide-react";
+import { Upload, Download, Trash2, Globe, FolderOpen, RefreshCw, Skull } from "lucide-react";
 import { Button } from "../ui/button";
 import { Input } from "../ui/input";
 import { Card } from "../ui/card";
@@ -18,6 +18,8 @@ import {
 import { toast } from "sonner";
 import axios from "axios";
 import SeedsExplorer from "./SeedsExplorer";
+import { waitForJob } from "../../lib/jobs";
+import { uploadResumable } from "../../lib/uploads";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -26,10 +28,12 @@ export default function WorldsTab({ serverId }) {
   const [worlds, setWorlds] = useState([]);
   const [loading, setLoading] = useState(true);
   const [uploading, setUploading] = useState(false);
+  const [uploadStatus, setUploadStatus] = useState("");
   const [deleteDialog, setDeleteDialog] = useState({ open: false, world: null });
   const [newWorldName, setNewWorldName] = useState("");
   const [newWorldSeed, setNewWorldSeed] = useState("");
   const [creatingWorld, setCreatingWorld] = useState(false);
+  const [importPath, setImportPath] = useState("");
 
   useEffect(() => {
     fetchWorlds();
@@ -51,23 +55,49 @@ export default function WorldsTab({ serverId }) {
     if (!file) return;
 
     setUploading(true);
-    const formData = new FormData();
-    formData.append("file", file);
 
     try {
-      await axios.post(`${API}/servers/${serverId}/worlds/upload`, formData, {
-        headers: { "Content-Type": "multipart/form-data" },
+      setUploadStatus("Enviando...");
+      const job = await uploadResumable(file, {
+        kind: "world",
+        serverId,
+        onProgress: (fraction) => setUploadStatus(`Enviando... ${Math.round(fraction * 100)}%`),
       });
+      await waitForJob(job.id, (job) =>
+        setUploadStatus(`Extraindo... ${Math.round(job.progress * 100)}%`)
+      );
       toast.success(t("success"));
       fetchWorlds();
     } catch (err) {
-      toast.error(err.response?.data?.detail || t("error"));
+      toast.error(err.response?.data?.detail || err.message || t("error"));
     } finally {
       setUploading(false);
+      setUploadStatus("");
       event.target.value = "";
     }
   };
 
+  const handleImportPath = async () => {
+    setUploading(true);
+    try {
+      setUploadStatus("Importando...");
+      const res = await axios.post(`${API}/servers/${serverId}/worlds/import-path`, {
+        path: importPath.trim(),
+      });
+      await waitForJob(res.data.id, (job) =>
+        setUploadStatus(`Importando... ${Math.round(job.progress * 100)}%`)
+      );
+      toast.success(t("success"));
+      setImportPath("");
+      fetchWorlds();
+    } catch (err) {
+      toast.error(err.response?.data?.detail || err.message || t("error"));
+    } finally {
+      setUploading(false);
+      setUploadStatus("");
+    }
+  };
+
   const handleCreateWorld = async () => {
     if (!newWorldName.trim()) {
       toast.error("Nome do mundo é obrigatório");
@@ -123,6 +153,25 @@ export default function WorldsTab({ serverId }) {
     return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + " " + sizes[i];
   };
 
+  const difficultyLabels = {
+    peaceful: "Pacífico",
+    easy: "Fácil",
+    normal: "Normal",
+    hard: "Difícil",
+  };
+
+  const gameModeLabels = {
+    survival: "Sobrevivência",
+    creative: "Criativo",
+    adventure: "Aventura",
+    spectator: "Espectador",
+  };
+
+  const formatLastPlayed = (iso) => {
+    if (!iso) return null;
+    return new Date(iso).toLocaleString();
+  };
+
   return (
     <Card className="p-6" data-testid="worlds-tab">
       {/* Header */}
@@ -167,8 +216,54 @@ export default function WorldsTab({ serverId }) {
                       <Globe className="w-6 h-6 text-emerald-500" />
                     </div>
                     <div>
-                      <p className="font-medium">{world.name}</p>
-                      <p className="text-sm text-muted-foreground">{formatBytes(world.size)}</p>
+                      <div className="flex items-center gap-2">
+                        <p className="font-medium">{world.name}</p>
+                        {world.metadata?.hardcore && (
+                          <span className="flex items-center gap-1 text-xs px-2 py-0.5 rounded bg-destructive/20 text-destructive">
+                            <Skull className="w-3 h-3" />
+                            Hardcore
+                          </span>
+                        )}
+                      </div>
+                      <p className="text-sm text-muted-foreground">
+                        {formatBytes(world.size)}
+                        {world.metadata?.version && ` · ${world.metadata.version}`}
+                        {world.metadata?.difficulty &&
+                          ` · ${difficultyLabels[world.metadata.difficulty] || world.metadata.difficulty}`}
+                        {world.metadata?.game_mode &&
+                          ` · ${gameModeLabels[world.metadata.game_mode] || world.metadata.game_mode}`}
+                      </p>
+                      {world.metadata && !world.metadata.error && (
+                        <div className="text-xs text-muted-foreground mt-1 space-y-0.5">
+                          {world.metadata.seed && (
+                            <p>
+                              Seed: <span className="font-mono select-all">{world.metadata.seed}</span>
+                            </p>
+                          )}
+                          {world.metadata.spawn && (
+                            <p>Spawn: {world.metadata.spawn.filter((v) => v !== null).join(", ")}</p>
+                          )}
+                          {world.metadata.last_played && (
+                            <p>Última vez jogado: {formatLastPlayed(world.metadata.last_played)}</p>
+                          )}
+                          {Object.keys(world.metadata.game_rules || {}).length > 0 && (
+                            <details>
+                              <summary className="cursor-pointer">
+                                Regras do jogo ({Object.keys(world.metadata.game_rules).length})
+                              </summary>
+                              <div className="grid grid-cols-2 gap-x-4 mt-1 font-mono">
+                                {Object.entries(world.metadata.game_rules)
+                                  .sort(([a], [b]) => a.localeCompare(b))
+                                  .map(([rule, value]) => (
+                                    <span key={rule}>
+                                      {rule}: {value}
+                                    </span>
+                                  ))}
+                              </div>
+                            </details>
+                          )}
+                        </div>
+                      )}
                     </div>
                   </div>
                   <div className="flex items-center gap-2">
@@ -266,9 +361,26 @@ export default function WorldsTab({ serverId }) {
               </div>
             </label>
             {uploading && (
-              <p className="mt-4 text-sm text-muted-foreground">Enviando...</p>
+              <p className="mt-4 text-sm text-muted-foreground">{uploadStatus}</p>
             )}
           </div>
+
+          {/* Importar de uma pasta local, sem enviar o arquivo */}
+          <div className="space-y-2">
+            <label className="text-sm font-medium block">Ou importe de uma pasta deste computador</label>
+            <div className="flex gap-2">
+              <Input
+                placeholder="/home/usuario/.minecraft/saves/MeuMundo"
+                value={importPath}
+                onChange={(e) => setImportPath(e.target.value)}
+                disabled={uploading}
+              />
+              <Button onClick={handleImportPath} disabled={uploading || !importPath.trim()}>
+                <FolderOpen className="w-4 h-4 mr-2" />
+                Importar
+              </Button>
+            </div>
+          </div>
         </TabsContent>
       </Tabs>
 
@@ -105,6 +105,18 @@ const resources = {
       "mods_browse": "Browse Mods",
       "mods_no_installed": "No mods installed",
       "mods_install_success": "Mod installed successfully",
+      "mods_check_updates": "Check updates",
+      "mods_update_all": "Update all",
+      "mods_up_to_date": "All mods are up to date",
+      "mods_updated": "Mods updated",
+      "mods_rollback": "Roll back update",
+      "mods_rolled_back": "Previous mods restored",
+      "mods_dep_problems": "Dependency problems",
+      "mods_dep_missing": "{{mod}} requires {{requires}}, which is not installed",
+      "mods_dep_unsatisfied": "{{mod}} requires {{requires}} {{versions}} (found {{found}})",
+      "mods_dep_conflict": "{{mod}} is incompatible with {{other}}",
+      "mods_dep_duplicate": "{{mod}} is installed twice ({{jar}}, {{other}})",
+      "mods_dep_cycle": "Load order cycle: {{mods}}",
       
       // Plugins
       "plugins_title": "Plugins",
@@ -258,6 +270,18 @@ const resources = {
       "mods_browse": "Procurar Mods",
       "mods_no_installed": "Nenhum mod instalado",
       "mods_install_success": "Mod instalado com sucesso",
+      "mods_check_updates": "Verificar atualizações",
+      "mods_update_all": "Atualizar todos",
+      "mods_up_to_date": "Todos os mods estão atualizados",
+      "mods_updated": "Mods atualizados",
+      "mods_rollback": "Desfazer atualização",
+      "mods_rolled_back": "Mods anteriores restaurados",
+      "mods_dep_problems": "Problemas de dependência",
+      "mods_dep_missing": "{{mod}} requer {{requires}}, que não está instalado",
+      "mods_dep_unsatisfied": "{{mod}} requer {{requires}} {{versions}} (encontrado {{found}})",
+      "mods_dep_conflict": "{{mod}} é incompatível com {{other}}",
+      "mods_dep_duplicate": "{{mod}} está instalado duas vezes ({{jar}}, {{other}})",
+      "mods_dep_cycle": "Ciclo na ordem de carregamento: {{mods}}",
       
       // Plugins
       "plugins_title": "Plugins",
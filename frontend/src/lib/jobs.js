@@ -0,0 +1,15 @@
+import axios from "axios";
+
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+
+// Poll a background job until it finishes; resolves with its result
+export async function waitForJob(jobId, onProgress, interval = 1000) {
+  for (;;) {
+    const res = await axios.get(`${API}/jobs/${jobId}`);
+    const job = res.data;
+    onProgress?.(job);
+    if (job.status === "completed") return job.result;
+    if (job.status === "failed") throw new Error(job.error || "Job failed");
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+}
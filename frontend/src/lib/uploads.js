@@ -0,0 +1,78 @@
+import axios from "axios";
+
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
+
+let crcTable = null;
+
+function crc32(bytes) {
+  if (!crcTable) {
+    crcTable = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+      let c = n;
+      for (let k = 0; k < 8; k++) c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+      crcTable[n] = c >>> 0;
+    }
+  }
+  let crc = 0xffffffff;
+  for (let i = 0; i < bytes.length; i++) crc = crcTable[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+  return ((crc ^ 0xffffffff) >>> 0).toString(16).padStart(8, "0");
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function openSession(file, kind, serverId) {
+  // Picking the same file again resumes the interrupted upload
+  const key = `upload:${kind}:${serverId || ""}:${file.name}:${file.size}:${file.lastModified}`;
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    try {
+      const res = await axios.get(`${API}/uploads/${saved}`);
+      return { key, session: res.data };
+    } catch (err) {
+      localStorage.removeItem(key);
+    }
+  }
+  const res = await axios.post(`${API}/uploads`, {
+    kind,
+    server_id: serverId,
+    filename: file.name,
+    size: file.size,
+    chunk_size: CHUNK_SIZE,
+  });
+  localStorage.setItem(key, res.data.id);
+  return { key, session: res.data };
+}
+
+// Upload a world or server ZIP in checksummed chunks; resolves with the extraction job
+export async function uploadResumable(file, { kind, serverId, onProgress }) {
+  const { key, session } = await openSession(file, kind, serverId);
+  const pending = session.missing.flatMap(([first, last]) =>
+    Array.from({ length: last - first + 1 }, (_, i) => first + i)
+  );
+  let done = session.chunks - pending.length;
+
+  for (const index of pending) {
+    const start = index * session.chunk_size;
+    const blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+    const bytes = new Uint8Array(await blob.arrayBuffer());
+    for (let attempt = 1; ; attempt++) {
+      try {
+        await axios.put(`${API}/uploads/${session.id}/chunks/${index}`, bytes, {
+          headers: { "Content-Type": "application/octet-stream", "X-Chunk-CRC32": crc32(bytes) },
+        });
+        break;
+      } catch (err) {
+        if (attempt >= CHUNK_RETRIES || err.response?.status === 404) throw err;
+        await sleep(1000 * attempt);
+      }
+    }
+    done += 1;
+    onProgress?.(done / session.chunks);
+  }
+
+  const res = await axios.post(`${API}/uploads/${session.id}/finalize`);
+  localStorage.removeItem(key);
+  return res.data;
+}
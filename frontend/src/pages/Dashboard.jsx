@@ -13,6 +13,7 @@ import {
   MoreVertical,
   Trash2,
   Download,
+  Copy,
 } from "lucide-react";
 import { Button } from "../components/ui/button";
 import { Card } from "../components/ui/card";
@@ -35,6 +36,8 @@ import {
 } from "../components/ui/alert-dialog";
 import { toast } from "sonner";
 import axios from "axios";
+import { waitForJob } from "../lib/jobs";
+import { uploadResumable } from "../lib/uploads";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -132,21 +135,29 @@ export default function Dashboard() {
     }
   };
 
+  const handleClone = async (server) => {
+    try {
+      const res = await axios.post(`${API}/servers/${server.id}/clone`);
+      toast.info("Clonando servidor...");
+      const result = await waitForJob(res.data.id);
+      toast.success(`Servidor clonado na porta ${result.port}`);
+      fetchServers();
+    } catch (err) {
+      toast.error(err.response?.data?.detail || err.message || t("error"));
+    }
+  };
+
   const handleImport = async (event) => {
     const file = event.target.files?.[0];
     if (!file) return;
 
-    const formData = new FormData();
-    formData.append("file", file);
-
     try {
-      await axios.post(`${API}/servers/import`, formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
+      const job = await uploadResumable(file, { kind: "server" });
+      await waitForJob(job.id);
       toast.success(t("success"));
       fetchServers();
     } catch (err) {
-      toast.error(err.response?.data?.detail || t("error"));
+      toast.error(err.response?.data?.detail || err.message || t("error"));
     }
 
     event.target.value = "";
@@ -270,6 +281,10 @@ export default function Dashboard() {
                           <Download className="w-4 h-4 mr-2" />
                           {t("export")}
                         </DropdownMenuItem>
+                        <DropdownMenuItem onClick={(e) => { e.stopPropagation(); handleClone(server); }}>
+                          <Copy className="w-4 h-4 mr-2" />
+                          Clonar
+                        </DropdownMenuItem>
                         <DropdownMenuSeparator />
                         <DropdownMenuItem
                           className="text-destructive"
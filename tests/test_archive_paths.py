@@ -0,0 +1,35 @@
+import pytest
+
+from backend import server
+
+
+@pytest.mark.parametrize("name", [
+    "../evil.txt",
+    "world/../../evil.txt",
+    "..\\evil.txt",
+    "world\\..\\..\\evil.txt",
+    "/etc/passwd",
+    "\\evil.txt",
+    "C:/evil.txt",
+    "C:evil.txt",
+])
+def test_rejects_paths_outside_root(tmp_path, name):
+    assert server.safe_archive_path(tmp_path, name) is None
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("world/level.dat", ("world", "level.dat")),
+    ("./world//region/r.0.0.mca", ("world", "region", "r.0.0.mca")),
+    ("world\\region\\r.0.0.mca", ("world", "region", "r.0.0.mca")),
+    ("world/..data", ("world", "..data")),
+])
+def test_accepts_paths_inside_root(tmp_path, name, expected):
+    assert server.safe_archive_path(tmp_path, name) == tmp_path.joinpath(*expected)
+
+
+def test_rejects_paths_through_symlinks_leaving_root(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (tmp_path / "outside").mkdir()
+    (root / "link").symlink_to(tmp_path / "outside")
+    assert server.safe_archive_path(root, "link/evil.txt") is None
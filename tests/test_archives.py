@@ -0,0 +1,123 @@
+import io
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+
+import pytest
+
+from backend import server
+
+
+class Unseekable:
+    """Write-only sink, like the queue an export streams into"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    # Small blocks so a few KiB exercise the multi-block paths
+    monkeypatch.setattr(server, "ARCHIVE_BLOCK_SIZE", 1024)
+    root = tmp_path / "world"
+    (root / "region").mkdir(parents=True)
+    files = {
+        "level.dat.json": b"{}",
+        "notes.txt": b"".join(b"line %d\n" % i for i in range(2000)),
+        "region/r.0.0.mca": os.urandom(3000),
+        "empty.txt": b"",
+    }
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+    return root, {f"world/{name}": data for name, data in files.items()}
+
+
+def test_zip_round_trip(world):
+    root, expected = world
+    out = Unseekable()
+    server.write_parallel_zip(out, server.iter_export_files(root, "world"), level=6, workers=2)
+    with zipfile.ZipFile(io.BytesIO(out.buffer.getvalue())) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == expected
+        infos = {info.filename: info for info in zf.infolist()}
+    notes = infos["world/notes.txt"]
+    assert notes.compress_type == zipfile.ZIP_DEFLATED
+    assert notes.flag_bits & 0x08  # streamed with a data descriptor
+    assert notes.compress_size < notes.file_size
+    region = infos["world/region/r.0.0.mca"]
+    assert region.compress_type == zipfile.ZIP_STORED
+    assert region.flag_bits & 0x08
+    assert not infos["world/empty.txt"].flag_bits & 0x08
+
+
+def test_zip_level_zero_stores_everything(world):
+    root, expected = world
+    out = Unseekable()
+    server.write_parallel_zip(out, server.iter_export_files(root, "world"), level=0, workers=1)
+    with zipfile.ZipFile(io.BytesIO(out.buffer.getvalue())) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+        assert {name: zf.read(name) for name in zf.namelist()} == expected
+
+
+def test_zip64_entries_round_trip():
+    data = b"minecraft" * 500
+    out = Unseekable()
+    writer = server.ZipStreamWriter(out)
+    meta = {"name": b"big.bin", "method": 0, "mtime": 0, "mode": 0o644,
+            "crc": 0, "size": 0, "zip64": True}
+    writer.begin(meta)
+    for start in range(0, len(data), 1024):
+        block = data[start:start + 1024]
+        meta["crc"] = zlib.crc32(block, meta["crc"])
+        meta["size"] += len(block)
+        writer.block(meta, block)
+    writer.end(meta)
+    writer.add_small({"name": b"small.txt", "method": 0, "mtime": 0, "mode": 0o644,
+                      "crc": zlib.crc32(b"hi"), "size": 2, "zip64": True}, b"hi")
+    writer.close()
+
+    raw = out.buffer.getvalue()
+    # zip64 data descriptor carries 8-byte sizes
+    descriptor = raw.index(b"PK\x07\x08")
+    assert raw[descriptor + 8:descriptor + 24] == len(data).to_bytes(8, "little") * 2
+    with zipfile.ZipFile(io.BytesIO(raw)) as zf:
+        assert zf.read("big.bin") == data
+        assert zf.read("small.txt") == b"hi"
+
+
+def test_missing_files_are_skipped(world):
+    root, expected = world
+    entries = [(root / "gone.txt", "world/gone.txt")] + list(server.iter_export_files(root, "world"))
+    out = Unseekable()
+    server.write_parallel_zip(out, entries, level=6, workers=2)
+    with zipfile.ZipFile(io.BytesIO(out.buffer.getvalue())) as zf:
+        assert sorted(zf.namelist()) == sorted(expected)
+
+
+@pytest.mark.parametrize("fmt, mode", [("tar.gz", "r:gz"), ("tar.xz", "r:xz")])
+def test_tar_round_trip(world, fmt, mode):
+    root, expected = world
+    out = Unseekable()
+    level = server.ARCHIVE_LEVELS[fmt][2]
+    server.write_parallel_tar(out, server.iter_export_files(root, "world"), fmt, level, workers=2)
+    with tarfile.open(fileobj=io.BytesIO(out.buffer.getvalue()), mode=mode) as tar:
+        members = tar.getmembers()
+        assert {m.name: tar.extractfile(m).read() for m in members} == expected
+
+
+def test_tar_xz_is_concatenated_streams(world):
+    root, _ = world
+    out = Unseekable()
+    server.write_parallel_tar(out, server.iter_export_files(root, "world"), "tar.xz", 0, workers=2)
+    # One xz stream per compressed block, which a single decoder reads back as one file
+    assert out.buffer.getvalue().count(b"\xfd7zXZ\x00") > 1
+    tar_bytes = lzma.decompress(out.buffer.getvalue())
+    assert len(tar_bytes) % tarfile.BLOCKSIZE == 0
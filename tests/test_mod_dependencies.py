@@ -0,0 +1,107 @@
+import pytest
+
+from backend import server
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("1.0.0", "1.0.0", 0),
+    ("1.0", "1.0.0", 0),
+    ("1.10", "1.9", 1),
+    ("1.0.0-alpha", "1.0.0-beta", -1),
+    ("1.0.0-beta", "1.0.0", -1),
+    ("1.0.0-2", "1.0.0-alpha", -1),
+    ("1.0.0-rc.1", "1.0.0-beta.5", 1),
+    ("1.0.0+build.1", "1.0.0+build.2", 0),
+])
+def test_compare_versions(a, b, expected):
+    assert server.compare_versions(a, b) == expected
+    assert server.compare_versions(b, a) == -expected
+
+
+@pytest.mark.parametrize("version, predicate, expected", [
+    ("5.0", "*", True),
+    ("1.2.0", "1.2", True),
+    ("1.2.1", "=1.2", False),
+    ("1.20.1", ">=1.20 <1.21", True),
+    ("1.21", ">=1.20 <1.21", False),
+    ("1.19.4", ">1.19.3", True),
+    ("1.19.3", "<=1.19.3", True),
+    ("0.15.3", "~0.15.0", True),
+    ("0.14.9", "~0.15.0", False),
+    ("0.16.0", "~0.15.0", False),
+    ("2.9", "^2.1", True),
+    ("2.0", "^2.1", False),
+    ("3.0", "^2.1", False),
+    ("1.20.4", "1.20.x", True),
+    ("1.20", "1.20.X", True),
+    ("1.19.4", "1.20.x", False),
+    ("1.20.1", "1.*", True),
+    ("1.0.0-beta.1", ">=1.0.0", False),
+    ("1.0.0-beta.2", ">1.0.0-beta.1", True),
+    ("1.0.0", ">1.0.0-rc.1", True),
+    ("1.0.0+build.5", "=1.0.0", True),
+])
+def test_fabric_predicate_matches(version, predicate, expected):
+    assert server.fabric_predicate_matches(version, predicate) is expected
+
+
+@pytest.mark.parametrize("version, spec, expected", [
+    ("47.1.0", "[47,)", True),
+    ("46.0", "[47,)", False),
+    ("1.5", "[1.0,2.0)", True),
+    ("1.0", "[1.0,2.0)", True),
+    ("2.0", "[1.0,2.0)", False),
+    ("2.0", "[1.0,2.0]", True),
+    ("1.0", "(1.0,2.0)", False),
+    ("1.0", "[1.0]", True),
+    ("1.0.1", "[1.0]", False),
+    ("0.5", "(,1.0]", True),
+    ("1.0", "(,1.0)", False),
+    ("3", "(,1.0],[2.0,)", True),
+    ("1.5", "(,1.0],[2.0,)", False),
+    ("2.0-beta", "[2.0,)", False),
+    # A bare version is only a recommendation
+    ("1.0", "2.0", True),
+    ("3.0", "2.0", True),
+    ("1.0", "", True),
+    ("1.0", "*", True),
+])
+def test_maven_range_matches(version, spec, expected):
+    assert server.maven_range_matches(version, spec) is expected
+
+
+@pytest.mark.parametrize("version, ranges, syntax, expected", [
+    (None, [">=2.0"], "fabric", True),
+    ("1.0", ["1.19", "1.0"], "fabric", True),
+    ("1.0", ["1.19", "1.18"], "fabric", False),
+    ("1.0", [""], "maven", True),
+])
+def test_version_satisfies(version, ranges, syntax, expected):
+    assert server.version_satisfies(version, ranges, syntax) is expected
+
+
+@pytest.mark.parametrize("edges, expected", [
+    ({"a": {"b"}, "b": {"a"}}, [["a", "b"]]),
+    ({"c": {"c"}}, [["c"]]),
+    ({"a": {"b"}, "b": {"c"}}, []),
+    ({"a": {"b"}, "b": {"a"}, "c": {"c"}, "d": {"a"}}, [["a", "b"], ["c"]]),
+])
+def test_find_cycles(edges, expected):
+    assert sorted(server.find_cycles(edges)) == expected
+
+
+def forge_mod(mod_id, version, depends=None, after=()):
+    return {"id": mod_id, "version": version, "loader": "forge", "syntax": "maven", "provides": [],
+            "depends": depends or {}, "optional": {}, "breaks": {}, "conflicts": {},
+            "after": list(after), "before": []}
+
+
+def test_solve_reports_ordering_cycle_and_accepts_bare_versions():
+    report = server.solve_dependency_graph({
+        "x.jar": {"mods": [forge_mod("x", "1.0", {"y": ["2.0"]}, after=["y"])]},
+        "y.jar": {"mods": [forge_mod("y", "1.0", {"x": ["[1,)"]})]},
+    }, "1.20.1")
+    assert report["unsatisfied"] == []
+    assert report["missing"] == []
+    assert report["cycles"] == [["x", "y"]]
+    assert report["ok"] is False
@@ -0,0 +1,84 @@
+import struct
+import zlib
+
+from backend import server
+
+CHUNK_NBT = b"\x0a\x00\x00\x03\x00\x0bDataVersion\x00\x00\x0e\x6e\x00"
+
+
+def deflated(nbt=CHUNK_NBT):
+    return b"\x02" + zlib.compress(nbt)
+
+
+def header_indexes(data):
+    locations = struct.unpack_from(">1024I", data, 0)
+    return {index for index, location in enumerate(locations) if location}
+
+
+def region_with_gap(path):
+    """Valid region with an unused sector between its two chunks"""
+    data = bytearray(server.build_region([(0, 1, deflated()), (1, 1, deflated())]))
+    second = struct.unpack_from(">I", data, 4)[0]
+    struct.pack_into(">I", data, 4, second + (1 << 8))
+    sector = second >> 8
+    data[sector * 4096:sector * 4096] = bytes(4096)
+    path.write_bytes(bytes(data))
+    return bytes(data)
+
+
+def test_removes_free_sectors(tmp_path):
+    region = tmp_path / "r.0.0.mca"
+    before = region_with_gap(region)
+    result = server.compact_region_file(str(region), None, False, False)
+    assert result["rewritten"] == 1
+    assert result["bytes_after"] == len(before) - 4096
+    after = region.read_bytes()
+    assert [chunk[2] for chunk in server.iter_region_chunks(after)] == [deflated(), deflated()]
+
+
+def test_dry_run_leaves_file_untouched(tmp_path):
+    region = tmp_path / "r.0.0.mca"
+    before = region_with_gap(region)
+    result = server.compact_region_file(str(region), None, False, True)
+    assert result["rewritten"] == 1
+    assert result["bytes_after"] < result["bytes_before"]
+    assert region.read_bytes() == before
+
+
+def test_recompresses_to_requested_format(tmp_path):
+    region = tmp_path / "r.0.0.mca"
+    region.write_bytes(server.build_region([(0, 1, deflated())]))
+    result = server.compact_region_file(str(region), 3, False, False)
+    assert result["recompressed"] == 1
+    payload = next(server.iter_region_chunks(region.read_bytes()))[2]
+    assert payload == b"\x03" + CHUNK_NBT
+
+
+def test_corrupt_chunks_are_kept_unless_dropped(tmp_path):
+    region = tmp_path / "r.0.0.mca"
+    region.write_bytes(server.build_region([(0, 1, deflated()), (1, 1, b"\x02not zlib")]))
+    result = server.compact_region_file(str(region), None, False, False)
+    assert result["corrupt_chunks"] == 1
+    assert header_indexes(region.read_bytes()) == {0, 1}
+
+    result = server.compact_region_file(str(region), None, True, False)
+    assert result["corrupt_chunks"] == 1
+    assert header_indexes(region.read_bytes()) == {0}
+
+
+def test_unreadable_header_entry_is_preserved_unless_dropped(tmp_path):
+    region = tmp_path / "r.0.0.mca"
+    data = bytearray(server.build_region([(0, 1, deflated()), (1, 1, deflated())]))
+    struct.pack_into(">I", data, 8, (100 << 8) | 1)  # entry 2 points past the end of the file
+    data += bytes(4096)  # free space that compaction would otherwise reclaim
+    region.write_bytes(bytes(data))
+
+    result = server.compact_region_file(str(region), None, False, False)
+    assert result["invalid_entries"] == 1
+    assert result["unrepaired"] == 1
+    assert region.read_bytes() == bytes(data)
+
+    result = server.compact_region_file(str(region), None, True, False)
+    assert result["unrepaired"] == 0
+    assert result["rewritten"] == 1
+    assert header_indexes(region.read_bytes()) == {0, 1}
@@ -0,0 +1,46 @@
+import struct
+
+import pytest
+
+pytest.importorskip("lz4")
+pytest.importorskip("xxhash")
+
+from backend import server  # noqa: E402
+
+END_MARK = b"LZ4Block" + bytes([0x16]) + bytes(12)
+
+# Streams as lz4-java's LZ4BlockOutputStream (64 KiB blocks) writes them; the checksum is
+# XXH32 with seed 0x9747B28C masked to 28 bits by StreamingXXHash32.asChecksum()
+STORED_STREAM = (
+    b"LZ4Block" + bytes([0x16]) + struct.pack("<iiI", 9, 9, 0x0EA52EA0) + b"minecraft" + END_MARK
+)
+COMPRESSED_STREAM = (
+    b"LZ4Block" + bytes([0x26]) + struct.pack("<iiI", 11, 64, 0x0FF6F023)
+    + bytes.fromhex("1f61010027506161616161") + END_MARK
+)
+
+
+def test_decompress_lz4_java_streams():
+    assert server.lz4_block_decompress(STORED_STREAM) == b"minecraft"
+    assert server.lz4_block_decompress(COMPRESSED_STREAM) == b"a" * 64
+
+
+def test_decompress_rejects_bad_checksum():
+    corrupted = bytearray(STORED_STREAM)
+    corrupted[21] ^= 0x01
+    with pytest.raises(ValueError):
+        server.lz4_block_decompress(bytes(corrupted))
+
+
+def test_compress_writes_masked_checksum():
+    assert server.lz4_block_compress(b"minecraft") == STORED_STREAM
+    data = bytes(range(256)) * 600
+    encoded = server.lz4_block_compress(data)
+    offset = 0
+    while True:
+        compressed_len, original_len, checksum = struct.unpack_from("<iiI", encoded, offset + 9)
+        if original_len == 0:
+            break
+        assert checksum <= 0x0FFFFFFF
+        offset += server.LZ4_BLOCK_HEADER_SIZE + compressed_len
+    assert server.lz4_block_decompress(encoded) == data
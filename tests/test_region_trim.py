@@ -0,0 +1,108 @@
+import struct
+import zlib
+
+import pytest
+
+from backend import server
+
+
+def nbt_name(name):
+    return struct.pack(">H", len(name)) + name
+
+
+def chunk_payload(inhabited, legacy=False):
+    """Compressed chunk whose nested block entity carries a decoy InhabitedTime"""
+    decoy = b"\x09" + nbt_name(b"block_entities") + b"\x0a" + struct.pack(">i", 1)
+    decoy += b"\x04" + nbt_name(b"InhabitedTime") + struct.pack(">q", 10 ** 9) + b"\x00"
+    body = decoy + b"\x04" + nbt_name(b"InhabitedTime") + struct.pack(">q", inhabited)
+    if legacy:
+        body = b"\x0a" + nbt_name(b"Level") + body + b"\x00"
+    return b"\x02" + zlib.compress(b"\x0a" + nbt_name(b"") + body + b"\x00")
+
+
+def header_indexes(path):
+    locations = struct.unpack_from(">1024I", path.read_bytes(), 0)
+    return {index for index, location in enumerate(locations) if location}
+
+
+@pytest.fixture
+def dimension(tmp_path):
+    for folder in ("region", "entities", "poi"):
+        (tmp_path / folder).mkdir()
+    return tmp_path
+
+
+def write_region(path, chunks):
+    path.write_bytes(server.build_region([(index, 1, payload) for index, payload in chunks]))
+    return path
+
+
+def test_removes_chunks_below_threshold(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0)), (1, chunk_payload(5000))])
+    result = server.trim_region_file(str(region), 1000, [], False)
+    assert result["removed"] == 1
+    assert header_indexes(region) == {1}
+
+
+def test_reads_inhabited_time_from_legacy_level(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0, legacy=True)),
+                                                               (1, chunk_payload(5000, legacy=True))])
+    server.trim_region_file(str(region), 1000, [], False)
+    assert header_indexes(region) == {1}
+
+
+def test_protected_rectangles_are_kept(dimension):
+    # Region r.-1.0 covers chunks x -32..-1; index 33 is chunk (-31, 1)
+    region = write_region(dimension / "region" / "r.-1.0.mca", [(0, chunk_payload(0)), (33, chunk_payload(0))])
+    result = server.trim_region_file(str(region), 1000, [(-31, 1, -31, 1)], False)
+    assert result["removed"] == 1
+    assert header_indexes(region) == {33}
+
+
+def test_prunes_entities_and_poi_siblings(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0)), (1, chunk_payload(5000))])
+    siblings = [write_region(dimension / folder / "r.0.0.mca", [(0, b"\x02" + zlib.compress(b"\x0a\x00\x00\x00")),
+                                                                (1, b"\x02" + zlib.compress(b"\x0a\x00\x00\x00"))])
+                for folder in ("entities", "poi")]
+    server.trim_region_file(str(region), 1000, [], False)
+    for sibling in siblings:
+        assert header_indexes(sibling) == {1}
+
+
+def test_removing_every_chunk_deletes_the_file(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0))])
+    server.trim_region_file(str(region), 1000, [], False)
+    assert not region.exists()
+
+
+def test_unreadable_header_entry_leaves_files_untouched(dimension):
+    region = dimension / "region" / "r.0.0.mca"
+    data = bytearray(server.build_region([(0, 1, chunk_payload(0)), (1, 1, chunk_payload(10 ** 9))]))
+    struct.pack_into(">I", data, 8, (100 << 8) | 1)  # entry 2 points past the end of the file
+    region.write_bytes(bytes(data))
+    result = server.trim_region_file(str(region), 1000, [], False)
+    assert result["removed"] == 0
+    assert result["unrepaired"] == 1
+    assert region.read_bytes() == bytes(data)
+
+
+def test_unreadable_sibling_entry_leaves_files_untouched(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0)), (1, chunk_payload(5000))])
+    before = region.read_bytes()
+    entities = dimension / "entities" / "r.0.0.mca"
+    data = bytearray(server.build_region([(0, 1, b"\x02" + zlib.compress(b"\x0a\x00\x00\x00"))]))
+    struct.pack_into(">I", data, 4, (100 << 8) | 1)
+    entities.write_bytes(bytes(data))
+    result = server.trim_region_file(str(region), 1000, [], False)
+    assert result["unrepaired"] == 1
+    assert region.read_bytes() == before
+    assert entities.read_bytes() == bytes(data)
+
+
+def test_dry_run_leaves_files_untouched(dimension):
+    region = write_region(dimension / "region" / "r.0.0.mca", [(0, chunk_payload(0)), (1, chunk_payload(5000))])
+    before = region.read_bytes()
+    result = server.trim_region_file(str(region), 1000, [], True)
+    assert result["removed"] == 1
+    assert result["bytes_after"] < result["bytes_before"]
+    assert region.read_bytes() == before
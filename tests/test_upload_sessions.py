@@ -0,0 +1,35 @@
+import pytest
+
+from backend import server
+
+
+def session(size, chunk_size, received):
+    return {"id": "abc", "size": size, "chunk_size": chunk_size, "chunks": -(-size // chunk_size),
+            "received": received, "updated_at": 0}
+
+
+@pytest.mark.parametrize("chunks, received, expected", [
+    (4, [], [[0, 3]]),
+    (4, [0, 1, 2, 3], []),
+    (5, [0, 2, 3], [[1, 1], [4, 4]]),
+    (6, [3, 0], [[1, 2], [4, 5]]),
+    (1, [0], []),
+])
+def test_missing_chunk_ranges(chunks, received, expected):
+    assert server.missing_chunk_ranges({"chunks": chunks, "received": received}) == expected
+
+
+@pytest.mark.parametrize("size, received, expected", [
+    # Last chunk is short: its range ends at the final byte, not the chunk boundary
+    (250, [], [[0, 249]]),
+    (250, [0], [[100, 249]]),
+    (250, [0, 1], [[200, 249]]),
+    (250, [1], [[0, 99], [200, 249]]),
+    (300, [0, 2], [[100, 199]]),
+    (300, [0, 1, 2], []),
+])
+def test_status_reports_missing_byte_ranges(size, received, expected):
+    status = server.upload_session_status(session(size, 100, received))
+    assert status["missing_bytes"] == expected
+    assert status["received_chunks"] == len(received)
+    assert "received" not in status